@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+""" A pooled HTTP client for the WDL API """
+
+import os
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+""" The base URL of the production WDL API """
+WDL_API_BASE_URL = 'https://api.welldatalabs.com'
+
+""" The environment variable that overrides WDL_API_BASE_URL """
+WDL_API_BASE_URL_VARIABLE = 'WDL_API_BASE_URL'
+
+def get_api_base_url():
+    """ Return the base URL of the WDL API
+
+    The URL is WDL_API_BASE_URL unless the WDL_API_BASE_URL environment
+    variable is set, e.g., to point the SDK at a local mock_wdl_api
+    server for testing and benchmarks:
+
+        > WDL_API_BASE_URL=http://127.0.0.1:8080 python process.py
+
+    Returns
+    -------
+    base_url: str
+        The protocol and host of the API without a trailing slash
+    """
+    base_url = os.environ.get(WDL_API_BASE_URL_VARIABLE) or WDL_API_BASE_URL
+
+    return base_url.rstrip('/')
+
+class WDLClient:
+    """ An HTTP client that reuses connections to the WDL API
+
+    The module-level requests.get opens a new TCP and TLS connection for
+    every call. WDLClient owns a requests.Session with a pooled
+    HTTPAdapter, so consecutive JobHeaders and PerSecData calls reuse a
+    handful of keep-alive connections. The Authorization header is built
+    once and stored on the session.
+
+    The same client can be passed to job_headers_api and persec_data_api
+    and shared by concurrent PerSecData workers. Set pool_maxsize to at
+    least the number of workers so no worker waits on a connection.
+
+    The client can be used as a context manager to close the pooled
+    connections when the sync is finished:
+
+        with WDLClient(api_key) as client:
+            jobs_df = job_headers_api.get_jobs_to_download(..., client=client)
+            persec_data_api.download_persec_data(..., client=client)
+
+    Parameters
+    ----------
+    api_key: str
+        The WDL API key to use for request authentication
+
+    pool_connections: int
+        The number of host connection pools to cache. This number
+        should be positive.
+
+    pool_maxsize: int
+        The maximum number of connections kept alive per host. This
+        number should be positive.
+
+    timeout: float | tuple(float, float) | None
+        The requests timeout applied to every call: either one number
+        of seconds or a (connect, read) tuple. None waits forever.
+    """
+    def __init__(self, api_key, pool_connections=1, pool_maxsize=10, timeout=(10, 300)):
+        assert isinstance(api_key, str)
+        assert isinstance(pool_connections, int) and pool_connections > 0
+        assert isinstance(pool_maxsize, int) and pool_maxsize > 0
+
+        self.timeout = timeout
+
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Authorization': f'Bearer {api_key}'})
+
+    def get(self, url, **kwargs):
+        """ Make a GET request to url over the pooled session
+
+        Parameters
+        ----------
+        url: str
+            The WDL API endpoint to request
+
+        kwargs:
+            Extra keyword arguments passed to requests.Session.get
+
+        Returns
+        -------
+        response: requests.Response
+            The response from the HTTP request
+        """
+        kwargs.setdefault('timeout', self.timeout)
+
+        return self.session.get(url, **kwargs)
+
+    def close(self):
+        """ Close the pooled connections """
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
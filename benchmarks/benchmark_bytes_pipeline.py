@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+""" Benchmark the bytes-level PerSec pipeline against the response.text path
+
+The text path decodes response.text (which runs charset detection when
+the Content-Type has no charset) before saving; the bytes path hands
+response.content to persec_data_api.handle_200. Run from the repository
+root:
+
+    > python benchmarks/benchmark_bytes_pipeline.py --megabytes 200
+"""
+
+import argparse
+import sys
+import tempfile
+
+from pathlib import Path
+from time import perf_counter
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# pylint: disable=wrong-import-position
+import persec_data_api
+import synthetic_persec
+
+def make_persec_csv(megabytes, seed=0):
+    """ Return roughly megabytes MB of synthetic PerSecData CSV as bytes """
+    chunks = []
+    size = 0
+    for chunk in synthetic_persec.iter_persec_csv_chunks(megabytes * 1024 * 1024, seed=seed,
+                                                         chunk_rows=10_000):
+        chunks.append(chunk)
+        size = size + len(chunk)
+        if size >= megabytes * 1024 * 1024:
+            break
+
+    return b''.join(chunks)
+
+def make_response(csv_data):
+    """ Return a 200 requests.Response whose Content-Type has no charset """
+    response = requests.Response()
+    response.status_code = 200
+    response.headers['Content-Type'] = 'application/octet-stream'
+    response.request = requests.Request('GET', 'https://api.welldatalabs.com/persecdata/x').prepare()
+    response._content = csv_data # pylint: disable=protected-access
+    return response
+
+def time_function(function, repeat):
+    """ Return the best wall-clock time of repeat calls to function """
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        timings.append(perf_counter() - start)
+
+    return min(timings)
+
+def main():
+    """ Time the text and bytes paths for raw-only and all outputs """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--megabytes', type=int, default=200,
+                        help='size of the synthetic PerSecData payload')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of timed runs per path (best is reported)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='random seed of the synthetic PerSecData')
+    args = parser.parse_args()
+
+    csv_data = make_persec_csv(args.megabytes, seed=args.seed)
+    gigabytes = len(csv_data) / 1024 ** 3
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        def get_filenames(name, all_outputs):
+            # Each path writes to its own directory so runs don't overwrite each other
+            output_path = Path(temp_dir) / name
+            output_path.mkdir()
+            return persec_data_api.PerSecFilenames(
+                raw_filename=output_path / 'raw.csv',
+                formatted_filename=output_path / 'formatted.csv' if all_outputs else None,
+                units_filename=output_path / 'units.csv' if all_outputs else None)
+
+        def text_path(persec_filenames):
+            csv_text = make_response(csv_data).text
+            persec_data_api.save_raw_persec_data(csv_text, persec_filenames.raw_filename)
+            if persec_filenames.formatted_filename:
+                persec_data_api.save_formatted_persec_data(csv_text,
+                                                           persec_filenames.formatted_filename)
+            if persec_filenames.units_filename:
+                persec_data_api.save_persec_units_data(csv_text, persec_filenames.units_filename)
+
+        def bytes_path(persec_filenames):
+            persec_data_api.handle_200(make_response(csv_data), persec_filenames)
+
+        timings = []
+        for all_outputs in (False, True):
+            outputs_name = 'all outputs' if all_outputs else 'raw only'
+            for path_name, path_function in (('response.text', text_path),
+                                             ('bytes', bytes_path)):
+                persec_filenames = get_filenames(f'{path_name}-{all_outputs}', all_outputs)
+                timing = time_function(lambda: path_function(persec_filenames), # pylint: disable=cell-var-from-loop
+                                       args.repeat)
+                timings.append((f'{outputs_name}, {path_name}', timing))
+
+    print(f'payload: {len(csv_data) / 1024 ** 2:.1f} MB')
+    for name, timing in timings:
+        print(f'{name:28s} {timing:7.3f} s  ({timing / gigabytes:7.2f} s/GB)')
+
+    print(f'saved per GB (raw only):    {(timings[0][1] - timings[1][1]) / gigabytes:7.2f} s')
+    print(f'saved per GB (all outputs): {(timings[2][1] - timings[3][1]) / gigabytes:7.2f} s')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+""" Benchmark normalize_job_headers against the staged JobHeaders pipeline
+
+Run from the repository root:
+
+    > python benchmarks/benchmark_job_headers_normalize.py --jobs 100000
+"""
+
+import argparse
+import sys
+import tracemalloc
+
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import job_headers_api # pylint: disable=wrong-import-position
+
+def make_job_headers(jobs, seed=0):
+    """ Return a raw JobHeaders DataFrame like handle_200() produces
+
+    Parameters
+    ----------
+    jobs: int
+        The number of JobHeader rows to generate
+
+    seed: int
+        The random seed for the numeric columns
+
+    Returns
+    -------
+    job_headers_df: pd.DataFrame
+        DataFrame with one column per key in EXPECTED_JOB_HEADERS_COLUMNS
+    """
+    rng = np.random.default_rng(seed)
+    job_numbers = np.arange(jobs)
+    start_dates = pd.Timestamp('2015-01-01') + pd.to_timedelta(job_numbers * 3600, unit='s')
+    modified_dates = start_dates + pd.Timedelta(days=30)
+
+    job_headers_df = pd.DataFrame({key: [f'{key} {number % 97}' for number in job_numbers]
+                                   for key in sorted(job_headers_api.EXPECTED_JOB_HEADERS_COLUMNS)})
+    job_headers_df['jobId'] = [f'{number:08d}-3397-4379-8ab7-302efc3ae949' for number in job_numbers]
+    job_headers_df['jobStartDate'] = start_dates.strftime('%Y-%m-%dT%H:%M:%S')
+    job_headers_df['modifiedUtc'] = modified_dates.strftime('%Y-%m-%dT%H:%M:%S')
+    job_headers_df['legalDescription'] = '"legal information can go here."'
+    for key in ('bottomholeLatitude', 'bottomholeLongitude', 'surfaceLatitude',
+                'surfaceLongitude', 'measuredDepth', 'verticalDepth', 'lateralLength'):
+        job_headers_df[key] = rng.uniform(0, 20000, jobs)
+    for key in ('stageCount', 'plannedStages'):
+        job_headers_df[key] = rng.integers(1, 80, jobs)
+
+    return job_headers_df
+
+def normalize_staged(job_headers_df):
+    """ The original four-stage normalization pipeline
+
+    Each stage copies the full frame: rename all columns, cast the
+    datetime columns, strip quotes from legal_description and only then
+    select the allowed columns.
+    """
+    updated_df = job_headers_df.copy()
+    updated_df.columns = [job_headers_api.JOB_HEADERS_COLUMN_MAP[column]
+                          for column in job_headers_df.columns]
+
+    updated_df = (updated_df.copy()
+                  .assign(job_start_date=lambda x: pd.to_datetime(x.job_start_date))
+                  .assign(modified_utc=lambda x: pd.to_datetime(x.modified_utc)))
+    updated_df = (updated_df.copy()
+                  .assign(legal_description=lambda x: x.legal_description.str.replace('\"', '')))
+
+    return job_headers_api.select_allowed_columns(updated_df)
+
+def time_function(function, repeat):
+    """ Return the best wall-clock time of repeat calls to function """
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        timings.append(perf_counter() - start)
+
+    return min(timings)
+
+def peak_memory(function):
+    """ Return the peak traced memory in bytes allocated by function """
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return peak
+
+def main():
+    """ Time both normalizers and check they agree """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=100_000,
+                        help='number of JobHeader rows to normalize')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of timed runs per normalizer (best is reported)')
+    args = parser.parse_args()
+
+    job_headers_df = make_job_headers(args.jobs)
+
+    pd.testing.assert_frame_equal(normalize_staged(job_headers_df),
+                                  job_headers_api.normalize_job_headers(job_headers_df))
+
+    staged_time = time_function(lambda: normalize_staged(job_headers_df), args.repeat)
+    fused_time = time_function(lambda: job_headers_api.normalize_job_headers(job_headers_df),
+                               args.repeat)
+    staged_memory = peak_memory(lambda: normalize_staged(job_headers_df))
+    fused_memory = peak_memory(lambda: job_headers_api.normalize_job_headers(job_headers_df))
+
+    print(f'jobs: {args.jobs:,}')
+    print(f'staged pipeline:       {staged_time:.3f} s, peak {staged_memory / 1e6:.1f} MB')
+    print(f'normalize_job_headers: {fused_time:.3f} s, peak {fused_memory / 1e6:.1f} MB')
+    print(f'speed-up:              {staged_time / fused_time:.1f}x')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+""" Benchmark parse_persec_job_time against pd.to_datetime(format=...)
+
+Run from the repository root:
+
+    > python benchmarks/benchmark_job_time.py --rows 5000000
+"""
+
+import argparse
+import sys
+
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import persec_data_api # pylint: disable=wrong-import-position
+
+def make_job_times(rows, start='2018-06-17 04:15:08'):
+    """ Return rows consecutive one-second JOB TIME strings
+
+    Parameters
+    ----------
+    rows: int
+        The number of timestamps to generate
+
+    start: str
+        The first timestamp
+
+    Returns
+    -------
+    job_time: pd.Series
+        JOB TIME strings in the PerSecData "06/17/18 04:15:08" layout
+    """
+    job_times = pd.date_range(start=start, periods=rows, freq='s')
+    return pd.Series(job_times.strftime(persec_data_api.PERSEC_JOB_TIME_FORMAT), dtype=object)
+
+def time_function(function, repeat):
+    """ Return the best wall-clock time of repeat calls to function """
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        timings.append(perf_counter() - start)
+
+    return min(timings)
+
+def main():
+    """ Time both parsers and check they agree """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5_000_000,
+                        help='number of JOB TIME values to parse')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of timed runs per parser (best is reported)')
+    args = parser.parse_args()
+
+    job_time = make_job_times(args.rows)
+
+    generic = pd.to_datetime(job_time, format=persec_data_api.PERSEC_JOB_TIME_FORMAT)
+    fast = persec_data_api.parse_persec_job_time(job_time)
+    assert np.array_equal(generic.to_numpy(dtype='datetime64[ns]'),
+                          fast.to_numpy(dtype='datetime64[ns]'))
+
+    generic_time = time_function(
+        lambda: pd.to_datetime(job_time, format=persec_data_api.PERSEC_JOB_TIME_FORMAT),
+        args.repeat)
+    fast_time = time_function(lambda: persec_data_api.parse_persec_job_time(job_time),
+                              args.repeat)
+
+    print(f'rows: {args.rows:,}')
+    print(f'pd.to_datetime(format=...): {generic_time:.3f} s')
+    print(f'parse_persec_job_time:      {fast_time:.3f} s')
+    print(f'speed-up:                   {generic_time / fast_time:.1f}x')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+""" Benchmark an end-to-end sync against a local mock WDL API server
+
+Starts a mock_wdl_api.MockWDLAPIServer, points the SDK at it with
+WDL_API_BASE_URL, runs job_headers_api.get_jobs_to_download and
+persec_data_api.download_persec_data into a temporary directory, and
+reports jobs/s and MB/s. With --trace the per-stage times are printed
+and written as a Chrome trace. Run from the repository root:
+
+    > python benchmarks/benchmark_mock_api.py --jobs 50 --rows 36000 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+from pathlib import Path
+from threading import Lock
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# pylint: disable=wrong-import-position
+import job_headers_api
+import persec_data_api
+
+from api_client import WDL_API_BASE_URL_VARIABLE, WDLClient
+from mock_wdl_api import MockWDLAPIServer
+from rate_limiter import RateLimiter
+from tracing import Tracer
+
+class ByteCounter:
+    """ A thread-safe metrics_hook that totals the bytes received """
+    def __init__(self):
+        self._lock = Lock()
+        self.bytes_received = 0
+        self.throttle_sleep = 0
+
+    def __call__(self, request_metrics):
+        with self._lock:
+            self.bytes_received = self.bytes_received + (request_metrics.bytes_received or 0)
+            self.throttle_sleep = self.throttle_sleep + request_metrics.throttle_sleep
+
+def main():
+    """ Run one sync against the mock server and report its throughput """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=20, help='number of jobs to sync')
+    parser.add_argument('--rows', type=int, default=36_000, help='PerSecData rows per job')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='server seconds before each response')
+    parser.add_argument('--bandwidth', type=float, default=None,
+                        help='server response MB per second per request')
+    parser.add_argument('--throttle-every', type=int, default=None,
+                        help='server answers every Nth request with 429')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='max_workers passed to download_persec_data')
+    parser.add_argument('--stream', action='store_true',
+                        help='stream PerSecData responses to disk')
+    parser.add_argument('--outputs', choices=('raw', 'all'), default='all',
+                        help='save only the raw CSV or the raw, formatted and units CSVs')
+    parser.add_argument('--trace', default=None,
+                        help='write a Chrome trace-event JSON file of the download stages')
+    args = parser.parse_args()
+
+    bandwidth = args.bandwidth * 1024 * 1024 if args.bandwidth else None
+    server = MockWDLAPIServer(num_jobs=args.jobs, rows_per_job=args.rows, latency=args.latency,
+                              bandwidth=bandwidth, throttle_every=args.throttle_every)
+
+    # Generate the CSVs up front so the timing covers only the sync
+    for job_id in server.job_ids:
+        server.get_persec_body(job_id)
+
+    if args.outputs == 'all':
+        formatted_filename_function = persec_data_api.default_formatted_csv_filename
+        units_filename_function = persec_data_api.default_units_csv_filename
+    else:
+        formatted_filename_function = persec_data_api.nosave_filename
+        units_filename_function = persec_data_api.nosave_filename
+
+    byte_counter = ByteCounter()
+    tracer = Tracer() if args.trace else None
+    os.environ[WDL_API_BASE_URL_VARIABLE] = server.base_url
+
+    with server, tempfile.TemporaryDirectory() as output_dir, \
+         WDLClient('mock-api-key', pool_maxsize=max(args.workers, 1)) as client:
+        db_path = str(Path(output_dir) / 'benchmark.db')
+
+        start_time = perf_counter()
+        jobs_to_download_df = job_headers_api.get_jobs_to_download(None, db_path, 'JobHeaders',
+                                                                   client=client)
+        headers_time = perf_counter() - start_time
+
+        persec_data_api.download_persec_data(jobs_to_download_df, None, output_dir,
+                                             formatted_filename_function=formatted_filename_function,
+                                             units_filename_function=units_filename_function,
+                                             default_delay=1, max_workers=args.workers,
+                                             rate_limiter=RateLimiter(), client=client,
+                                             stream=args.stream, metrics_hook=byte_counter,
+                                             tracer=tracer)
+        total_time = perf_counter() - start_time
+
+    megabytes = byte_counter.bytes_received / (1024 * 1024)
+    print(f'jobs: {len(jobs_to_download_df):,} x {args.rows:,} rows, '
+          f'workers: {args.workers}, stream: {args.stream}, outputs: {args.outputs}')
+    print(f'server responses: {dict(sorted(server.status_counts.items()))}')
+    print(f'JobHeaders:       {headers_time:.3f} s')
+    print(f'total:            {total_time:.3f} s '
+          f'({byte_counter.throttle_sleep:.0f} s of 429 throttling)')
+    print(f'throughput:       {len(jobs_to_download_df) / total_time:.2f} jobs/s, '
+          f'{megabytes / total_time:.1f} MB/s ({megabytes:.1f} MB received)')
+
+    if tracer is not None:
+        tracer.write_chrome_trace(args.trace)
+        print(f'\nstages (trace written to {args.trace}):')
+        print(tracer.get_stage_summary().to_string(float_format='{:.3f}'.format))
+
+if __name__ == "__main__":
+    main()
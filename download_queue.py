@@ -0,0 +1,428 @@
+#!/usr/bin/env python
+
+""" A durable, resumable PerSecData download queue in the state database """
+
+from uuid import uuid4
+
+import pandas as pd
+
+from sqlalchemy import text
+from sqlalchemy import Table, Column, Integer, String, DateTime, MetaData
+
+from job_headers_api import JobHeadersStateStore, JOB_HEADERS_DATA_TYPE
+from job_headers_api import get_job_headers_bindparams, get_job_headers_db_records
+from job_headers_api import job_headers_engine
+from persec_data_api import download_persec_data
+
+""" The state of a job waiting to be claimed """
+PENDING = 'pending'
+
+""" The state of a job claimed by a downloader """
+IN_FLIGHT = 'in_flight'
+
+""" The state of a job whose files were written """
+DONE = 'done'
+
+""" The state of a job that used up its attempts """
+FAILED = 'failed'
+
+class DownloadQueue:
+    """ A persistent PerSecData work queue stored next to JobHeaders
+
+    Every job to download gets a row in table_name with its state
+    (pending, in_flight, done or failed), the number of download
+    attempts, the modified_utc of the JobHeaders version being
+    downloaded, and created/updated/claimed timestamps. The row also
+    keeps the SHA-256 hash of the last PerSecData payload written for
+    the job (see get_content_hash()), so run_download_queue() does not
+    rewrite the files of a job whose modified_utc changed but whose
+    PerSecData did not.
+
+    Downloaders claim pending jobs, which atomically moves them to
+    in_flight, and report each job with mark_done() only after its
+    files are written. When job_headers_table_name is given,
+    mark_done() also records the job in that JobHeaders table in the
+    same transaction, so a job is never marked as synced before its
+    PerSecData is on disk. A job that fails goes back to pending until
+    it has been attempted max_attempts times and is then failed; it is
+    only queued again by enqueue() once its modified_utc changes.
+
+    If the process is killed, the jobs it had claimed stay in_flight.
+    Call release_stale_claims() on start up to return them to pending;
+    the done jobs are not downloaded again, so a backfill resumes
+    where it stopped. Claims are single UPDATE statements, so several
+    processes can share one queue when the state store uses WAL mode;
+    pass older_than to release_stale_claims() then, so the claims the
+    other processes are still working on are kept.
+
+        with JobHeadersStateStore(db_path, wal=True) as state_store:
+            queue = DownloadQueue(db_path, 'download_queue', 'job_headers',
+                                  state_store=state_store)
+            queue.release_stale_claims(older_than=3600)
+            queue.enqueue(get_jobs_to_download(api_key, db_path, 'job_headers',
+                                               state_store=state_store))
+            run_download_queue(queue, api_key, base_path)
+
+    Parameters
+    ----------
+    db_path: str
+        The full path of the SQLite database that stores data from
+        JobHeaders
+
+    table_name: str
+        The name of the queue table. It is created if it doesn't
+        already exist.
+
+    job_headers_table_name: str | None
+        The JobHeaders table (see job_headers_api.create_job_headers_table)
+        to record downloaded jobs in. None only updates the queue.
+
+    max_attempts: int
+        The number of times a job is claimed before it is failed. This
+        number should be positive.
+
+    state_store: job_headers_api.JobHeadersStateStore | None
+        A state store whose engine to use instead of creating one for
+        db_path on every call
+    """
+    def __init__(self, db_path, table_name, job_headers_table_name=None, max_attempts=3,
+                 state_store=None):
+        assert isinstance(db_path, str) or state_store is not None
+        assert isinstance(table_name, str)
+        assert isinstance(job_headers_table_name, str) or job_headers_table_name is None
+        assert isinstance(max_attempts, int) and max_attempts > 0
+        assert isinstance(state_store, JobHeadersStateStore) or state_store is None
+
+        self.db_path = db_path
+        self.table_name = table_name
+        self.job_headers_table_name = job_headers_table_name
+        self.max_attempts = max_attempts
+        self.state_store = state_store
+
+        self.create_table()
+
+    def create_table(self):
+        """ Create the queue table and its state index if they don't exist """
+        meta = MetaData()
+        _ = Table(self.table_name, meta,
+                  Column('job_id', JOB_HEADERS_DATA_TYPE['job_id'], primary_key=True),
+                  Column('modified_utc', JOB_HEADERS_DATA_TYPE['modified_utc']),
+                  Column('state', String, nullable=False, index=True),
+                  Column('attempts', Integer, nullable=False),
+                  Column('claim_id', String),
+                  Column('content_hash', String),
+                  Column('created_utc', DateTime),
+                  Column('updated_utc', DateTime),
+                  Column('claimed_utc', DateTime))
+
+        with job_headers_engine(self.db_path, self.state_store) as engine:
+            meta.create_all(engine, checkfirst=True)
+
+    def enqueue(self, job_headers_df):
+        """ Add the jobs in job_headers_df to the queue
+
+        New jobs are added as pending. A done or failed job is made
+        pending again, with its attempts reset, only when its
+        modified_utc changed, so a failed job is not retried on every
+        sync. Jobs that are in flight are left alone.
+
+        Parameters
+        ----------
+        job_headers_df: pd.DataFrame
+            DataFrame with job_id and modified_utc columns, e.g., from
+            job_headers_api.get_jobs_to_download()
+
+        Returns
+        -------
+        num_jobs: int
+            The number of jobs passed to the queue
+        """
+        assert isinstance(job_headers_df, pd.DataFrame)
+        assert frozenset(('job_id', 'modified_utc')) <= frozenset(job_headers_df.columns)
+
+        rows_df = (job_headers_df
+                   .loc[:, ['job_id', 'modified_utc']]
+                   .drop_duplicates(subset='job_id', keep='last'))
+        if rows_df.empty:
+            return 0
+
+        table = self.table_name
+        changed = f'{table}.modified_utc is not excluded.modified_utc'
+        upsert = text(
+            f'insert into {table} (job_id, modified_utc, state, attempts, '
+            f'created_utc, updated_utc) '
+            f'values (:job_id, :modified_utc, \'{PENDING}\', 0, '
+            f'current_timestamp, current_timestamp) '
+            f'on conflict(job_id) do update set '
+            f'state = case when {table}.state = \'{IN_FLIGHT}\' then {table}.state '
+            f'when {table}.state in (\'{DONE}\', \'{FAILED}\') and not ({changed}) '
+            f'then {table}.state '
+            f'else \'{PENDING}\' end, '
+            f'attempts = case when {table}.state = \'{IN_FLIGHT}\' then {table}.attempts '
+            f'when {changed} then 0 '
+            f'else {table}.attempts end, '
+            f'modified_utc = case when {table}.state = \'{IN_FLIGHT}\' '
+            f'then {table}.modified_utc else excluded.modified_utc end, '
+            f'updated_utc = current_timestamp')
+        upsert = upsert.bindparams(*get_job_headers_bindparams(['job_id', 'modified_utc']))
+
+        rows = get_job_headers_db_records(rows_df, ['job_id', 'modified_utc'])
+
+        with job_headers_engine(self.db_path, self.state_store) as engine:
+            with engine.begin() as connection:
+                connection.execute(upsert, rows)
+
+        return len(rows)
+
+    def claim(self, limit=1):
+        """ Claim up to limit pending jobs for this downloader
+
+        The claimed jobs are moved to in_flight and their attempts are
+        incremented in a single UPDATE statement, so concurrent
+        downloaders never claim the same job.
+
+        Parameters
+        ----------
+        limit: int
+            The maximum number of jobs to claim. This number should be
+            positive.
+
+        Returns
+        -------
+        job_ids: list(str)
+            The claimed job_ids, oldest first. Empty when no job is
+            pending.
+        """
+        assert isinstance(limit, int) and limit > 0
+
+        table = self.table_name
+        claim_id = uuid4().hex
+
+        with job_headers_engine(self.db_path, self.state_store) as engine:
+            with engine.begin() as connection:
+                connection.execute(
+                    text(f'update {table} set state = \'{IN_FLIGHT}\', '
+                         f'attempts = attempts + 1, claim_id = :claim_id, '
+                         f'claimed_utc = current_timestamp, updated_utc = current_timestamp '
+                         f'where job_id in (select job_id from {table} '
+                         f'where state = \'{PENDING}\' '
+                         f'order by created_utc, job_id limit :limit)'),
+                    {'claim_id': claim_id, 'limit': limit})
+
+            with engine.connect() as connection:
+                job_ids = list(connection.execute(
+                    text(f'select job_id from {table} '
+                         f'where claim_id = :claim_id and state = \'{IN_FLIGHT}\' '
+                         f'order by created_utc, job_id'),
+                    {'claim_id': claim_id}).scalars())
+
+        return job_ids
+
+    def mark_done(self, job_id):
+        """ Record that the files for job_id were written
+
+        The job is moved to done and, when the queue has a
+        job_headers_table_name, its modified_utc is upserted into that
+        JobHeaders table in the same transaction.
+
+        Parameters
+        ----------
+        job_id: str
+            The job whose download finished
+        """
+        table = self.table_name
+
+        with job_headers_engine(self.db_path, self.state_store) as engine:
+            with engine.begin() as connection:
+                if self.job_headers_table_name is not None:
+                    connection.execute(
+                        text(f'insert into {self.job_headers_table_name} (job_id, modified_utc) '
+                             f'select job_id, modified_utc from {table} where job_id = :job_id '
+                             f'on conflict(job_id) do update set '
+                             f'modified_utc = excluded.modified_utc'),
+                        {'job_id': job_id})
+
+                connection.execute(
+                    text(f'update {table} set state = \'{DONE}\', claim_id = null, '
+                         f'updated_utc = current_timestamp where job_id = :job_id'),
+                    {'job_id': job_id})
+
+    def mark_failed(self, job_ids):
+        """ Return claimed jobs whose download did not finish
+
+        Each job goes back to pending, or to failed once it has been
+        attempted max_attempts times.
+
+        Parameters
+        ----------
+        job_ids: list(str)
+            The claimed jobs that were not downloaded
+        """
+        if len(job_ids) == 0:
+            return
+
+        table = self.table_name
+
+        with job_headers_engine(self.db_path, self.state_store) as engine:
+            with engine.begin() as connection:
+                connection.execute(
+                    text(f'update {table} set '
+                         f'state = case when attempts >= :max_attempts '
+                         f'then \'{FAILED}\' else \'{PENDING}\' end, '
+                         f'claim_id = null, updated_utc = current_timestamp '
+                         f'where job_id = :job_id and state = \'{IN_FLIGHT}\''),
+                    [{'job_id': job_id, 'max_attempts': self.max_attempts}
+                     for job_id in job_ids])
+
+    def release_stale_claims(self, older_than=None):
+        """ Return in-flight jobs left behind by a killed downloader
+
+        The released jobs keep their attempts, so a job that keeps
+        killing the downloader ends up failed instead of looping.
+
+        Parameters
+        ----------
+        older_than: int | float | None
+            Only release claims made more than this many seconds ago.
+            Use it when other downloaders may still be working on the
+            queue. None releases every in-flight job.
+
+        Returns
+        -------
+        num_jobs: int
+            The number of jobs returned to pending
+        """
+        assert older_than is None or older_than >= 0
+
+        table = self.table_name
+        update = (f'update {table} set state = \'{PENDING}\', claim_id = null, '
+                  f'updated_utc = current_timestamp where state = \'{IN_FLIGHT}\'')
+        params = {}
+        if older_than is not None:
+            update = update + ' and claimed_utc <= datetime(\'now\', :age)'
+            params['age'] = f'-{older_than} seconds'
+
+        with job_headers_engine(self.db_path, self.state_store) as engine:
+            with engine.begin() as connection:
+                num_jobs = connection.execute(text(update), params).rowcount
+
+        return num_jobs
+
+    def get_content_hash(self, job_id):
+        """ Return the hash of the last PerSecData payload written for job_id
+
+        Parameters
+        ----------
+        job_id: str
+            The job to look up
+
+        Returns
+        -------
+        content_hash: str | None
+            The SHA-256 hex digest, or None when no payload was recorded
+        """
+        with job_headers_engine(self.db_path, self.state_store) as engine:
+            with engine.connect() as connection:
+                return connection.execute(
+                    text(f'select content_hash from {self.table_name} where job_id = :job_id'),
+                    {'job_id': job_id}).scalar()
+
+    def set_content_hash(self, job_id, content_hash):
+        """ Record the hash of the PerSecData payload written for job_id
+
+        Parameters
+        ----------
+        job_id: str
+            The job whose files were written
+
+        content_hash: str | None
+            The SHA-256 hex digest of the payload. None forgets the
+            recorded hash, e.g., before the files are rewritten.
+        """
+        with job_headers_engine(self.db_path, self.state_store) as engine:
+            with engine.begin() as connection:
+                connection.execute(
+                    text(f'update {self.table_name} set content_hash = :content_hash '
+                         f'where job_id = :job_id'),
+                    {'job_id': job_id, 'content_hash': content_hash})
+
+    def get_state_counts(self):
+        """ Return the number of jobs in each state
+
+        Returns
+        -------
+        state_counts: dict
+            The number of jobs keyed by state, including states with no
+            jobs
+        """
+        state_counts = {PENDING: 0, IN_FLIGHT: 0, DONE: 0, FAILED: 0}
+
+        with job_headers_engine(self.db_path, self.state_store) as engine:
+            with engine.connect() as connection:
+                rows = connection.execute(
+                    text(f'select state, count(*) from {self.table_name} group by state'))
+                for state, count in rows:
+                    state_counts[state] = count
+
+        return state_counts
+
+def run_download_queue(queue, api_key, base_path, batch_size=100, **download_kwargs):
+    """ Download PerSecData for queued jobs until none are pending
+
+    Jobs are claimed batch_size at a time and passed to
+    persec_data_api.download_persec_data(). Each job is marked done as
+    soon as its files are written; the claimed jobs that were not are
+    returned to the queue with mark_failed(), also when the download is
+    interrupted.
+
+    Parameters
+    ----------
+    queue: DownloadQueue
+        The queue to work from
+
+    api_key: str
+        The WDL API key to use for request authentication
+
+    base_path: pathlib.Path or str
+        The base path to use for the target files
+
+    batch_size: int
+        The number of jobs to claim at a time. This number should be
+        positive.
+
+    download_kwargs:
+        Extra keyword arguments passed to
+        persec_data_api.download_persec_data, e.g., max_workers or
+        client. local_job_headers_updater is set by this function, and
+        content_hash_store defaults to queue so unchanged payloads are
+        skipped.
+
+    Returns
+    -------
+    state_counts: dict
+        The number of jobs in each state when the queue is drained
+    """
+    assert isinstance(queue, DownloadQueue)
+    assert isinstance(batch_size, int) and batch_size > 0
+    assert 'local_job_headers_updater' not in download_kwargs
+
+    download_kwargs.setdefault('content_hash_store', queue)
+
+    while True:
+        job_ids = queue.claim(batch_size)
+        if not job_ids:
+            break
+
+        done_job_ids = set()
+
+        def mark_done(job_id):
+            queue.mark_done(job_id)
+            done_job_ids.add(job_id)
+
+        try:
+            download_persec_data(pd.DataFrame({'job_id': job_ids}), api_key, base_path,
+                                 local_job_headers_updater=mark_done, **download_kwargs)
+        finally:
+            queue.mark_failed([job_id for job_id in job_ids if job_id not in done_job_ids])
+
+    return queue.get_state_counts()
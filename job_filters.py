@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+""" JobHeaders filters shared by the WDL API modules """
+
+import pandas as pd
+
+def filter_job_headers(job_headers_df, job_filters):
+    """ Return the rows of job_headers_df that match job_filters
+
+    The pandas counterpart of job_headers_api.get_job_filter_clauses(). Each key of
+    job_filters is a normalized column name and its value selects rows
+    by type:
+
+        1) A list, set or frozenset keeps rows whose value is any of
+           the given values
+        2) A tuple (low, high) keeps rows with low <= value <= high;
+           either end may be None for an open range
+        3) Any other value keeps rows equal to it
+
+    Rows with a missing value in a filtered column are dropped.
+
+    Parameters
+    ----------
+    job_headers_df: pd.DataFrame
+        DataFrame containing normalized JobHeaders data with every
+        column named in job_filters
+
+    job_filters: dict
+        The filters to apply, e.g., {'operator': ['Operator A'],
+        'job_start_date': ('2020-01-01', None)}
+
+    Returns
+    -------
+    filtered_df: pd.DataFrame
+        The matching rows of job_headers_df
+    """
+    assert isinstance(job_headers_df, pd.DataFrame)
+    assert isinstance(job_filters, dict)
+    assert frozenset(job_filters) <= frozenset(job_headers_df.columns)
+
+    mask = pd.Series(True, index=job_headers_df.index)
+    for column, value in job_filters.items():
+        values = job_headers_df[column]
+        if isinstance(value, (list, set, frozenset)):
+            mask = mask & values.isin(list(value))
+        elif isinstance(value, tuple):
+            assert len(value) == 2
+            low, high = value
+            if pd.api.types.is_datetime64_any_dtype(values):
+                # Accept strings and pd.Timestamps for datetime ranges
+                low, high = [None if bound is None else pd.Timestamp(bound) for bound in value]
+            if low is not None:
+                mask = mask & (values >= low)
+            if high is not None:
+                mask = mask & (values <= high)
+        else:
+            mask = mask & (values == value)
+
+    filtered_df = job_headers_df.loc[mask]
+
+    return filtered_df
@@ -2,14 +2,25 @@
 
 """ Utility functions for working with the WDL Job Headers API """
 
-from time import sleep
+import codecs
+import json
+
+from contextlib import contextmanager
+from time import perf_counter, sleep
 
 import pandas as pd
 
 import requests
 
-from sqlalchemy import create_engine, exc
+from sqlalchemy import and_, bindparam, create_engine, event, exc, select, text
 from sqlalchemy import Table, Column, Integer, String, Float, DateTime, MetaData
+from sqlalchemy.pool import QueuePool
+
+from api_client import WDLClient, get_api_base_url
+from job_filters import filter_job_headers
+from metrics import RequestMetrics, get_response_bytes
+from rate_limiter import RateLimiter
+from tracing import NULL_TRACER
 
 """ The keys of the JOBHeader JSON object returned by the API """
 EXPECTED_JOB_HEADERS_COLUMNS = frozenset([
@@ -61,12 +72,49 @@ JOB_HEADERS_COLUMN_MAP = {
     JOB_HEADERS_COLUMN_MAP """
 JOB_HEADERS_ALLOWED_COLUMNS = ['job_id', 'modified_utc']
 
-""" The SQLAlchemy datatypes used to create a JobHeaders database """
+""" The SQLAlchemy datatypes used to create a JobHeaders database. Every
+    value of JOB_HEADERS_COLUMN_MAP has an entry so that the full
+    catalog can be stored """
 JOB_HEADERS_DATA_TYPE = {
+    'api': String,
+    'asset_group': String,
+    'bottomhole_latitude': Float,
+    'bottomhole_longitude': Float,
+    'county': String,
+    'fleet': String,
+    'fluid_system': String,
+    'formation': String,
+    'frac_system': String,
     'job_id': String,
+    'job_start_date': DateTime,
+    'job_type': String,
+    'lateral_length': Float,
+    'lateral_length_unit_text': String,
+    'legal_description': String,
+    'measured_depth': Float,
+    'measured_depth_unit_text': String,
     'modified_utc': DateTime,
+    'operator': String,
+    'pad_name': String,
+    'planned_stages': Integer,
+    'service_company': String,
+    'stage_count': Integer,
+    'state': String,
+    'surface_latitude': Float,
+    'surface_longitude': Float,
+    'vertical_depth': Float,
+    'vertical_depth_unit_text': String,
+    'well_id': String,
+    'well_name': String,
 }
 
+""" The columns stored in the full local JobHeaders catalog """
+JOB_HEADERS_CATALOG_COLUMNS = list(JOB_HEADERS_DATA_TYPE)
+
+""" The JobHeaders catalog columns with a secondary index for local lookups """
+JOB_HEADERS_CATALOG_INDEXED_COLUMNS = ['operator', 'formation', 'well_id', 'pad_name',
+                                       'job_start_date']
+
 def get_api_url():
     """ Return the WDL JobHeaders API endpoint
 
@@ -74,16 +122,18 @@ def get_api_url():
 
         https://api.welldatalabs.com/jobheaders
 
+    The host can be changed with the WDL_API_BASE_URL environment
+    variable (see api_client.get_api_base_url).
+
     Returns
     -------
     url: str
         The JohHeaders API endpoing
     """
-    protocol = 'https'
-    base_url = 'api.welldatalabs.com'
+    base_url = get_api_base_url()
     endpoint = 'jobheaders'
 
-    url = f'{protocol}://{base_url}/{endpoint}'
+    url = f'{base_url}/{endpoint}'
     return url
 
 def get_api_auth_headers(api_key):
@@ -171,6 +221,180 @@ def handle_200(response):
 
     return job_headers_df
 
+""" Characters that can continue a JSON number """
+JSON_NUMBER_CHARACTERS = frozenset('0123456789.eE+-')
+
+def iter_json_array(chunks, encoding='utf-8'):
+    """ Yield the elements of a JSON array parsed incrementally
+
+    The JSON document in chunks must be a single top-level array. Its
+    elements are decoded one at a time with json.JSONDecoder.raw_decode
+    as bytes arrive, so only the unparsed tail of the document and the
+    current element are held in memory, never the whole document or
+    the full object graph.
+
+    Parameters
+    ----------
+    chunks: iterable(bytes)
+        The JSON document in pieces, e.g., response.iter_content()
+
+    encoding: str
+        The text encoding of the document
+
+    Yields
+    ------
+    element: object
+        Each decoded element of the top-level array in order
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder(encoding)()
+    whitespace = ' \t\n\r'
+
+    buffer = ''
+    started = False   # Have we consumed the opening '['?
+    expect_value = True  # A value (not ',' or ']') comes next
+    num_elements = 0
+
+    chunks = iter(chunks)
+    final = False
+    while not final:
+        chunk = next(chunks, None)
+        if chunk is None:
+            final = True
+            buffer = buffer + text_decoder.decode(b'', final=True)
+        else:
+            buffer = buffer + text_decoder.decode(chunk)
+
+        position = 0
+        while True:
+            # Skip whitespace between tokens
+            while position < len(buffer) and buffer[position] in whitespace:
+                position = position + 1
+            if position == len(buffer):
+                break
+
+            if not started:
+                if buffer[position] != '[':
+                    raise ValueError('JSON document is not an array')
+                started = True
+                position = position + 1
+            elif buffer[position] == ']' and (not expect_value or num_elements == 0):
+                return
+            elif not expect_value:
+                if buffer[position] != ',':
+                    raise ValueError(f'Expected , or ] at JSON array element {num_elements}')
+                expect_value = True
+                position = position + 1
+            else:
+                try:
+                    element, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break  # The element is incomplete; wait for more data
+
+                # A number at the end of the buffer may continue in the
+                # next chunk, e.g., "1" + ".5" or "2e" + "3"
+                if not final and (end == len(buffer) or buffer[end] in JSON_NUMBER_CHARACTERS):
+                    break
+
+                position = end
+                expect_value = False
+                num_elements = num_elements + 1
+                yield element
+
+        # Drop the parsed part of the buffer once per chunk
+        buffer = buffer[position:]
+
+    raise ValueError('JSON array is not terminated')
+
+def normalize_job_headers_column(column, values):
+    """ Normalize the values of one JobHeaders column
+
+    The datetime columns are cast to datetimes and extra quotes are
+    removed from legal_description. Other columns are returned
+    unchanged.
+
+    Parameters
+    ----------
+    column: str
+        The normalized column name, a value of JOB_HEADERS_COLUMN_MAP
+
+    values: pd.Series | list
+        The column values
+
+    Returns
+    -------
+    normalized_values: pd.Series
+        The normalized column values
+    """
+    values = pd.Series(values, name=column)
+
+    if column in ('job_start_date', 'modified_utc'):
+        return pd.to_datetime(values)
+    if column == 'legal_description':
+        return values.str.replace('\"', '')
+
+    return values
+
+def handle_200_stream(response, columns=None, chunk_size=64 * 1024):
+    """ Handle 200 for a streamed response: build only the needed columns
+
+    This is the streaming counterpart of handle_200(). The JobHeaders
+    array is parsed incrementally with iter_json_array() and only the
+    keys for columns are kept from each JobHeader object, appended to
+    one list per column. Peak memory therefore tracks the retained
+    columns rather than the raw JSON, the full object graph and a
+    30-column DataFrame.
+
+    Unlike handle_200() the returned DataFrame is already normalized:
+    it has the normalized column names of columns, in that order, with
+    normalize_job_headers_column() applied.
+
+    Parameters
+    ----------
+    response: requests.Response
+        The streamed response from the HTTP request
+
+    columns: list(str) | None
+        The normalized column names to keep (values of
+        JOB_HEADERS_COLUMN_MAP). None keeps JOB_HEADERS_ALLOWED_COLUMNS.
+
+    chunk_size: int
+        The number of bytes to read from the response at a time. This
+        number should be positive.
+
+    Returns
+    -------
+    job_headers_df: pd.DataFrame
+        Pandas dataframe containing the normalized columns
+    """
+    assert isinstance(response, requests.Response)
+    assert response.status_code == 200
+    assert isinstance(chunk_size, int) and chunk_size > 0
+
+    if columns is None:
+        columns = JOB_HEADERS_ALLOWED_COLUMNS
+    assert frozenset(columns) <= frozenset(JOB_HEADERS_COLUMN_MAP.values())
+
+    # Map the normalized column names back to the JSON keys
+    json_keys = {column: key for key, column in JOB_HEADERS_COLUMN_MAP.items()}
+    keys = [json_keys[column] for column in columns]
+
+    values = {column: [] for column in columns}
+    encoding = response.encoding or 'utf-8'
+    for job_header in iter_json_array(response.iter_content(chunk_size=chunk_size), encoding):
+        for column, key in zip(columns, keys):
+            values[column].append(job_header.get(key))
+
+    job_headers_df = pd.DataFrame({column: normalize_job_headers_column(column, values.pop(column))
+                                   for column in columns})
+
+    assert isinstance(job_headers_df, pd.DataFrame)
+    assert list(job_headers_df.columns) == list(columns)
+
+    return job_headers_df
+
 def handle_400(response):
     """ Handle 400: output warning and suuggested next steps
 
@@ -292,7 +516,8 @@ def handle_generic_response(response):
     print(response.headers)
     print(response.text[:2000])
 
-def download_job_headers(api_key, default_delay=70, max_attempts=3):
+def download_job_headers(api_key, default_delay=70, max_attempts=3, rate_limiter=None,
+                         client=None, stream=False, columns=None, metrics_hook=None):
     """ Download JobHeaders data from WDL API as a Pandas DataFrame
 
     Repeatedly try to download the JobHeaders data from the WDL API.
@@ -313,6 +538,30 @@ def download_job_headers(api_key, default_delay=70, max_attempts=3):
         The maximum number of times to try to make a successful
         API call. This parameter should be positive.
 
+    rate_limiter: rate_limiter.RateLimiter | None
+        A rate limiter shared with other API calls. When given, every
+        attempt waits on the limiter and 429 responses are reported to
+        it instead of sleeping here.
+
+    client: api_client.WDLClient | None
+        A pooled HTTP client to make the API call with. When given, its
+        session supplies the Authorization header and api_key is not
+        used.
+
+    stream: bool
+        Stream the response and parse it incrementally with
+        handle_200_stream(), keeping only columns. The returned
+        DataFrame is then already normalized.
+
+    columns: list(str) | None
+        The normalized column names to keep when stream is True. None
+        keeps JOB_HEADERS_ALLOWED_COLUMNS.
+
+    metrics_hook: Callable[[metrics.RequestMetrics], None] | None
+        A function called with a metrics.RequestMetrics record after
+        every attempt, e.g., a metrics.PrometheusTextfileExporter or
+        list.append
+
     Returns
     -------
     headers_df: pd.DataFrame
@@ -321,25 +570,44 @@ def download_job_headers(api_key, default_delay=70, max_attempts=3):
     """
     assert max_attempts > 0
     assert default_delay >= 0
+    assert isinstance(rate_limiter, RateLimiter) or rate_limiter is None
+    assert isinstance(client, WDLClient) or client is None
 
     url = get_api_url() # Get JobHeaders API url
-    headers = get_api_auth_headers(api_key) # Get required request headers for authentication
+
+    # Get required request headers for authentication unless the client holds them
+    headers = get_api_auth_headers(api_key) if client is None else None
     headers_df = pd.DataFrame() # headers_df is empty by default
     num_attempts = 0 # Initialize the number of download attempts to zero
 
     # Retry API call while not exceeding max_attempts
     while num_attempts < max_attempts:
 
+        # Wait for the rate limiter to allow the next API call
+        wait_start_time = perf_counter()
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+
         # Attempt API call and JobHeaders download
-        response = requests.get(url, headers=headers) # Make API call
+        request_start_time = perf_counter()
+        if client is None:
+            response = requests.get(url, headers=headers, stream=stream) # Make API call
+        else:
+            response = client.get(url, stream=stream) # Make API call on pooled session
         status_code = response.status_code # Grab the status code
         num_attempts = num_attempts + 1 # Increment the number of attempts
         retry_delay = None # Initialize retry_delay to None 
+        handle_start_time = perf_counter()
 
         # Handle various return codes
         if status_code == 200:
             # On 200 create pd.DataFrame from response
-            headers_df = handle_200(response)
+            if stream:
+                headers_df = handle_200_stream(response, columns=columns)
+            else:
+                headers_df = handle_200(response)
+            if rate_limiter is not None:
+                rate_limiter.record_success()
         elif status_code == 400:
             handle_403(response)
         elif status_code == 401:
@@ -354,9 +622,32 @@ def download_job_headers(api_key, default_delay=70, max_attempts=3):
             handle_generic_response(response)
             retry_delay = default_delay
 
+        # Report how the attempt went
+        if metrics_hook is not None:
+            end_time = perf_counter()
+            will_retry = rate_limiter is not None or num_attempts < max_attempts
+            throttle_sleep = retry_delay if status_code == 429 and will_retry else 0
+            metrics_hook(RequestMetrics(endpoint='jobheaders',
+                                        job_id=None,
+                                        attempt=num_attempts,
+                                        status_code=status_code,
+                                        ttfb=response.elapsed.total_seconds(),
+                                        latency=end_time - request_start_time,
+                                        handle_time=end_time - handle_start_time,
+                                        bytes_received=get_response_bytes(response),
+                                        rate_limit_wait=request_start_time - wait_start_time,
+                                        throttle_sleep=throttle_sleep))
+
+        # Release the connection of a streamed response
+        response.close()
+
         # Break out of retry loop on success or major failure
         if status_code in frozenset((200, 400, 401, 403, 404)):
             break
+        elif status_code == 429 and rate_limiter is not None:
+            # Slow down and pause everyone sharing the limiter; the wait
+            # happens in acquire() at the top of the next attempt
+            rate_limiter.record_throttled(retry_delay)
         elif retry_delay and num_attempts < max_attempts:
             # Wait for retry_delay seconds before making another attempt
             sleep(retry_delay)
@@ -364,10 +655,11 @@ def download_job_headers(api_key, default_delay=70, max_attempts=3):
     assert isinstance(headers_df, pd.DataFrame)
     return headers_df
 
-def normalize_column_names(job_headers_df):
-    """ Normalize the JobHeader DataFrame column names
+def select_allowed_columns(job_headers_df):
+    """ Return JobHeader DataFrame with allowed columns
 
-    Standardize the column headers using JOB_HEADERS_COLUMN_MAP.
+    Return a subset of job_headers_df restricted to the columns
+    specified by JOB_HEADERS_ALLOWED_COLUMNS.
 
     Parameters
     ----------
@@ -377,146 +669,292 @@ def normalize_column_names(job_headers_df):
     Returns
     -------
     updated_df: pd.DataFrame
-        Updated DataFrame with Pandas friendly column names and
+        Updated DataFrame restricted to columns specified by
+        JOB_HEADERS_ALLOWED_COLUMNS
     """
     assert isinstance(job_headers_df, pd.DataFrame)
-    assert frozenset(job_headers_df.columns) == EXPECTED_JOB_HEADERS_COLUMNS
-    assert JOB_HEADERS_COLUMN_MAP.keys() == EXPECTED_JOB_HEADERS_COLUMNS
+    assert frozenset(JOB_HEADERS_ALLOWED_COLUMNS) <= frozenset(JOB_HEADERS_COLUMN_MAP.values())
 
     updated_df = job_headers_df.copy()
+    updated_df = updated_df.loc[:, JOB_HEADERS_ALLOWED_COLUMNS]
+
+    assert frozenset(updated_df.columns) == frozenset(JOB_HEADERS_ALLOWED_COLUMNS)
 
-    # Standardize the column headers
-    updated_df.columns = [JOB_HEADERS_COLUMN_MAP[column] for column in job_headers_df.columns]
     return updated_df
 
-def normalize_datetimes(job_headers_df):
-    """ Normalize the JobHeader DataFrame datetime columns
+def normalize_job_headers(job_headers_df, columns=None):
+    """ Normalize a raw JobHeader DataFrame, projecting columns first
 
-    Cast job_start_date and modified_utc columns to datetimes.
-    The function expects the job_headers_df DataFrame to contain
-    job_start_date and modified_utc as columns.
+    Rename the columns using JOB_HEADERS_COLUMN_MAP, cast the datetime
+    columns, remove the extra quotes in legal_description and restrict
+    the result to columns. The raw DataFrame is first restricted to the
+    JSON keys behind columns, so only the surviving columns are renamed
+    and transformed, and the full 30-column frame is never copied. For
+    the default columns the legal_description and job_start_date
+    transforms are skipped entirely.
 
     Parameters
     ----------
     job_headers_df: pd.DataFrame
-        Pandas DataFrame containing JobHeader JSON object
+        Pandas DataFrame containing JobHeader JSON object, as returned
+        by handle_200()
+
+    columns: list(str) | None
+        The normalized column names to keep (values of
+        JOB_HEADERS_COLUMN_MAP). None keeps JOB_HEADERS_ALLOWED_COLUMNS.
 
     Returns
     -------
     updated_df: pd.DataFrame
-        Updated DataFrame with properly cast datetime columns
+        DataFrame with the normalized columns, in the order of columns
     """
     assert isinstance(job_headers_df, pd.DataFrame)
-    assert 'job_start_date' in job_headers_df.columns
-    assert 'modified_utc' in job_headers_df.columns
+    assert frozenset(job_headers_df.columns) == EXPECTED_JOB_HEADERS_COLUMNS
 
-    updated_df = job_headers_df.copy()
+    if columns is None:
+        columns = JOB_HEADERS_ALLOWED_COLUMNS
+    assert frozenset(columns) <= frozenset(JOB_HEADERS_COLUMN_MAP.values())
 
-    updated_df = (
-        updated_df
-        .assign(job_start_date=lambda x: pd.to_datetime(x.job_start_date))
-        .assign(modified_utc=lambda x: pd.to_datetime(x.modified_utc)))
+    # Project to the needed JSON keys before doing any work
+    json_keys = {column: key for key, column in JOB_HEADERS_COLUMN_MAP.items()}
+    updated_df = pd.DataFrame({column: normalize_job_headers_column(column,
+                                                                    job_headers_df[json_keys[column]])
+                               for column in columns},
+                              index=job_headers_df.index)
 
-    assert 'job_start_date' in updated_df.select_dtypes('datetime').columns
-    assert 'modified_utc' in updated_df.select_dtypes('datetime').columns
+    assert list(updated_df.columns) == list(columns)
 
     return updated_df
 
-def normalize_legal_descriptions(job_headers_df):
-    """ Normalize the JobHeader DataFrame legal description column
+def get_current_normalized_job_headers(api_key, rate_limiter=None, client=None, stream=False,
+                                       columns=None, metrics_hook=None):
+    """ Download and return normalized JobHeaders DataFrame
+
+    The key steps, fused in normalize_job_headers(), are:
+        1) Restrict data to allowed columns
+        2) Normalize the column names
+        3) Normalize the datetime columns
+        4) Normalize the legal_description column
 
-    Remove the extra quotes in the legal description.
-    The function expects the job_headers_df DataFrame to contain
-    legal_description as a column.
+    If no data was downloaded the function will return an
+    empty DataFrame.
 
     Parameters
     ----------
-    job_headers_df: pd.DataFrame
-        Pandas DataFrame containing JobHeader JSON object
+    api_key: str
+        The WDL API key to use for request authentication
+
+    rate_limiter: rate_limiter.RateLimiter | None
+        A rate limiter shared with other API calls
+
+    client: api_client.WDLClient | None
+        A pooled HTTP client to make the API call with
+
+    stream: bool
+        Parse the response incrementally, keeping only columns. The
+        normalization happens while the columns are built.
+
+    columns: list(str) | None
+        The normalized column names to keep. None keeps
+        JOB_HEADERS_ALLOWED_COLUMNS; pass JOB_HEADERS_CATALOG_COLUMNS
+        for the full catalog.
+
+    metrics_hook: Callable[[metrics.RequestMetrics], None] | None
+        A function called with a metrics.RequestMetrics record after
+        every JobHeaders request attempt
 
     Returns
     -------
-    updated_df: pd.DataFrame
-        Updated DataFrame with any extra quotes removed from the
-        legal_description column
+    job_headers_df: pd.DataFrame
+        Pandas DataFrame with normalized JobHeader data
     """
+    raw_headers_df = download_job_headers(api_key=api_key, rate_limiter=rate_limiter,
+                                          client=client, stream=stream,
+                                          columns=columns, metrics_hook=metrics_hook)
+
+    if stream:
+        # The streamed DataFrame is already normalized and projected
+        job_headers_df = raw_headers_df
+        if job_headers_df.empty:
+            print('Warning: No data downloaded!')
+    elif raw_headers_df.empty:
+        print('Warning: No data downloaded!')
+        job_headers_df = raw_headers_df
+    else:
+        job_headers_df = normalize_job_headers(raw_headers_df, columns)
+
     assert isinstance(job_headers_df, pd.DataFrame)
-    assert 'legal_description' in job_headers_df.columns
 
-    updated_df = job_headers_df.copy()
+    return job_headers_df
 
-    updated_df = (
-        updated_df
-        .assign(legal_description=lambda x: x.legal_description.str.replace('\"', '')))
+class JobHeadersStateStore:
+    """ The local JobHeaders state database for the life of a sync
 
-    return updated_df
+    create_job_headers_table(), get_existing_job_headers() and
+    update_job_headers_db_row() each create and dispose a SQLAlchemy
+    engine when called with only a db_path. Passing a state store
+    instead lets them share one engine and its pool of SQLite
+    connections, so per-job bookkeeping does not pay for engine set up
+    and tear down.
 
-def select_allowed_columns(job_headers_df):
-    """ Return JobHeader DataFrame with allowed columns
+    The store can be used as a context manager to dispose the engine
+    when the sync is finished:
 
-    Return a subset of job_headers_df restricted to the columns
-    specified by JOB_HEADERS_ALLOWED_COLUMNS.
+        with JobHeadersStateStore('wdl_job_headers.db') as state_store:
+            jobs_df = get_jobs_to_download(api_key, None, 'job_headers',
+                                           state_store=state_store)
+            ...
+
+    With wal=True the database is put in write-ahead-log mode so that
+    several downloader processes on one host can share db_path: readers
+    no longer block the writer and the writer no longer blocks readers.
+    Every connection also gets synchronous=NORMAL (safe with WAL and
+    far fewer fsyncs) and a busy timeout, so a process that finds the
+    write lock taken waits for it instead of failing with "database is
+    locked". The write helpers keep their transactions short (a single
+    statement or executemany each) so the lock is held only briefly.
+
+    WAL needs shared memory between the processes, so the database must
+    be on a local file system, not a network share.
 
     Parameters
     ----------
-    job_headers_df: pd.DataFrame
-        Pandas DataFrame containing JobHeader JSON object
+    db_path: str
+        The full path of the SQLite database that stores data from
+        JobHeaders
 
-    Returns
-    -------
-    updated_df: pd.DataFrame
-        Updated DataFrame restricted to columns specified by
-        JOB_HEADERS_ALLOWED_COLUMNS
+    pool_size: int
+        The number of SQLite connections kept open. This number should
+        be positive.
+
+    wal: bool
+        Enable write-ahead logging for multi-process use
+
+    busy_timeout: int | float
+        The number of seconds a connection waits for a lock held by
+        another connection or process before giving up. This number
+        should be non-negative.
     """
-    assert isinstance(job_headers_df, pd.DataFrame)
-    assert frozenset(JOB_HEADERS_ALLOWED_COLUMNS) <= frozenset(JOB_HEADERS_COLUMN_MAP.values())
+    def __init__(self, db_path, pool_size=5, wal=False, busy_timeout=30):
+        assert isinstance(db_path, str)
+        assert isinstance(pool_size, int) and pool_size > 0
+        assert busy_timeout >= 0
+
+        self.db_path = db_path
+        self.wal = wal
+        self.busy_timeout = busy_timeout
+
+        # Pooled connections may be checked out by any thread, one at a time
+        self.engine = create_engine(f'sqlite:///{db_path}', echo=False,
+                                    poolclass=QueuePool, pool_size=pool_size,
+                                    connect_args={'check_same_thread': False,
+                                                  'timeout': busy_timeout})
+
+        event.listen(self.engine, 'connect', self._set_pragmas)
+
+    def _set_pragmas(self, dbapi_connection, connection_record): #pylint: disable=unused-argument
+        """ Configure each new SQLite connection """
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'pragma busy_timeout = {int(self.busy_timeout * 1000)}')
+        if self.wal:
+            cursor.execute('pragma journal_mode = wal')
+            cursor.execute('pragma synchronous = normal')
+        cursor.close()
+
+    def close(self):
+        """ Dispose the engine and close its connections """
+        self.engine.dispose()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+@contextmanager
+def job_headers_engine(db_path, state_store=None):
+    """ Yield the SQLAlchemy engine for the JobHeaders database
+
+    When state_store is given its long-lived engine is yielded and left
+    open. Otherwise a new engine for the SQLite database at db_path is
+    created and disposed once the caller is done with it.
 
-    updated_df = job_headers_df.copy()
-    updated_df = updated_df.loc[:, JOB_HEADERS_ALLOWED_COLUMNS]
+    Parameters
+    ----------
+    db_path: str | None
+        The full path of the SQLite table that stores data from
+        JobHeaders. Not used when state_store is given.
 
-    assert frozenset(updated_df.columns) == frozenset(JOB_HEADERS_ALLOWED_COLUMNS)
+    state_store: JobHeadersStateStore | None
+        The state store whose engine to use
 
-    return updated_df
+    Yields
+    ------
+    engine: sqlalchemy.engine.Engine
+        The engine for the JobHeaders database
+    """
+    assert isinstance(state_store, JobHeadersStateStore) or state_store is None
 
-def get_current_normalized_job_headers(api_key):
-    """ Download and return normalized JobHeaders DataFrame
+    if state_store is not None:
+        yield state_store.engine
+        return
 
-    The key steps are:
-        1) Normalize the column names
-        2) Normalize the datetime columns
-        3) Normalize the legal_description column
-        4) Restrict data to allowed columns
+    assert isinstance(db_path, str)
 
-    If no data was downloaded the function will return an
-    empty DataFrame.
+    # Create connection to SQLite db at db_path with minimal logging
+    engine = create_engine(f'sqlite:///{db_path}', echo=False)
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+
+def get_job_headers_table(table_name, meta, columns=None, indexed_columns=()):
+    """ Return the SQLAlchemy Table for a JobHeaders table
+
+    The job_id column is the primary key. Every column listed in
+    indexed_columns gets a secondary index named ix_<table>_<column>.
 
     Parameters
     ----------
-    api_key: str
-        The WDL API key to use for request authentication
+    table_name: str
+        The name of the table
+
+    meta: sqlalchemy.MetaData
+        The MetaData object the table is added to
+
+    columns: list(str) | None
+        The normalized column names of the table, which must include
+        job_id. None uses JOB_HEADERS_ALLOWED_COLUMNS.
+
+    indexed_columns: list(str)
+        The columns to index. These should be a subset of columns.
 
     Returns
     -------
-    job_headers_df: pd.DataFrame
-        Pandas DataFrame with normalized JobHeader data
+    table: sqlalchemy.Table
+        The table meta-data
     """
-    raw_headers_df = download_job_headers(api_key=api_key)
+    if columns is None:
+        columns = JOB_HEADERS_ALLOWED_COLUMNS
 
-    if raw_headers_df.empty:
-        print('Warning: No data downloaded!')
-        job_headers_df = raw_headers_df
-    else:
-        job_headers_df = (raw_headers_df
-                          .pipe(normalize_column_names)
-                          .pipe(normalize_datetimes)
-                          .pipe(normalize_legal_descriptions)
-                          .pipe(select_allowed_columns))
+    primary_key = 'job_id'
+    assert primary_key in columns
+    assert frozenset(columns) <= frozenset(JOB_HEADERS_DATA_TYPE)
+    assert frozenset(indexed_columns) <= frozenset(columns)
 
-    assert isinstance(job_headers_df, pd.DataFrame)
+    primary_key_column = Column(primary_key,
+                                JOB_HEADERS_DATA_TYPE[primary_key],
+                                primary_key=True)
+    non_key_columns = [Column(column, JOB_HEADERS_DATA_TYPE[column],
+                              index=column in indexed_columns)
+                       for column in columns if column != primary_key]
 
-    return job_headers_df
+    table = Table(table_name, meta, primary_key_column, *non_key_columns)
 
-def create_job_headers_table(db_path, table_name):
+    return table
+
+def create_job_headers_table(db_path, table_name, state_store=None, columns=None,
+                             indexed_columns=()):
     """ Create JobHeaders table that stores last update time
 
     Create a JobHeaders table that has columns for each allowed
@@ -541,29 +979,29 @@ def create_job_headers_table(db_path, table_name):
 
     table_name: str
         The name of the table to create
+
+    state_store: JobHeadersStateStore | None
+        A state store whose engine to use instead of creating one for
+        db_path
+
+    columns: list(str) | None
+        The normalized column names of the table. None creates the
+        columns listed in JOB_HEADERS_ALLOWED_COLUMNS.
+
+    indexed_columns: list(str)
+        The columns to give a secondary index
     """
-    # Create connection to SQLite db at db_path with minimal logging
     # Instantiate a MetaData object to store Table meta-data
-    engine = create_engine(f'sqlite:///{db_path}', echo=False)
     meta = MetaData()
 
     # Setup meta-data for a table named table_name with job_id as the primary key
-    # Only create columns listed in JOB_HEADERS_ALLOWED_COLUMNS
-    primary_key = 'job_id'
-    primary_key_column = Column(primary_key,
-                                JOB_HEADERS_DATA_TYPE[primary_key],
-                                primary_key=True)
-    non_key_columns = [Column(column, JOB_HEADERS_DATA_TYPE[column])
-                       for column in JOB_HEADERS_ALLOWED_COLUMNS if column != primary_key]
-
-    columns = [primary_key_column] + non_key_columns
-    _ = Table(table_name, meta, *columns)
+    _ = get_job_headers_table(table_name, meta, columns, indexed_columns)
 
     # Create table only if it doesn't already exist
-    meta.create_all(engine, checkfirst=True)
-    engine.dispose()
+    with job_headers_engine(db_path, state_store) as engine:
+        meta.create_all(engine, checkfirst=True)
 
-def get_existing_job_headers(db_path, table_name):
+def get_existing_job_headers(db_path, table_name, state_store=None):
     """ Return a pandas DataFrame with JobHeaders from SQLite db
 
     Read data from the table_name table in the SQLite database
@@ -579,14 +1017,15 @@ def get_existing_job_headers(db_path, table_name):
 
     table_name: str
         The name of the JobHeaders table
-    """
-    # Create connection to SQLite db at db_path with minimal logging
-    engine = create_engine(f'sqlite:///{db_path}', echo=False)
-    connection = engine.connect()
 
+    state_store: JobHeadersStateStore | None
+        A state store whose engine to use instead of creating one for
+        db_path
+    """
     # Read table from table_name and store in pd.DataFrame
-    existing_job_headers_df = pd.read_sql(table_name, connection)
-    engine.dispose()
+    with job_headers_engine(db_path, state_store) as engine:
+        with engine.connect() as connection:
+            existing_job_headers_df = pd.read_sql(table_name, connection)
 
     # Make sure that table_name has the correct columns
     existing_columns = frozenset(existing_job_headers_df.columns)
@@ -723,7 +1162,143 @@ def identify_job_ids_to_download(current_job_headers_df, existing_job_headers_df
 
     return job_ids_to_download
 
-def get_jobs_to_download(api_key, db_path, table_name):
+def get_job_headers_bindparams(columns=None):
+    """ Return typed bind parameters for the JobHeaders table columns
+
+    Binding every column with its table type makes SQLAlchemy store
+    values exactly as pd.DataFrame.to_sql and the table's DateTime
+    columns would, so stored values can be compared as-is in SQL.
+
+    Parameters
+    ----------
+    columns: list(str) | None
+        The columns to bind. None uses JOB_HEADERS_ALLOWED_COLUMNS.
+
+    Returns
+    -------
+    bindparams: list(sqlalchemy.sql.expression.BindParameter)
+        One bind parameter per column
+    """
+    if columns is None:
+        columns = JOB_HEADERS_ALLOWED_COLUMNS
+
+    return [bindparam(column, type_=JOB_HEADERS_DATA_TYPE[column]())
+            for column in columns]
+
+def get_job_headers_db_records(job_headers_df, columns=None):
+    """ Convert JobHeaders rows into parameter dicts for executemany
+
+    Parameters
+    ----------
+    job_headers_df: pd.DataFrame
+        DataFrame containing normalized JobHeaders data
+
+    columns: list(str) | None
+        The columns to convert. None uses JOB_HEADERS_ALLOWED_COLUMNS.
+
+    Returns
+    -------
+    records: list(dict)
+        One dict per row keyed by columns. Missing values (NaN/NaT)
+        are None so they are stored as NULL.
+    """
+    if columns is None:
+        columns = JOB_HEADERS_ALLOWED_COLUMNS
+
+    assert isinstance(job_headers_df, pd.DataFrame)
+    assert frozenset(columns) <= frozenset(job_headers_df.columns)
+
+    rows_df = job_headers_df.loc[:, columns]
+    records = (rows_df
+               .astype(object)
+               .where(rows_df.notna(), None)
+               .to_dict('records'))
+
+    return records
+
+def identify_job_ids_to_download_in_db(current_job_headers_df, db_path, table_name,
+                                       state_store=None):
+    """ Identify job_ids to download by diffing inside SQLite
+
+    Same result as identify_job_ids_to_download() without reading the
+    JobHeaders table into pandas. current_job_headers_df is bulk loaded
+    into an indexed TEMP table on one connection, and the missing and
+    changed jobs are found with a single left join against the primary
+    key of table_name:
+
+        1) Jobs with no row in table_name (the anti-join), and
+        2) Jobs whose modified_utc differs from the stored one,
+           including when either value is missing
+
+    Only the delta is returned, so memory use no longer grows with the
+    number of jobs already downloaded.
+
+    Parameters
+    ----------
+    current_job_headers_df: pd.DataFrame
+        Pandas DataFrame with the JobHeaders data from the most recent
+        JobHeaders API call
+
+    db_path: str
+        The full path of the SQLite table that stores data from
+        JobHeaders
+
+    table_name: str
+        The name of the JobHeaders table
+
+    state_store: JobHeadersStateStore | None
+        A state store whose engine to use instead of creating one for
+        db_path
+
+    Returns
+    -------
+    job_ids_to_download: frozenset
+        Set of job_ids to download from the API
+    """
+    required_columns = frozenset(('job_id', 'modified_utc'))
+
+    assert isinstance(current_job_headers_df, pd.DataFrame)
+    assert required_columns <= frozenset(current_job_headers_df.columns)
+
+    if current_job_headers_df.empty:
+        return frozenset()
+
+    temp_table_name = f'{table_name}_current'
+    column_list = ', '.join(JOB_HEADERS_ALLOWED_COLUMNS)
+    value_list = ', '.join(f':{column}' for column in JOB_HEADERS_ALLOWED_COLUMNS)
+    insert = text(f'insert into temp.{temp_table_name} ({column_list}) values ({value_list})')
+    insert = insert.bindparams(*get_job_headers_bindparams())
+
+    select_delta = text(f'select distinct current.job_id '
+                        f'from temp.{temp_table_name} as current '
+                        f'left join main.{table_name} as existing '
+                        f'on existing.job_id = current.job_id '
+                        f'where existing.job_id is null '
+                        f'or current.modified_utc is null '
+                        f'or existing.modified_utc is null '
+                        f'or current.modified_utc != existing.modified_utc')
+
+    with job_headers_engine(db_path, state_store) as engine:
+        # TEMP tables only exist on the connection that created them,
+        # so load and diff on one connection
+        with engine.begin() as connection:
+            connection.execute(text(f'drop table if exists temp.{temp_table_name}'))
+            connection.execute(text(f'create temp table {temp_table_name} '
+                                    f'(job_id varchar, modified_utc datetime)'))
+            connection.execute(text(f'create index temp.ix_{temp_table_name}_job_id '
+                                    f'on {temp_table_name} (job_id)'))
+
+            connection.execute(insert, get_job_headers_db_records(current_job_headers_df))
+            job_ids_to_download = frozenset(connection.execute(select_delta).scalars())
+
+            connection.execute(text(f'drop table temp.{temp_table_name}'))
+
+    return job_ids_to_download
+
+def get_jobs_to_download(api_key, db_path, table_name, rate_limiter=None, client=None,
+                         state_store=None, diff_in_db=False, stream=False,
+                         catalog_table_name=None, job_filters=None, metrics_hook=None,
+                         tracer=None):
     """ Return a pd.DataFrame of jobs that need to be downloaded
 
     The job that need to be downloaded are those that
@@ -755,43 +1330,128 @@ def get_jobs_to_download(api_key, db_path, table_name):
     table_name: str
         The name of the JobHeaders table
 
+    rate_limiter: rate_limiter.RateLimiter | None
+        A rate limiter shared with other API calls, e.g., the one passed
+        to persec_data_api.download_persec_data
+
+    client: api_client.WDLClient | None
+        A pooled HTTP client shared with other API calls. When given,
+        api_key is not used.
+
+    state_store: JobHeadersStateStore | None
+        A state store whose engine to use instead of creating engines
+        for db_path. When given, db_path is not used.
+
+    diff_in_db: bool
+        Compute the missing and changed jobs inside SQLite with
+        identify_job_ids_to_download_in_db() instead of loading the
+        JobHeaders table into pandas. Recommended for tenants with many
+        jobs.
+
+    stream: bool
+        Parse the JobHeaders response incrementally, keeping only the
+        allowed columns, instead of loading the whole JSON document
+
+    catalog_table_name: str | None
+        When given, keep every JobHeaders column and refresh the full
+        catalog table of this name (see
+        create_job_headers_catalog_table()) from the same API call
+
+    job_filters: dict | None
+        Only consider jobs whose JobHeaders match these filters, e.g.,
+        {'operator': ['Operator A'], 'formation': 'Formation X',
+        'job_start_date': ('2020-01-01', None)}. See
+        filter_job_headers() for the filter semantics. Jobs filtered
+        out are neither returned nor recorded as downloaded. None
+        considers every job.
+
+    metrics_hook: Callable[[metrics.RequestMetrics], None] | None
+        A function called with a metrics.RequestMetrics record after
+        every JobHeaders request attempt
+
+    tracer: tracing.Tracer | None
+        Records spans for downloading and normalizing the JobHeaders,
+        refreshing the catalog and diffing against the local table.
+        None records nothing.
+
     Returns
     -------
     jobs_to_download_df: pd.DataFrame
         A pd.DataFrame of jobs that need to be downloaded to be in
         sync with current WDL records
     """
+    if tracer is None:
+        tracer = NULL_TRACER
+
     # Create job headers database and table if they don't exist
-    create_job_headers_table(db_path=db_path, table_name=table_name)
+    create_job_headers_table(db_path=db_path, table_name=table_name, state_store=state_store)
+
+    # Keep the columns that are stored or filtered on
+    if catalog_table_name is not None:
+        columns = JOB_HEADERS_CATALOG_COLUMNS
+    elif job_filters:
+        columns = JOB_HEADERS_ALLOWED_COLUMNS + [column for column in job_filters
+                                                 if column not in JOB_HEADERS_ALLOWED_COLUMNS]
+    else:
+        columns = None
 
     # Make API call to get updated WDL JobHeaders information
-    current_job_headers_df = get_current_normalized_job_headers(api_key=api_key)
+    with tracer.span('jobheaders.download'):
+        current_job_headers_df = get_current_normalized_job_headers(api_key=api_key,
+                                                                    rate_limiter=rate_limiter,
+                                                                    client=client,
+                                                                    stream=stream,
+                                                                    columns=columns,
+                                                                    metrics_hook=metrics_hook)
+
+    # Refresh the local catalog with every downloaded column
+    if catalog_table_name is not None and not current_job_headers_df.empty:
+        with tracer.span('jobheaders.update_catalog'):
+            create_job_headers_catalog_table(db_path=db_path, table_name=catalog_table_name,
+                                             state_store=state_store)
+            update_job_headers_catalog(current_job_headers_df, db_path=db_path,
+                                       table_name=catalog_table_name, state_store=state_store)
+
+    # Drop unwanted jobs before they are diffed or queued for download
+    if job_filters and not current_job_headers_df.empty:
+        current_job_headers_df = filter_job_headers(current_job_headers_df, job_filters)
 
     # Add required columns to current_job_headers_df when it is empty
     if current_job_headers_df.empty:
         required_columns = ['job_id', 'modified_utc']
         current_job_headers_df = pd.DataFrame(data=None, columns=required_columns)
 
-    # Get the JobHeaders information stored in the local database
-    existing_job_headers_df = get_existing_job_headers(db_path=db_path,
-                                                       table_name=table_name)
-
-    # Compare the existing information to the new information to determine
-    # the set of jobs that are missing or out of sync and need to be
-    # downloaded
-    job_ids_to_download = identify_job_ids_to_download( #pylint: disable=unused-variable
-        current_job_headers_df=current_job_headers_df,
-        existing_job_headers_df=existing_job_headers_df)
-
-    # Filter current_job_headers_df to only those job ids that
-    # need to be downloaded
-    jobs_to_download_df = (current_job_headers_df
-                           .query('job_id in @job_ids_to_download')
-                           .reset_index(drop=True))
+    # Diff the current JobHeaders against the local table
+    with tracer.span('jobheaders.diff', diff_in_db=diff_in_db):
+        if diff_in_db:
+            # Let SQLite find the jobs that are missing or out of sync
+            job_ids_to_download = identify_job_ids_to_download_in_db( #pylint: disable=unused-variable
+                current_job_headers_df=current_job_headers_df,
+                db_path=db_path,
+                table_name=table_name,
+                state_store=state_store)
+        else:
+            # Get the JobHeaders information stored in the local database
+            existing_job_headers_df = get_existing_job_headers(db_path=db_path,
+                                                               table_name=table_name,
+                                                               state_store=state_store)
+
+            # Compare the existing information to the new information to determine
+            # the set of jobs that are missing or out of sync and need to be
+            # downloaded
+            job_ids_to_download = identify_job_ids_to_download( #pylint: disable=unused-variable
+                current_job_headers_df=current_job_headers_df,
+                existing_job_headers_df=existing_job_headers_df)
+
+        # Filter current_job_headers_df to only those job ids that
+        # need to be downloaded
+        jobs_to_download_df = (current_job_headers_df
+                               .query('job_id in @job_ids_to_download')
+                               .reset_index(drop=True))
 
     return jobs_to_download_df
 
-def update_job_headers_db_row(job_headers_df, job_id, db_path, table_name):
+def update_job_headers_db_row(job_headers_df, job_id, db_path, table_name, state_store=None):
     """ Update local db for job_id using info from job_headers_df
 
     Update the local database JobHeaders table (identified by db_path and
@@ -819,6 +1479,10 @@ def update_job_headers_db_row(job_headers_df, job_id, db_path, table_name):
 
     table_name: str
         The name of the JobHeaders table
+
+    state_store: JobHeadersStateStore | None
+        A state store whose engine to use instead of creating one for
+        db_path. Pass one when updating many jobs in a row.
     """
     assert isinstance(job_headers_df, pd.DataFrame)
     assert 'job_id' in job_headers_df.columns
@@ -831,31 +1495,289 @@ def update_job_headers_db_row(job_headers_df, job_id, db_path, table_name):
         print(f'(update_job_headers_db_row) job_id {job_id} missing!')
         return
 
-    # Create connection to SQLite db at db_path with minimal logging
-    engine = create_engine(f'sqlite:///{db_path}', echo=False)
-    connection = engine.connect()
+    with job_headers_engine(db_path, state_store) as engine:
+        connection = engine.connect()
+
+        # Start a transaction for the deletion
+        #
+        # We should not include the pd.DataFrame.to_sql() in the transaction
+        # because we may end up with nested transactions
+        #
+        # If the insert(append) fails then at worst we will identify the missing
+        # job_id during the next JobHeaders update.
+        trans = connection.begin()
+
+        try:
+            # delete row that we are going to "upsert"
+            connection.execute(text(f'delete from {table_name} where job_id = :job_id'),
+                               {'job_id': job_id})
+            trans.commit()
+
+            # insert changed row (only the tracked columns)
+            (current_row_df
+             .loc[:, JOB_HEADERS_ALLOWED_COLUMNS]
+             .to_sql(table_name, engine, if_exists='append', index=False))
+        except exc.SQLAlchemyError:
+            # On an exception rollback the transaction
+            if trans.is_active:
+                trans.rollback()
+        finally:
+            # Return the connection to the pool
+            connection.close()
 
-    # Start a transaction for the deletion
-    #
-    # We should not include the pd.DataFrame.to_sql() in the transaction
-    # because we may end up with nested transactions
-    #
-    # If the insert(append) fails then at worst we will identify the missing
-    # job_id during the next JobHeaders update.
-    trans = connection.begin()
+    return
 
-    try:
-        # delete row that we are going to "upsert"
-        engine.execute(f'delete from {table_name} where job_id="{job_id}"')
-        trans.commit()
-
-        # insert changed row
-        current_row_df.to_sql(table_name, engine, if_exists='append', index=False)
-    except exc.SQLAlchemyError:
-        # On an exception rollback the transaction
-        trans.rollback()
-    finally:
-        # Clean up after ourselves
-        engine.dispose()
+def update_job_headers_db_rows(job_headers_df, db_path, table_name, job_ids=None,
+                               state_store=None, columns=None):
+    """ Update local db for many job_ids using info from job_headers_df
 
-    return
+    Bulk version of update_job_headers_db_row(). The rows of
+    job_headers_df for job_ids are upserted into the JobHeaders table
+    with a single INSERT ... ON CONFLICT(job_id) DO UPDATE statement
+    executed for all rows in one transaction. Marking N jobs therefore
+    costs one commit instead of N deletes, N appends and N commits.
+
+    Either every row is written or, if the transaction fails, none are
+    and the sqlalchemy.exc.SQLAlchemyError is raised to the caller.
+
+    Parameters
+    ----------
+    job_headers_df: pd.DataFrame
+        DataFrame containing normalized JobHeaders data
+
+    db_path: str
+        The full path of the SQLite table that stores data from
+        JobHeaders
+
+    table_name: str
+        The name of the JobHeaders table
+
+    job_ids: list-like | None
+        The job_ids to update, typically those whose PerSecData was
+        downloaded. None updates every row in job_headers_df.
+
+    state_store: JobHeadersStateStore | None
+        A state store whose engine to use instead of creating one for
+        db_path
+
+    columns: list(str) | None
+        The table columns to write, which must include job_id. None
+        uses JOB_HEADERS_ALLOWED_COLUMNS.
+
+    Returns
+    -------
+    num_rows: int
+        The number of rows upserted
+    """
+    if columns is None:
+        columns = JOB_HEADERS_ALLOWED_COLUMNS
+
+    assert isinstance(job_headers_df, pd.DataFrame)
+    assert 'job_id' in columns
+    assert frozenset(columns) <= frozenset(job_headers_df.columns)
+
+    rows_df = job_headers_df.loc[:, columns]
+    if job_ids is not None:
+        job_ids = pd.Index(job_ids)
+        rows_df = rows_df.loc[rows_df.job_id.isin(job_ids)]
+
+        missing_job_ids = job_ids.difference(rows_df.job_id)
+        for job_id in missing_job_ids:
+            print(f'(update_job_headers_db_rows) job_id {job_id} missing!')
+
+    # Keep the last row when a job_id is repeated, like the per-row update
+    rows_df = rows_df.drop_duplicates(subset='job_id', keep='last')
+    if rows_df.empty:
+        return 0
+
+    non_key_columns = [column for column in columns if column != 'job_id']
+    column_list = ', '.join(columns)
+    value_list = ', '.join(f':{column}' for column in columns)
+    update_list = ', '.join(f'{column} = excluded.{column}' for column in non_key_columns)
+    upsert = text(f'insert into {table_name} ({column_list}) values ({value_list}) '
+                  f'on conflict(job_id) do update set {update_list}')
+    upsert = upsert.bindparams(*get_job_headers_bindparams(columns))
+
+    rows = get_job_headers_db_records(rows_df, columns)
+
+    with job_headers_engine(db_path, state_store) as engine:
+        try:
+            # One transaction and one executemany for all rows
+            with engine.begin() as connection:
+                connection.execute(upsert, rows)
+        except exc.SQLAlchemyError as error:
+            print(f'(update_job_headers_db_rows) upsert failed: {error}')
+            raise
+
+    return len(rows)
+
+def create_job_headers_catalog_table(db_path, table_name, state_store=None):
+    """ Create the full JobHeaders catalog table
+
+    The catalog table stores every column of JOB_HEADERS_CATALOG_COLUMNS
+    with the types in JOB_HEADERS_DATA_TYPE, keyed by job_id, with a
+    secondary index on each of JOB_HEADERS_CATALOG_INDEXED_COLUMNS so
+    metadata lookups are local indexed reads instead of API calls.
+
+    Keep the catalog in a different table than the one used by
+    get_jobs_to_download() to track downloads: the catalog is refreshed
+    from every JobHeaders call while the tracking table only records
+    jobs whose PerSecData was saved.
+
+    Note: this function will NOT overwrite an existing table in
+    db_path with the name table_name.
+
+    Parameters
+    ----------
+    db_path: str
+        The full path of the SQLite table that stores data from
+        JobHeaders
+
+    table_name: str
+        The name of the catalog table to create
+
+    state_store: JobHeadersStateStore | None
+        A state store whose engine to use instead of creating one for
+        db_path
+    """
+    create_job_headers_table(db_path, table_name, state_store=state_store,
+                             columns=JOB_HEADERS_CATALOG_COLUMNS,
+                             indexed_columns=JOB_HEADERS_CATALOG_INDEXED_COLUMNS)
+
+def update_job_headers_catalog(job_headers_df, db_path, table_name, state_store=None):
+    """ Upsert every row of job_headers_df into the JobHeaders catalog
+
+    Parameters
+    ----------
+    job_headers_df: pd.DataFrame
+        DataFrame containing normalized JobHeaders data with every
+        column in JOB_HEADERS_CATALOG_COLUMNS, e.g., from
+        get_current_normalized_job_headers(columns=JOB_HEADERS_CATALOG_COLUMNS)
+
+    db_path: str
+        The full path of the SQLite table that stores data from
+        JobHeaders
+
+    table_name: str
+        The name of the catalog table
+
+    state_store: JobHeadersStateStore | None
+        A state store whose engine to use instead of creating one for
+        db_path
+
+    Returns
+    -------
+    num_rows: int
+        The number of rows upserted
+    """
+    return update_job_headers_db_rows(job_headers_df, db_path, table_name,
+                                      state_store=state_store,
+                                      columns=JOB_HEADERS_CATALOG_COLUMNS)
+
+def get_job_filter_clauses(table, job_filters):
+    """ Return SQLAlchemy where clauses for JobHeaders filters
+
+    Each key of job_filters is a normalized column name and its value
+    selects rows by type:
+
+        1) A list, set or frozenset keeps rows whose value is any of
+           the given values
+        2) A tuple (low, high) keeps rows with low <= value <= high;
+           either end may be None for an open range
+        3) Any other value keeps rows equal to it
+
+    Parameters
+    ----------
+    table: sqlalchemy.Table
+        The JobHeaders table to filter
+
+    job_filters: dict
+        The filters to apply, e.g., {'operator': ['Operator A'],
+        'job_start_date': ('2020-01-01', None)}
+
+    Returns
+    -------
+    clauses: list
+        One SQLAlchemy boolean expression per filter bound
+    """
+    assert isinstance(job_filters, dict)
+    assert frozenset(job_filters) <= frozenset(table.c.keys())
+
+    clauses = []
+    for column, value in job_filters.items():
+        if isinstance(value, (list, set, frozenset)):
+            clauses.append(table.c[column].in_(list(value)))
+        elif isinstance(value, tuple):
+            assert len(value) == 2
+            low, high = value
+            if JOB_HEADERS_DATA_TYPE[column] is DateTime:
+                # Accept strings and pd.Timestamps for datetime ranges
+                low, high = [None if bound is None else pd.Timestamp(bound).to_pydatetime()
+                             for bound in value]
+            if low is not None:
+                clauses.append(table.c[column] >= low)
+            if high is not None:
+                clauses.append(table.c[column] <= high)
+        else:
+            clauses.append(table.c[column] == value)
+
+    return clauses
+
+def query_job_headers_catalog(db_path, table_name, state_store=None, columns=None,
+                              job_filters=None):
+    """ Return the JobHeaders catalog rows that match job_filters
+
+    Answer metadata questions such as "which jobs are in formation X
+    for operator Y" from the local catalog table without calling the
+    API. Filters on JOB_HEADERS_CATALOG_INDEXED_COLUMNS use the
+    secondary indexes.
+
+        query_job_headers_catalog('wdl_job_headers.db', 'job_headers_catalog',
+                                  job_filters={'operator': 'Operator Y',
+                                               'formation': 'Formation X'})
+
+    Parameters
+    ----------
+    db_path: str
+        The full path of the SQLite table that stores data from
+        JobHeaders
+
+    table_name: str
+        The name of the catalog table
+
+    state_store: JobHeadersStateStore | None
+        A state store whose engine to use instead of creating one for
+        db_path
+
+    columns: list(str) | None
+        The columns to return. None returns JOB_HEADERS_CATALOG_COLUMNS.
+
+    job_filters: dict | None
+        The filters to apply, as described in get_job_filter_clauses().
+        None returns every row.
+
+    Returns
+    -------
+    job_headers_df: pd.DataFrame
+        DataFrame with the matching catalog rows
+    """
+    if columns is None:
+        columns = JOB_HEADERS_CATALOG_COLUMNS
+    if job_filters is None:
+        job_filters = {}
+
+    assert frozenset(columns) <= frozenset(JOB_HEADERS_CATALOG_COLUMNS)
+
+    table = get_job_headers_table(table_name, MetaData(), JOB_HEADERS_CATALOG_COLUMNS,
+                                  JOB_HEADERS_CATALOG_INDEXED_COLUMNS)
+    query = select(*[table.c[column] for column in columns])
+
+    clauses = get_job_filter_clauses(table, job_filters)
+    if clauses:
+        query = query.where(and_(*clauses))
+
+    with job_headers_engine(db_path, state_store) as engine:
+        with engine.connect() as connection:
+            job_headers_df = pd.read_sql(query, connection)
+
+    return job_headers_df
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+
+""" Per-request metrics for the WDL API download functions """
+
+import os
+
+from collections import namedtuple
+from pathlib import Path
+from threading import Lock
+
+""" One WDL API request attempt as reported to a metrics_hook
+
+    endpoint: 'jobheaders' or 'persecdata'
+    job_id: the PerSecData job_id, None for JobHeaders
+    attempt: the attempt number for this download, starting at 1
+    status_code: the HTTP status code of the response
+    ttfb: seconds from sending the request to receiving the response
+        headers (time to first byte)
+    latency: seconds from sending the request until the response was
+        fully read and handled
+    handle_time: seconds spent in the handle_* function, i.e., reading,
+        parsing and saving the body
+    bytes_received: body bytes read from the connection (before any
+        content decoding), None when unknown
+    rate_limit_wait: seconds blocked in RateLimiter.acquire() before the
+        request
+    throttle_sleep: seconds this request made the caller (or everyone
+        sharing the rate limiter) wait because of a 429 response """
+RequestMetrics = namedtuple('RequestMetrics',
+                            'endpoint job_id attempt status_code ttfb latency handle_time '
+                            'bytes_received rate_limit_wait throttle_sleep')
+
+def get_response_bytes(response):
+    """ Return the number of body bytes read for response
+
+    Uses the position of the underlying urllib3 response, which counts
+    the bytes received on the wire for both streamed and non-streamed
+    responses.
+
+    Parameters
+    ----------
+    response: requests.Response
+        A response whose body has been read
+
+    Returns
+    -------
+    num_bytes: int | None
+        The number of bytes received, None when it cannot be determined
+    """
+    try:
+        return response.raw.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+""" Upper bounds in seconds of the latency and TTFB histogram buckets """
+DEFAULT_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+class PrometheusTextfileExporter:
+    """ A metrics_hook that writes Prometheus text-format metrics to a file
+
+    Pass an exporter as the metrics_hook of the download functions. It
+    aggregates every RequestMetrics record into counters and histograms
+    labelled by endpoint (and status code for the request count) and
+    rewrites filename after each record, so the node_exporter textfile
+    collector, or any tool that reads the Prometheus exposition format,
+    can scrape a running sync locally. The file is replaced atomically
+    so a scrape never sees a partial file.
+
+    The exporter is thread-safe and can be shared by concurrent
+    PerSecData workers.
+
+    Parameters
+    ----------
+    filename: pathlib.Path | str
+        The .prom file to write
+
+    namespace: str
+        The prefix of every metric name
+
+    buckets: tuple(float)
+        The upper bounds in seconds of the latency and TTFB histogram
+        buckets, in increasing order
+    """
+    def __init__(self, filename, namespace='wdl_api', buckets=DEFAULT_LATENCY_BUCKETS):
+        assert list(buckets) == sorted(buckets)
+
+        self.filename = Path(filename)
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+
+        self._lock = Lock()
+        self._requests = {}         # (endpoint, status_code) -> count
+        self._counters = {}         # (name, endpoint) -> total
+        self._histograms = {}       # (name, endpoint) -> [bucket counts, sum, count]
+
+    def __call__(self, request_metrics):
+        """ Record request_metrics and rewrite the metrics file """
+        self.record(request_metrics)
+        self.write()
+
+    def record(self, request_metrics):
+        """ Add one RequestMetrics record to the aggregates
+
+        Parameters
+        ----------
+        request_metrics: RequestMetrics
+            The record to add
+        """
+        assert isinstance(request_metrics, RequestMetrics)
+
+        endpoint = request_metrics.endpoint
+        with self._lock:
+            key = (endpoint, request_metrics.status_code)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+            for name, value in (('bytes_received_total', request_metrics.bytes_received),
+                                ('handle_seconds_total', request_metrics.handle_time),
+                                ('rate_limit_wait_seconds_total', request_metrics.rate_limit_wait),
+                                ('throttle_sleep_seconds_total', request_metrics.throttle_sleep)):
+                if value is not None:
+                    self._counters[(name, endpoint)] = self._counters.get((name, endpoint), 0) + value
+
+            for name, value in (('request_latency_seconds', request_metrics.latency),
+                                ('time_to_first_byte_seconds', request_metrics.ttfb)):
+                if value is None:
+                    continue
+                histogram = self._histograms.setdefault((name, endpoint),
+                                                        [[0] * len(self.buckets), 0.0, 0])
+                for index, bound in enumerate(self.buckets):
+                    if value <= bound:
+                        histogram[0][index] = histogram[0][index] + 1
+                histogram[1] = histogram[1] + value
+                histogram[2] = histogram[2] + 1
+
+    def get_text(self):
+        """ Return the aggregated metrics in the Prometheus text format
+
+        Returns
+        -------
+        text: str
+            The exposition text, one sample per line
+        """
+        prefix = self.namespace
+        lines = []
+
+        with self._lock:
+            lines.append(f'# HELP {prefix}_requests_total WDL API requests by endpoint and status code')
+            lines.append(f'# TYPE {prefix}_requests_total counter')
+            for (endpoint, status_code), count in sorted(self._requests.items()):
+                lines.append(f'{prefix}_requests_total{{endpoint="{endpoint}",'
+                             f'status="{status_code}"}} {count}')
+
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f'# TYPE {prefix}_{name} counter')
+                for (counter_name, endpoint), total in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(f'{prefix}_{name}{{endpoint="{endpoint}"}} {total}')
+
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f'# TYPE {prefix}_{name} histogram')
+                for (histogram_name, endpoint), histogram in sorted(self._histograms.items()):
+                    if histogram_name != name:
+                        continue
+                    bucket_counts, total, count = histogram
+                    for bound, bucket_count in zip(self.buckets, bucket_counts):
+                        lines.append(f'{prefix}_{name}_bucket{{endpoint="{endpoint}",'
+                                     f'le="{bound}"}} {bucket_count}')
+                    lines.append(f'{prefix}_{name}_bucket{{endpoint="{endpoint}",'
+                                 f'le="+Inf"}} {count}')
+                    lines.append(f'{prefix}_{name}_sum{{endpoint="{endpoint}"}} {total}')
+                    lines.append(f'{prefix}_{name}_count{{endpoint="{endpoint}"}} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self):
+        """ Atomically rewrite filename with the current metrics """
+        text = self.get_text()
+        temp_filename = self.filename.with_name(f'{self.filename.name}.{os.getpid()}.tmp')
+
+        with self._lock:
+            temp_filename.write_text(text)
+            os.replace(temp_filename, self.filename)
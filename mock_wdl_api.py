@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+
+""" A local stand-in for the WDL API for end-to-end tests and benchmarks
+
+Start a server from Python:
+
+    with MockWDLAPIServer(num_jobs=100, rows_per_job=10_000) as server:
+        os.environ['WDL_API_BASE_URL'] = server.base_url
+        ...
+
+or from the command line and point the SDK at it:
+
+    > python mock_wdl_api.py --jobs 100 --rows 10000 --port 8080
+    > WDL_API_BASE_URL=http://127.0.0.1:8080 python process.py
+"""
+
+import argparse
+import json
+import random
+
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from time import perf_counter, sleep
+from uuid import UUID
+
+from synthetic_persec import make_persec_csv
+
+""" The number of bytes written to the socket at a time """
+MOCK_WRITE_CHUNK_SIZE = 64 * 1024
+
+def make_mock_persec_csv(job_header, num_rows, seed=0):
+    """ Return a PerSecData CSV for job_header as bytes
+
+    The rows come from synthetic_persec.make_persec_csv(), so the column
+    set, stage structure and pump curves vary with the seed, and JOB
+    TIME starts at the job start date.
+
+    Parameters
+    ----------
+    job_header: dict
+        The JobHeader JSON object of the job
+
+    num_rows: int
+        The number of data rows. This number should be non-negative.
+
+    seed: int
+        The random seed for the columns and measured values
+
+    Returns
+    -------
+    csv_data: bytes
+        The CSV with header and units rows
+    """
+    return make_persec_csv(num_rows, seed=seed, well_name=job_header['wellName'],
+                           api_number=job_header['api'],
+                           start_time=job_header['jobStartDate'])
+
+class MockWDLAPIServer:
+    """ A threaded HTTP server that mimics the WDL API
+
+    The server implements GET /jobheaders, which returns a JSON array
+    of JobHeader objects shaped like the job_headers_api.handle_200
+    docstring, and GET /persecdata/<job_id>, which returns the PerSecData
+    CSV for a job. Job ids, headers and CSVs are deterministic for a
+    given seed.
+
+    The behaviour of the real API that matters for throughput can be
+    configured:
+
+        1) latency: seconds to wait before answering each request
+        2) bandwidth: a cap in bytes per second on each response body
+        3) throttle_every: every Nth request is answered with 429 and
+           a Retry-After of retry_after seconds
+        4) bad_request_job_ids / missing_job_ids: PerSecData requests
+           for these jobs are answered with 400 / 404
+        5) api_key: when given, requests without the matching bearer
+           token are answered with 401
+
+    Parameters
+    ----------
+    num_jobs: int
+        The number of jobs in the JobHeaders catalog. This number should
+        be non-negative.
+
+    rows_per_job: int | list(int)
+        The number of PerSecData rows of every job, or one number per job
+
+    latency: float
+        Seconds to wait before sending each response
+
+    bandwidth: float | None
+        The maximum response body bytes per second. None sends as fast
+        as possible.
+
+    throttle_every: int | None
+        Answer every throttle_every-th request with 429. None never
+        throttles.
+
+    retry_after: int
+        The Retry-After seconds sent with 429 responses
+
+    bad_request_job_ids: list(str)
+        Jobs whose PerSecData requests are answered with 400. Indices
+        into job_ids may be given instead of job ids.
+
+    missing_job_ids: list(str)
+        Jobs whose PerSecData requests are answered with 404. Indices
+        into job_ids may be given instead of job ids.
+
+    api_key: str | None
+        The API key the server accepts. None accepts any request.
+
+    cache_bodies: bool
+        Keep generated PerSecData CSVs in memory so repeated requests
+        are not slowed down by generation
+
+    seed: int
+        The random seed for the catalog and the CSVs
+
+    host: str
+        The interface to listen on
+
+    port: int
+        The port to listen on. 0 picks a free port (see base_url).
+    """
+    def __init__(self, num_jobs=10, rows_per_job=3600, latency=0.0, bandwidth=None,
+                 throttle_every=None, retry_after=1, bad_request_job_ids=(),
+                 missing_job_ids=(), api_key=None, cache_bodies=True, seed=0,
+                 host='127.0.0.1', port=0):
+        assert isinstance(num_jobs, int) and num_jobs >= 0
+        assert latency >= 0
+        assert bandwidth is None or bandwidth > 0
+        assert throttle_every is None or (isinstance(throttle_every, int) and throttle_every > 0)
+        assert isinstance(retry_after, int) and retry_after >= 0
+
+        if isinstance(rows_per_job, int):
+            rows_per_job = [rows_per_job] * num_jobs
+        assert len(rows_per_job) == num_jobs
+
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.api_key = api_key
+        self.cache_bodies = cache_bodies
+        self.seed = seed
+
+        self.job_headers = self.make_job_headers(num_jobs, seed)
+        self.job_ids = [job_header['jobId'] for job_header in self.job_headers]
+        self.rows_per_job = dict(zip(self.job_ids, rows_per_job))
+
+        def get_job_id(job):
+            return self.job_ids[job] if isinstance(job, int) else job
+
+        self.bad_request_job_ids = frozenset(get_job_id(job) for job in bad_request_job_ids)
+        self.missing_job_ids = frozenset(get_job_id(job) for job in missing_job_ids)
+
+        self.job_headers_body = json.dumps(self.job_headers).encode('utf-8')
+        self._persec_bodies = {}
+        self._lock = Lock()
+        self.num_requests = 0
+        self.status_counts = {}
+        self.bytes_sent = 0
+
+        self._server = ThreadingHTTPServer((host, port), MockWDLAPIRequestHandler)
+        self._server.daemon_threads = True
+        self._server.mock_api = self
+        self._thread = None
+
+    @staticmethod
+    def make_job_headers(num_jobs, seed=0):
+        """ Return num_jobs JobHeader objects
+
+        Parameters
+        ----------
+        num_jobs: int
+            The number of JobHeader objects
+
+        seed: int
+            The random seed
+
+        Returns
+        -------
+        job_headers: list(dict)
+            JobHeader objects with every key of
+            job_headers_api.EXPECTED_JOB_HEADERS_COLUMNS
+        """
+        rng = random.Random(seed)
+        operators = ['WDL Demo Operator', 'Mock Operator A', 'Mock Operator B']
+        formations = ['Sample', 'Niobrara', 'Codell', 'Wolfcamp']
+        start_date = datetime(2015, 1, 1, 12)
+
+        job_headers = []
+        for job_number in range(num_jobs):
+            job_start_date = start_date + timedelta(days=3 * job_number)
+            measured_depth = rng.randint(8000, 22000)
+            job_headers.append({
+                'jobId': str(UUID(int=rng.getrandbits(128), version=4)),
+                'wellId': str(UUID(int=rng.getrandbits(128), version=4)),
+                'wellName': f'Mock Well {job_number}',
+                'api': f'05-123-{job_number:05d}-00-00',
+                'jobStartDate': f'{job_start_date:%Y-%m-%dT%H:%M:%S}',
+                'serviceCompany': 'Demo Service Company',
+                'fleet': 'WDL',
+                'operator': operators[job_number % len(operators)],
+                'assetGroup': 'WDL Demo Asset Group',
+                'formation': formations[job_number % len(formations)],
+                'jobType': 'Initial Completion',
+                'fracSystem': 'Ball and Sleeve',
+                'fluidSystem': 'Slickwater',
+                'bottomholeLatitude': round(40 + rng.random(), 6),
+                'bottomholeLongitude': round(-104 - rng.random(), 6),
+                'measuredDepth': measured_depth,
+                'measuredDepthUnitText': 'feet',
+                'verticalDepth': measured_depth - rng.randint(1000, 4000),
+                'verticalDepthUnitText': 'feet',
+                'lateralLength': rng.randint(4000, 12000),
+                'lateralLengthUnitText': 'feet',
+                'stageCount': rng.randint(10, 60),
+                'plannedStages': rng.randint(10, 60),
+                'padName': f'Mock Pad {job_number // 4}',
+                'county': 'Weld',
+                'state': 'CO',
+                'surfaceLatitude': round(40 + rng.random(), 6),
+                'surfaceLongitude': round(-104 - rng.random(), 6),
+                'legalDescription': '"legal information can go here."',
+                'modifiedUtc': f'{job_start_date + timedelta(days=30):%Y-%m-%dT%H:%M:%S}'})
+
+        return job_headers
+
+    @property
+    def base_url(self):
+        """ The URL to set as WDL_API_BASE_URL """
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def get_persec_body(self, job_id):
+        """ Return the PerSecData CSV for job_id as bytes """
+        with self._lock:
+            body = self._persec_bodies.get(job_id)
+        if body is not None:
+            return body
+
+        job_header = self.job_headers[self.job_ids.index(job_id)]
+        body = make_mock_persec_csv(job_header, self.rows_per_job[job_id],
+                                    seed=self.seed + self.job_ids.index(job_id))
+        if self.cache_bodies:
+            with self._lock:
+                self._persec_bodies[job_id] = body
+
+        return body
+
+    def next_request_number(self):
+        """ Count a request and return its 1-based number """
+        with self._lock:
+            self.num_requests = self.num_requests + 1
+            return self.num_requests
+
+    def record_response(self, status_code, num_bytes):
+        """ Count a response by status code and body size """
+        with self._lock:
+            self.status_counts[status_code] = self.status_counts.get(status_code, 0) + 1
+            self.bytes_sent = self.bytes_sent + num_bytes
+
+    def start(self):
+        """ Serve requests on a background thread """
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stop serving and close the socket """
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+class MockWDLAPIRequestHandler(BaseHTTPRequestHandler):
+    """ Answer one WDL API request for the MockWDLAPIServer in self.server """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args): #pylint: disable=redefined-builtin
+        """ Keep the benchmark output quiet """
+
+    def do_GET(self): #pylint: disable=invalid-name
+        """ Route GET /jobheaders and GET /persecdata/<job_id> """
+        mock_api = self.server.mock_api
+        request_number = mock_api.next_request_number()
+
+        if mock_api.latency:
+            sleep(mock_api.latency)
+
+        path = self.path.split('?')[0].rstrip('/')
+        expected_authorization = f'Bearer {mock_api.api_key}'
+
+        if mock_api.api_key is not None and self.headers.get('Authorization') != expected_authorization:
+            self.send_body(401, b'', 'text/plain')
+        elif mock_api.throttle_every and request_number % mock_api.throttle_every == 0:
+            self.send_body(429, b'', 'text/plain',
+                           extra_headers={'Retry-After': str(mock_api.retry_after)})
+        elif path == '/jobheaders':
+            self.send_body(200, mock_api.job_headers_body,
+                           'application/json; charset=utf-8')
+        elif path.startswith('/persecdata/'):
+            job_id = path[len('/persecdata/'):]
+            if job_id in mock_api.bad_request_job_ids:
+                self.send_body(400, b'', 'text/plain')
+            elif job_id in mock_api.missing_job_ids or job_id not in mock_api.rows_per_job:
+                self.send_body(404, b'', 'text/plain')
+            else:
+                self.send_body(200, mock_api.get_persec_body(job_id), 'text/csv')
+        else:
+            self.send_body(404, b'', 'text/plain')
+
+    def send_body(self, status_code, body, content_type, extra_headers=None):
+        """ Send a complete response, pacing the body to the bandwidth cap """
+        mock_api = self.server.mock_api
+
+        self.send_response(status_code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        start_time = perf_counter()
+        for offset in range(0, len(body), MOCK_WRITE_CHUNK_SIZE):
+            chunk = body[offset:offset + MOCK_WRITE_CHUNK_SIZE]
+            self.wfile.write(chunk)
+
+            if mock_api.bandwidth is not None:
+                # Sleep until the bytes sent so far fit in the bandwidth cap
+                delay = (offset + len(chunk)) / mock_api.bandwidth - (perf_counter() - start_time)
+                if delay > 0:
+                    sleep(delay)
+
+        mock_api.record_response(status_code, len(body))
+
+def main():
+    """ Run a mock WDL API server until interrupted """
+    parser = argparse.ArgumentParser(description='Serve a mock WDL API')
+    parser.add_argument('--jobs', type=int, default=10, help='number of jobs')
+    parser.add_argument('--rows', type=int, default=3600, help='PerSecData rows per job')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds before each response')
+    parser.add_argument('--bandwidth', type=float, default=None,
+                        help='response body bytes per second')
+    parser.add_argument('--throttle-every', type=int, default=None,
+                        help='answer every Nth request with 429')
+    parser.add_argument('--retry-after', type=int, default=1,
+                        help='Retry-After seconds sent with 429')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--host', default='127.0.0.1', help='interface to listen on')
+    parser.add_argument('--port', type=int, default=8080, help='port to listen on')
+    args = parser.parse_args()
+
+    server = MockWDLAPIServer(num_jobs=args.jobs, rows_per_job=args.rows, latency=args.latency,
+                              bandwidth=args.bandwidth, throttle_every=args.throttle_every,
+                              retry_after=args.retry_after, seed=args.seed,
+                              host=args.host, port=args.port)
+    print(f'Serving a mock WDL API with {args.jobs} jobs at {server.base_url}')
+    with server:
+        try:
+            while True:
+                sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
@@ -2,27 +2,54 @@
 
 """ Utility functions for working with the WDL PerSecData API """
 
-from io import StringIO
-from time import sleep
+import csv
+import hashlib
+import json
+import os
+
+from io import BufferedReader, BytesIO, RawIOBase
+from time import perf_counter, sleep
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
 from functools import partial
 from pathlib import Path
+from shutil import copyfileobj
+from tempfile import SpooledTemporaryFile
 from types import FunctionType
 
+import numpy as np
 import pandas as pd
 
 import requests
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from api_client import WDLClient, get_api_base_url
+from job_filters import filter_job_headers
+from metrics import RequestMetrics, get_response_bytes
+from rate_limiter import RateLimiter
+from tracing import NULL_TRACER
+
 PerSecFilenames = namedtuple('PerSecFilenames',
-                             'raw_filename formatted_filename units_filename')
+                             'raw_filename formatted_filename units_filename '
+                             'columnar_filename state_filename hash_filename',
+                             defaults=(None, None, None))
 PerSecFilenames.__doc__ = """\
     A tuple storing target filenames for various possible CSVs for a job
 
     The module uses this named tuple to pass target filenames for storing the:
 
         1) raw PerSec CSV data,
-        2) formatted PerSec CSV data, and
-        3) PerSec units data An empty
+        2) formatted PerSec CSV data,
+        3) PerSec units data, and
+        4) formatted PerSec data in a columnar (Parquet/Arrow) file
 
     An empty string or None entry indicates the user does not want to save
     the data in the corresponding file type (raw/formatted/units). The entries
@@ -38,6 +65,21 @@ PerSecFilenames.__doc__ = """\
 
     units: str | None | pathlib.Path
         The filename to store the units data
+
+    columnar: str | None | pathlib.Path
+        The filename to store the formatted data as Parquet (.parquet)
+        or Arrow IPC (.arrow). Defaults to None.
+
+    state: str | None | pathlib.Path
+        The filename of the JSON file recording what has been stored for
+        the job (see save_persec_outputs()). When given, the outputs are
+        updated incrementally. Defaults to None.
+
+    hash: str | None | pathlib.Path
+        The filename recording the SHA-256 hash of the last stored
+        payload (see is_persec_content_unchanged()). When given, or when
+        a state file is given, a byte-identical payload is not written
+        again. Defaults to None.
 """
 
 def get_api_url(job_id):
@@ -47,6 +89,9 @@ def get_api_url(job_id):
 
         https://api.welldatalabs.com/persecdata/<job_id>
 
+    The host can be changed with the WDL_API_BASE_URL environment
+    variable (see api_client.get_api_base_url).
+
     Parameters
     ----------
     job_id: str
@@ -57,11 +102,10 @@ def get_api_url(job_id):
     url: str
         The PersecData API endpoing
     """
-    protocol = 'https'
-    base_url = 'api.welldatalabs.com'
+    base_url = get_api_base_url()
     endpoint = 'persecdata'
 
-    url = f'{protocol}://{base_url}/{endpoint}/{job_id}'
+    url = f'{base_url}/{endpoint}/{job_id}'
     return url
 
 def get_api_auth_headers(api_key):
@@ -97,6 +141,33 @@ def get_api_auth_headers(api_key):
     headers = {'Authorization': f'Bearer {api_key}'}
     return headers
 
+@contextmanager
+def open_persec_csv(csv_data):
+    """ Open csv_data as a binary file object for save_persec_outputs()
+
+    Parameters
+    ----------
+    csv_data: str | bytes | pathlib.Path | file object
+        The CSV data as a string or bytes, the path of a CSV file, or a
+        binary file object positioned at the start of the CSV. A file
+        object is not closed.
+
+    Yields
+    ------
+    csv_file: file object
+        A binary file object positioned at the start of the CSV
+    """
+    if isinstance(csv_data, str):
+        yield BytesIO(csv_data.encode('utf-8'))
+    elif isinstance(csv_data, bytes):
+        yield BytesIO(csv_data)
+    elif isinstance(csv_data, Path):
+        with csv_data.open('rb') as csv_file:
+            yield csv_file
+    else:
+        assert hasattr(csv_data, 'read')
+        yield csv_data
+
 def save_raw_persec_data(csv_data, filename):
     """ Save the raw CSV to filename
 
@@ -116,23 +187,26 @@ def save_raw_persec_data(csv_data, filename):
         0.490000,0.000000,7.310000,0.000000,0.000000,0.000000
         ...
 
-    This function saves the raw CSV to filename.
+    This function saves the raw CSV to filename. It is a thin wrapper
+    over save_persec_outputs(), which copies the bytes without parsing
+    them.
 
     Note: not every PerSecData CSV files has the same columns.
 
     Parameters
     ----------
-    csv_data: str
-        The CSV data as a string
+    csv_data: str | bytes | pathlib.Path | file object
+        The CSV data (see open_persec_csv())
 
     filename: str or pathlib.Path
         The target filename for storing the raw CSV data
     """
-    assert isinstance(csv_data, str)
     assert isinstance(filename, str) or isinstance(filename, Path)
 
-    with open(filename, 'w') as csv_file:
-        csv_file.write(csv_data)
+    with open_persec_csv(csv_data) as csv_file:
+        save_persec_outputs(csv_file, PerSecFilenames(raw_filename=filename,
+                                                      formatted_filename=None,
+                                                      units_filename=None))
 
 def format_persec_column_label(label):
     """ Return a re-formatted PerSecData column label
@@ -158,7 +232,120 @@ def format_persec_column_label(label):
 
     return formatted_label
 
-def save_formatted_persec_data(csv_data, filename):
+""" The datetime format of the PerSecData JOB TIME column """
+PERSEC_JOB_TIME_FORMAT = '%m/%d/%y %H:%M:%S'
+
+def parse_persec_job_time(job_time):
+    """ Return the PerSecData JOB TIME strings in job_time as datetimes
+
+    PerSecData timestamps always have the fixed 17 character layout
+    "06/17/18 04:15:08" (PERSEC_JOB_TIME_FORMAT). Rather than going
+    through the generic pd.to_datetime(format=...) parser, the strings
+    are viewed as a (rows x 18) byte matrix and the digits at their
+    fixed positions are combined with vectorized numpy arithmetic. Two
+    digit years follow the strptime %y convention (69-99 are 1900s).
+
+    If any value does not match the layout exactly (missing values,
+    other lengths, invalid dates, ...) the function falls back to
+    pd.to_datetime(format=PERSEC_JOB_TIME_FORMAT), so the values and
+    errors match the generic parser. Both paths return nanosecond
+    resolution (pd.to_datetime() infers a coarser unit on pandas 3), so
+    the dtype does not depend on the contents of job_time.
+
+    Parameters
+    ----------
+    job_time: pd.Series
+        The JOB TIME strings
+
+    Returns
+    -------
+    parsed_job_time: pd.Series
+        The JOB TIME values as a datetime64[ns] Series with the index
+        and name of job_time
+    """
+    def generic_parse():
+        return pd.to_datetime(job_time, format=PERSEC_JOB_TIME_FORMAT).astype('datetime64[ns]')
+
+    assert isinstance(job_time, pd.Series)
+
+    if job_time.empty or not (pd.api.types.is_object_dtype(job_time.dtype)
+                              or pd.api.types.is_string_dtype(job_time.dtype)):
+        return generic_parse()
+
+    # View the strings as bytes; one spare column detects longer strings
+    try:
+        job_time_bytes = job_time.to_numpy(dtype=object).astype('S18')
+    except (UnicodeEncodeError, TypeError, ValueError):
+        return generic_parse()
+
+    chars = job_time_bytes.view(np.uint8).reshape(-1, 18)
+
+    # Check the layout: 17 characters with separators at fixed positions
+    separators = {2: ord('/'), 5: ord('/'), 8: ord(' '), 11: ord(':'), 14: ord(':')}
+    digit_positions = [0, 1, 3, 4, 6, 7, 9, 10, 12, 13, 15, 16]
+
+    digits = chars[:, digit_positions].astype(np.int64) - ord('0')
+    valid = (chars[:, 17] == 0) & ((digits >= 0) & (digits <= 9)).all(axis=1)
+    for position, separator in separators.items():
+        valid &= chars[:, position] == separator
+
+    if not valid.all():
+        return generic_parse()
+
+    # Combine the digit pairs into the date and time fields
+    month, day, year, hour, minute, second = (digits[:, 0::2] * 10 + digits[:, 1::2]).T
+    year = np.where(year < 69, 2000 + year, 1900 + year)
+
+    months_since_epoch = (year - 1970) * 12 + (month - 1)
+    first_of_month = months_since_epoch.astype('datetime64[M]').astype('datetime64[D]')
+    date = first_of_month + (day - 1)
+
+    # Reject out of range fields, e.g., 02/30 rolls into March
+    valid = ((month >= 1) & (month <= 12) & (day >= 1)
+             & (date.astype('datetime64[M]') == first_of_month.astype('datetime64[M]'))
+             & (hour < 24) & (minute < 60) & (second < 60))
+
+    if not valid.all():
+        return generic_parse()
+
+    seconds = (hour * 3600 + minute * 60 + second).astype('timedelta64[s]')
+    parsed = (date.astype('datetime64[s]') + seconds).astype('datetime64[ns]')
+
+    return pd.Series(parsed, index=job_time.index, name=job_time.name)
+
+def format_persec_dataframe(persec_df):
+    """ Return persec_df with formatted column labels and job_time column
+
+    The column labels are converted to snake case using
+    format_persec_column_label() and the job_time column is cast to a
+    Pandas datetime column using the "%m/%d/%y %H:%M:%S" format (see
+    parse_persec_job_time()).
+
+    Parameters
+    ----------
+    persec_df: pd.DataFrame
+        The PerSecData rows (without the units row) using the original
+        column labels
+
+    Returns
+    -------
+    formatted_df: pd.DataFrame
+        The formatted PerSecData
+    """
+    assert isinstance(persec_df, pd.DataFrame)
+
+    # Re-format the column headers
+    persec_df.columns = [format_persec_column_label(column)
+                         for column in persec_df.columns]
+
+    # Format the job_time column
+    assert 'job_time' in persec_df.columns
+    formatted_df = (persec_df
+                    .assign(job_time=lambda x: parse_persec_job_time(x.job_time)))
+
+    return formatted_df
+
+def save_formatted_persec_data(csv_data, filename, chunksize=None):
     """ Save a mildly formatted version of csv_data to filename
 
     The raw CSV has the following structure:
@@ -186,34 +373,69 @@ def save_formatted_persec_data(csv_data, filename):
     row prevents Python/R from correctly inferring the data type of the
     columns when they are read in.
 
+    This is a thin wrapper over save_persec_outputs(). When chunksize is
+    given the CSV is read, formatted and appended to filename in blocks
+    of chunksize rows. Pass the CSV as a path or a binary file object
+    so that memory use is bounded by chunksize rather than the job
+    length; a str or bytes csv_data is already held in memory whole.
+
     Note: not every PerSecData CSV files has the same columns.
 
     Parameters
     ----------
-    csv_data: str
-        The CSV data as a string
+    csv_data: str | bytes | pathlib.Path | file object
+        The CSV data (see open_persec_csv())
 
     filename: str or pathlib.Path
         The target filename for storing the formatted CSV data
+
+    chunksize: int | None
+        The number of rows to format at a time. None formats all rows
+        at once.
     """
-    assert isinstance(csv_data, str)
     assert isinstance(filename, str) or isinstance(filename, Path)
+    assert chunksize is None or (isinstance(chunksize, int) and chunksize > 0)
+
+    with open_persec_csv(csv_data) as csv_file:
+        save_persec_outputs(csv_file, PerSecFilenames(raw_filename=None,
+                                                      formatted_filename=filename,
+                                                      units_filename=None),
+                            chunksize=chunksize)
+
+def format_persec_units_dataframe(units_df):
+    """ Return a units DataFrame with formatted column labels and units
+
+    The column labels are converted to snake case using
+    format_persec_column_label() and the parentheses surrounding each
+    unit are removed.
+
+    Parameters
+    ----------
+    units_df: pd.DataFrame
+        A one row DataFrame holding the original header and units row
+
+    Returns
+    -------
+    formatted_units_df: pd.DataFrame
+        A one row DataFrame with the formatted header and units
+    """
+    def strip_parentheses(unit):
+        """ Remove parentheses from unit str """
+        return unit.translate({ord(i): None for i in '()'})
 
-    # Read csv_data into a pd.DataFrame skipping the units row
-    persec_df = pd.read_csv(StringIO(csv_data), skiprows=[1])
+    assert isinstance(units_df, pd.DataFrame)
 
     # Re-format the column headers
-    persec_df.columns = [format_persec_column_label(column)
-                         for column in persec_df.columns]
+    updated_columns = [format_persec_column_label(column)
+                       for column in units_df.columns]
 
-    # Format the job_time column
-    assert 'job_time' in persec_df.columns
-    persec_df = (persec_df
-                 .assign(job_time=lambda x: pd.to_datetime(x.job_time,
-                                                           format='%m/%d/%y %H:%M:%S')))
+    # Strip parentheses from the units
+    updated_units = [strip_parentheses(unit) for unit in units_df.iloc[0]]
 
-    # Write persec_df to filename without default Pandas index column
-    persec_df.to_csv(filename, index=False)
+    # Build a new DataFrame from re-formatted header and units row
+    formatted_units_df = pd.DataFrame(data=[updated_units], columns=updated_columns)
+
+    return formatted_units_df
 
 def save_persec_units_data(csv_data, filename):
     """ Save the units data in csv_data to filename
@@ -251,40 +473,897 @@ def save_persec_units_data(csv_data, filename):
         dattime,min,min,min,none,none,none,psi,psi,psi,\
         psi,bpm,bbl,bbl,lbs,lbs/gal,lbs/gal
 
+    This is a thin wrapper over save_persec_outputs(), which only reads
+    the first two rows of csv_data.
+
     Note: not every PerSecData CSV files has the same columns.
 
     Parameters
     ----------
-    csv_data: str
-        The CSV data as a string
+    csv_data: str | bytes | pathlib.Path | file object
+        The CSV data (see open_persec_csv())
 
     filename: str or pathlib.Path
         The target filename for storing the units data
     """
-    def strip_parentheses(unit):
-        """ Remove parentheses from unit str """
-        return unit.translate({ord(i): None for i in '()'})
-
-    assert isinstance(csv_data, str)
     assert isinstance(filename, str) or isinstance(filename, Path)
 
-    # Read the first two rows of csv_data into a pd.DataFrame
-    units_df = pd.read_csv(StringIO(csv_data), nrows=1)
+    with open_persec_csv(csv_data) as csv_file:
+        save_persec_outputs(csv_file, PerSecFilenames(raw_filename=None,
+                                                      formatted_filename=None,
+                                                      units_filename=filename))
 
-    # Re-format the column headers
-    updated_columns = [format_persec_column_label(column)
-                       for column in units_df.columns]
+""" Formatted PerSecData columns stored as dictionary encoded categoricals """
+PERSEC_CATEGORICAL_COLUMNS = frozenset(['well_name', 'api_number'])
 
-    # Strip parentheses from the units
-    updated_units = [strip_parentheses(unit) for unit in units_df.iloc[0]]
+""" File suffixes written as Arrow IPC files; anything else is Parquet """
+ARROW_IPC_SUFFIXES = frozenset(['.arrow', '.feather', '.ipc'])
 
-    # Build a new DataFrame from re-formatted header and units row
-    units_df = pd.DataFrame(data=[updated_units], columns=updated_columns)
+def get_persec_arrow_schema(formatted_df, formatted_units):
+    """ Return the Arrow schema for formatted PerSecData
+
+    Column types are taken from formatted_df:
+
+        1) job_time is a timestamp (millisecond resolution),
+        2) well_name and api_number are dictionary encoded strings,
+        3) integer columns are int64 and other numbers are float64,
+        4) other text columns are strings, except that columns with a
+           unit other than "none" are float64 when formatted_df is empty.
+
+    Each field carries its unit as the b'units' field metadata and the
+    schema metadata maps every column to its unit under b'persec_units'.
+
+    Parameters
+    ----------
+    formatted_df: pd.DataFrame
+        Formatted PerSecData, e.g., from format_persec_dataframe()
+
+    formatted_units: dict
+        Maps each formatted column label to its unit without parentheses
+
+    Returns
+    -------
+    schema: pyarrow.Schema
+        The schema used to write the columnar file
+    """
+    def get_arrow_type(column, dtype):
+        if column == 'job_time':
+            return pa.timestamp('ms')
+        if column in PERSEC_CATEGORICAL_COLUMNS:
+            return pa.dictionary(pa.int32(), pa.string())
+        if pd.api.types.is_integer_dtype(dtype):
+            return pa.int64()
+        if pd.api.types.is_numeric_dtype(dtype):
+            return pa.float64()
+        if formatted_df.empty and formatted_units.get(column, 'none') != 'none':
+            # An empty frame has no dtypes to go by; measured columns are numbers
+            return pa.float64()
+        return pa.string()
+
+    assert isinstance(formatted_df, pd.DataFrame)
+
+    fields = [pa.field(column,
+                       get_arrow_type(column, dtype),
+                       metadata={'units': formatted_units.get(column, '')})
+              for column, dtype in formatted_df.dtypes.items()]
+    metadata = {'persec_units': json.dumps(formatted_units)}
+
+    return pa.schema(fields, metadata=metadata)
+
+class PerSecColumnarWriter:
+    """ Write formatted PerSecData to a compressed Parquet or Arrow IPC file
+
+    The file type is chosen from the filename suffix: .arrow, .feather
+    and .ipc produce an Arrow IPC file, anything else a Parquet file.
+    Both are zstd compressed. The schema is fixed by the first call to
+    write() (see get_persec_arrow_schema()); later blocks are cast to it.
+
+    Parquet and Arrow IPC files cannot be appended to in place. When
+    keep_existing_rows is given, the first keep_existing_rows rows of the
+    existing file are copied batch by batch into a temporary file, the
+    new rows are written after them, and the temporary file replaces the
+    original on close(). The existing schema is kept.
+
+    Use the writer as a context manager so the file footer is written:
+
+        with PerSecColumnarWriter(filename, formatted_units) as writer:
+            writer.write(formatted_df)
+
+    Parameters
+    ----------
+    filename: str | pathlib.Path
+        The target filename for the columnar data
+
+    formatted_units: dict
+        Maps each formatted column label to its unit without parentheses
+
+    keep_existing_rows: int | None
+        The number of rows of the existing file to keep ahead of the new
+        rows. None overwrites the file.
+    """
+    def __init__(self, filename, formatted_units, keep_existing_rows=None):
+        if pa is None:
+            raise ImportError('pyarrow is required for columnar PerSecData output: '
+                              'pip install pyarrow')
+
+        assert isinstance(filename, (str, Path))
+        assert isinstance(formatted_units, dict)
+        assert keep_existing_rows is None or keep_existing_rows >= 0
+
+        self.filename = Path(filename)
+        self.formatted_units = formatted_units
+        self.keep_existing_rows = keep_existing_rows
+        self.is_arrow_ipc = self.filename.suffix.lower() in ARROW_IPC_SUFFIXES
+        self.schema = None
+        self.num_rows = 0
+        self._target = self.filename
+        self._sink = None
+        self._writer = None
+
+    def _iter_existing_batches(self):
+        """ Yield the record batches of the existing file """
+        if self.is_arrow_ipc:
+            with pa.memory_map(str(self.filename), 'r') as source:
+                reader = pa.ipc.open_file(source)
+                for batch_number in range(reader.num_record_batches):
+                    yield reader.get_batch(batch_number)
+        else:
+            yield from pq.ParquetFile(str(self.filename)).iter_batches()
+
+    def _get_existing_schema(self):
+        """ Return the schema of the existing file """
+        if self.is_arrow_ipc:
+            with pa.memory_map(str(self.filename), 'r') as source:
+                return pa.ipc.open_file(source).schema
+
+        return pq.read_schema(str(self.filename))
+
+    def _open(self, formatted_df):
+        """ Create the schema from the first block and open the file """
+        if self.keep_existing_rows is None:
+            self.schema = get_persec_arrow_schema(formatted_df, self.formatted_units)
+        else:
+            self.schema = self._get_existing_schema()
+            self._target = self.filename.with_name(self.filename.name + '.tmp')
+
+        if self.is_arrow_ipc:
+            self._sink = pa.OSFile(str(self._target), 'wb')
+            options = pa.ipc.IpcWriteOptions(compression='zstd')
+            self._writer = pa.ipc.new_file(self._sink, self.schema, options=options)
+        else:
+            self._writer = pq.ParquetWriter(str(self._target), self.schema,
+                                            compression='zstd')
+
+        # Copy the rows being kept from the existing file
+        if self.keep_existing_rows is not None:
+            for batch in self._iter_existing_batches():
+                batch = batch.slice(0, self.keep_existing_rows - self.num_rows)
+                if batch.num_rows == 0:
+                    break
+
+                self._writer.write_batch(batch)
+                self.num_rows = self.num_rows + batch.num_rows
+
+    def write(self, formatted_df):
+        """ Append the rows in formatted_df to the columnar file
+
+        Parameters
+        ----------
+        formatted_df: pd.DataFrame
+            Formatted PerSecData, e.g., from format_persec_dataframe()
+        """
+        assert isinstance(formatted_df, pd.DataFrame)
+
+        if self._writer is None:
+            self._open(formatted_df)
+
+        table = pa.Table.from_pandas(formatted_df, schema=self.schema, preserve_index=False)
+        self._writer.write_table(table)
+        self.num_rows = self.num_rows + table.num_rows
+
+    def close(self, discard=False):
+        """ Write the file footer and close the file
+
+        Parameters
+        ----------
+        discard: bool
+            Throw away a file being appended to instead of replacing
+            the original, e.g., after an error
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+        if self._target != self.filename and self._target.exists():
+            if discard:
+                self._target.unlink()
+            else:
+                self._target.replace(self.filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(discard=exc_type is not None)
+
+class TeeReader:
+    """ A read-only file object that copies everything it reads to a sink
+
+    Wrapping the PerSecData body in a TeeReader lets the raw CSV be
+    written as a side effect of parsing the body, so the body is read
+    exactly once no matter how many outputs are requested.
+
+    Parameters
+    ----------
+    source: file object
+        The file object to read from
+
+    sink: file object
+        The file object every read is written to
+    """
+    def __init__(self, source, sink):
+        self.source = source
+        self.sink = sink
+
+    def read(self, size=-1):
+        """ Read up to size bytes from source and copy them to sink """
+        data = self.source.read(size)
+        self.sink.write(data)
+        return data
+
+    def readline(self, size=-1):
+        """ Read a line from source and copy it to sink """
+        line = self.source.readline(size)
+        self.sink.write(line)
+        return line
+
+    def __iter__(self):
+        return iter(self.readline, self.source.read(0))
+
+class IterContentReader(RawIOBase):
+    """ A raw binary file object over a streamed response's iter_content
+
+    This adapts requests.Response.iter_content() to the file object
+    interface so a streamed body can be wrapped in io.BufferedReader
+    and read incrementally like a local file.
+
+    Parameters
+    ----------
+    response: requests.Response
+        The streamed response from the HTTP request
+
+    chunk_size: int
+        The number of bytes to read from the response at a time
+
+    hasher: hashlib hash object | None
+        Updated with every chunk as it is received, so the body can be
+        hashed without a second pass
+    """
+    def __init__(self, response, chunk_size=1024 * 1024, hasher=None):
+        super().__init__()
+        self._chunks = response.iter_content(chunk_size=chunk_size)
+        self._pending = b''
+        self._hasher = hasher
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        """ Fill buffer with the next bytes of the body, 0 at end of body """
+        while not self._pending:
+            self._pending = next(self._chunks, None)
+            if self._pending is None:
+                self._pending = b''
+                return 0
+            if self._hasher is not None:
+                self._hasher.update(self._pending)
+
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+def read_persec_preamble(csv_file, encoding='utf-8'):
+    """ Read the header and units rows of a PerSecData CSV
+
+    The first two lines of csv_file are consumed, leaving csv_file
+    positioned at the first data row.
+
+    Parameters
+    ----------
+    csv_file: file object
+        A binary file object positioned at the start of the PerSecData CSV
+
+    encoding: str
+        The encoding used to decode the two rows
+
+    Returns
+    -------
+    preamble: tuple(bytes, list, list)
+        The raw bytes of the two rows, the column labels and the units
+    """
+    header_line = csv_file.readline()
+    units_line = csv_file.readline()
+
+    columns = next(csv.reader([header_line.decode(encoding)]), [])
+    units = next(csv.reader([units_line.decode(encoding)]), [])
+
+    return header_line + units_line, columns, units
+
+def read_persec_body(body_file, columns, chunksize=None, encoding='utf-8'):
+    """ Yield the PerSecData rows in body_file as DataFrames
+
+    body_file should be positioned after the units row (see
+    read_persec_preamble()). With chunksize set, the rows are yielded in
+    blocks of chunksize rows; otherwise all rows are yielded as a single
+    DataFrame. At least one (possibly empty) DataFrame is always yielded.
+
+    Parameters
+    ----------
+    body_file: file object
+        A binary file object positioned at the first data row
+
+    columns: list
+        The original column labels from the header row
+
+    chunksize: int | None
+        The number of rows per block. None reads all rows at once.
+
+    encoding: str
+        The encoding of the CSV bytes
+
+    Yields
+    ------
+    persec_df: pd.DataFrame
+        A block of PerSecData rows using the original column labels
+    """
+    try:
+        persec_blocks = pd.read_csv(body_file, header=None, names=columns, chunksize=chunksize,
+                                    encoding=encoding)
+    except pd.errors.EmptyDataError:
+        yield pd.DataFrame(data=None, columns=columns)
+        return
+
+    if chunksize is None:
+        yield persec_blocks
+        return
+
+    with persec_blocks:
+        yield from persec_blocks
+
+class PushbackReader:
+    """ A read-only file object that returns prefix before reading source
+
+    Used to put back the line that was read past while skipping rows
+    that are already stored.
+
+    Parameters
+    ----------
+    prefix: bytes
+        The bytes to return before reading from source
+
+    source: file object
+        The file object to read from once prefix is exhausted
+    """
+    def __init__(self, prefix, source):
+        self.prefix = prefix
+        self.source = source
+
+    def read(self, size=-1):
+        """ Read up to size bytes, starting with the prefix """
+        if not self.prefix:
+            return self.source.read(size)
+
+        if size is None or size < 0:
+            data = self.prefix + self.source.read()
+            self.prefix = b''
+            return data
+
+        data = self.prefix[:size]
+        self.prefix = self.prefix[size:]
+        return data
+
+    def readline(self, size=-1):
+        """ Read a line, starting with the prefix """
+        if not self.prefix:
+            return self.source.readline(size)
+
+        line = self.prefix
+        self.prefix = b''
+        if not line.endswith(b'\n'):
+            line = line + self.source.readline()
+        return line
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+""" A strftime format whose strings sort chronologically """
+JOB_TIME_KEY_FORMAT = '%Y%m%d%H:%M:%S'
+
+def get_persec_job_time_key(job_time):
+    """ Return a string that sorts PerSecData JOB TIME strings chronologically
+
+    JOB TIME strings ("06/17/18 04:15:08") do not sort chronologically as
+    text. The key rearranges the fixed character positions into
+    JOB_TIME_KEY_FORMAT ("2018061704:15:08") by slicing, which is much
+    cheaper than datetime.strptime() when skipping millions of rows.
+    Strings that do not follow the fixed layout go through strptime().
+
+    Parameters
+    ----------
+    job_time: str
+        A JOB TIME string
+
+    Returns
+    -------
+    key: str
+        The job time in JOB_TIME_KEY_FORMAT
+    """
+    if (len(job_time) == 17 and job_time[2] == '/' and job_time[5] == '/'
+            and job_time[8] == ' '):
+        year = job_time[6:8]
+        century = '19' if year >= '69' else '20'
+        return century + year + job_time[0:2] + job_time[3:5] + job_time[9:17]
+
+    return datetime.strptime(job_time, PERSEC_JOB_TIME_FORMAT).strftime(JOB_TIME_KEY_FORMAT)
+
+def skip_persec_rows_through(csv_file, last_job_time):
+    """ Consume the rows of csv_file up to and including last_job_time
+
+    PerSecData rows are in job time order, so every row up to the first
+    row newer than last_job_time is already stored. That newer row is
+    returned so the caller can put it back (see PushbackReader).
+
+    Parameters
+    ----------
+    csv_file: file object
+        A binary file object positioned at the first data row
+
+    last_job_time: datetime.datetime
+        The job time of the last row already stored
+
+    Returns
+    -------
+    first_new_line: bytes
+        The first row newer than last_job_time, or an empty bytes object
+        when there is no newer row
+    """
+    last_key = last_job_time.strftime(JOB_TIME_KEY_FORMAT)
+
+    for line in iter(csv_file.readline, b''):
+        job_time = line.split(b',', 1)[0].decode('ascii').strip()
+        if job_time and get_persec_job_time_key(job_time) > last_key:
+            return line
+
+    return b''
+
+def load_persec_state(filename):
+    """ Return the job state saved by save_persec_state(), or None
+
+    Parameters
+    ----------
+    filename: str or pathlib.Path
+        The JSON state file for the job
+
+    Returns
+    -------
+    state: dict | None
+        The saved state, or None when filename does not exist
+    """
+    filename = Path(filename)
+    if not filename.exists():
+        return None
+
+    with filename.open('r') as state_file:
+        return json.load(state_file)
+
+def save_persec_state(state, filename):
+    """ Save the job state to filename as JSON
+
+    The state is written to a temporary file that then replaces filename,
+    so a crash never leaves a half-written state file behind.
+
+    Parameters
+    ----------
+    state: dict
+        The job state, see save_persec_outputs()
+
+    filename: str or pathlib.Path
+        The JSON state file for the job
+    """
+    assert isinstance(state, dict)
+
+    filename = Path(filename)
+    temp_filename = filename.with_name(filename.name + '.tmp')
+
+    with temp_filename.open('w') as state_file:
+        json.dump(state, state_file, indent=2)
+
+    temp_filename.replace(filename)
+
+def can_append_persec_outputs(state, columns, persec_filenames):
+    """ Return True if the stored outputs can be appended to
+
+    Appending is only safe when the saved state has the same columns as
+    the new payload, records a last job time, and covers every requested
+    raw, formatted and columnar output that still exists on disk.
+
+    Parameters
+    ----------
+    state: dict | None
+        The saved job state (see load_persec_state())
+
+    columns: list
+        The column labels of the new payload
+
+    persec_filenames: PerSecFilenames
+        The requested target filenames
+
+    Returns
+    -------
+    can_append: bool
+        Can the new rows be appended to the existing outputs
+    """
+    if not state or state.get('columns') != columns or not state.get('last_job_time'):
+        return False
+
+    file_sizes = state.get('file_sizes', {})
+    for field in ('raw_filename', 'formatted_filename'):
+        filename = getattr(persec_filenames, field)
+        if not filename:
+            continue
+        if field not in file_sizes or not Path(filename).exists():
+            return False
+        if Path(filename).stat().st_size < file_sizes[field]:
+            return False
+
+    if persec_filenames.columnar_filename:
+        if state.get('columnar_rows') is None or not Path(persec_filenames.columnar_filename).exists():
+            return False
+
+    return True
+
+def load_persec_content_hash(persec_filenames, job_id=None, content_hash_store=None):
+    """ Return the content hash stored for a job, or None
+
+    The hash is read from content_hash_store when one is given, else
+    from the hash_filename of persec_filenames, else from the state
+    file.
+
+    Parameters
+    ----------
+    persec_filenames: PerSecFilenames
+        The requested target filenames
+
+    job_id: str | None
+        The job whose hash to look up in content_hash_store
+
+    content_hash_store: download_queue.DownloadQueue | None
+        An object with get_content_hash(job_id) and
+        set_content_hash(job_id, content_hash) methods that keeps the
+        hash with the job record
+
+    Returns
+    -------
+    content_hash: str | None
+        The hex digest of the last stored payload
+    """
+    if content_hash_store is not None:
+        return content_hash_store.get_content_hash(job_id)
+
+    if persec_filenames.hash_filename and Path(persec_filenames.hash_filename).exists():
+        return Path(persec_filenames.hash_filename).read_text().strip()
+
+    if persec_filenames.state_filename:
+        state = load_persec_state(persec_filenames.state_filename)
+        if state:
+            return state.get('content_hash')
+
+    return None
+
+def save_persec_content_hash(persec_filenames, content_hash, job_id=None,
+                             content_hash_store=None):
+    """ Record content_hash as the hash of the stored payload
+
+    The hash is written to content_hash_store, to the hash_filename of
+    persec_filenames and to the state file, when they are given. The
+    hash file is replaced atomically like the state file.
+
+    Parameters
+    ----------
+    persec_filenames: PerSecFilenames
+        The requested target filenames
+
+    content_hash: str | None
+        The hex digest of the payload whose outputs were written. None
+        forgets the stored hash.
+
+    job_id: str | None
+        The job whose hash to record in content_hash_store
+
+    content_hash_store: download_queue.DownloadQueue | None
+        Keeps the hash with the job record (see
+        load_persec_content_hash())
+    """
+    if content_hash_store is not None:
+        content_hash_store.set_content_hash(job_id, content_hash)
+
+    if persec_filenames.hash_filename:
+        hash_filename = Path(persec_filenames.hash_filename)
+        if content_hash is None:
+            hash_filename.unlink(missing_ok=True)
+        else:
+            temp_filename = hash_filename.with_name(hash_filename.name + '.tmp')
+            temp_filename.write_text(content_hash + '\n')
+            temp_filename.replace(hash_filename)
+
+    if persec_filenames.state_filename:
+        state = load_persec_state(persec_filenames.state_filename)
+        if state is not None and state.get('content_hash') != content_hash:
+            save_persec_state(dict(state, content_hash=content_hash),
+                              persec_filenames.state_filename)
+
+def is_persec_content_unchanged(persec_filenames, content_hash, job_id=None,
+                                content_hash_store=None):
+    """ Return True if the payload hashing to content_hash is already stored
+
+    The payload is unchanged when the hash stored for the job (see
+    load_persec_content_hash()) is content_hash and every requested
+    output file exists. A modified_utc bump caused by a JobHeaders edit
+    (e.g., legal_description) leaves the PerSecData payload
+    byte-identical, so nothing needs rewriting.
 
-    # Write units_df to filename without default Pandas index column
-    units_df.to_csv(filename, index=False)
+    Parameters
+    ----------
+    persec_filenames: PerSecFilenames
+        The requested target filenames
+
+    content_hash: str
+        The hex digest of the new payload
+
+    job_id: str | None
+        The job whose hash to look up in content_hash_store
+
+    content_hash_store: download_queue.DownloadQueue | None
+        Keeps the hash with the job record (see
+        load_persec_content_hash())
+
+    Returns
+    -------
+    is_unchanged: bool
+        Is the payload byte-identical to the stored one
+    """
+    stored_hash = load_persec_content_hash(persec_filenames, job_id=job_id,
+                                           content_hash_store=content_hash_store)
+    if stored_hash is None or stored_hash != content_hash:
+        return False
+
+    output_filenames = (persec_filenames.raw_filename, persec_filenames.formatted_filename,
+                        persec_filenames.units_filename, persec_filenames.columnar_filename)
+
+    return all(Path(filename).exists() for filename in output_filenames if filename)
+
+def save_persec_outputs(csv_file, persec_filenames, chunksize=None, content_hash=None,
+                        encoding='utf-8', tracer=None):
+    """ Save the raw, formatted and units CSVs from one pass over csv_file
+
+    The header and units rows are read once with read_persec_preamble().
+    The units CSV is written from those rows. The body is then read a
+    single time: it is parsed by pd.read_csv() for the formatted CSV
+    and columnar file while a TeeReader copies the same bytes to the
+    raw CSV. When neither formatted output is requested the body is
+    copied straight to the raw CSV without parsing or decoding.
+
+    csv_file is read as bytes end to end: the raw CSV is a byte-for-byte
+    copy of the payload and only the header and units rows are decoded
+    in Python; pd.read_csv() decodes the body itself.
+
+    With chunksize set, the body is parsed, formatted and appended to
+    the formatted CSV and columnar file in blocks of chunksize rows, so
+    memory use is bounded by the block size rather than the job length.
+
+    When persec_filenames has a state_filename the outputs are updated
+    incrementally. The state file records the columns, the job time of
+    the last stored row, the sizes of the raw and formatted CSVs and the
+    number of columnar rows. If the state matches the new payload (see
+    can_append_persec_outputs()), rows up to the last stored job time
+    are skipped without parsing and only the newer rows are appended to
+    the raw, formatted and columnar outputs. The raw and formatted CSVs
+    are first truncated to their recorded sizes, so rows from an
+    interrupted run are not duplicated. Otherwise the outputs are
+    rewritten in full. The state is saved after the outputs are written,
+    together with content_hash when one is given (see
+    is_persec_content_unchanged()).
+
+    An empty string or None entry in persec_filenames will cause that
+    file type to be skipped.
+
+    Parameters
+    ----------
+    csv_file: file object
+        A binary file object positioned at the start of the PerSecData CSV
 
-def handle_200(response, persec_filenames):
+    persec_filenames: PerSecFilenames
+        The target filenames for the raw CSV, formatted CSV, and
+        units CSV. An empty or None entry skips writting that
+        file type.
+
+    chunksize: int | None
+        The number of rows to parse and format at a time. None parses
+        all rows at once.
+
+    content_hash: str | None
+        The hex digest of the payload to record in the state file
+
+    encoding: str
+        The encoding of the CSV bytes
+
+    tracer: tracing.Tracer | None
+        Records a span for the units CSV and, per block, for reading
+        (pd.read_csv() plus the raw CSV copy), formatting and writing
+        each output. None records nothing.
+    """
+    assert isinstance(persec_filenames, PerSecFilenames)
+    assert chunksize is None or (isinstance(chunksize, int) and chunksize > 0)
+
+    if tracer is None:
+        tracer = NULL_TRACER
+
+    # Read the header and units rows once
+    with tracer.span('persec.save_units'):
+        preamble, columns, units = read_persec_preamble(csv_file, encoding=encoding)
+        units_df = format_persec_units_dataframe(pd.DataFrame(data=[units], columns=columns))
+
+        # Save units CSV if a units filename is provided
+        if persec_filenames.units_filename:
+            units_df.to_csv(persec_filenames.units_filename, index=False)
+
+    # Nothing else to do when no body output is requested
+    if not (persec_filenames.raw_filename or persec_filenames.formatted_filename
+            or persec_filenames.columnar_filename):
+        return
+
+    # Decide whether to append to the stored outputs or rewrite them
+    state = None
+    if persec_filenames.state_filename:
+        state = load_persec_state(persec_filenames.state_filename)
+    append = can_append_persec_outputs(state, columns, persec_filenames)
+
+    body_file = csv_file
+    last_job_time = None
+
+    if append:
+        # Skip the rows that are already stored
+        last_job_time = datetime.fromisoformat(state['last_job_time'])
+        first_new_line = skip_persec_rows_through(csv_file, last_job_time)
+        if not first_new_line:
+            # Nothing to append; remember the payload so it is skipped next time
+            if content_hash is not None:
+                save_persec_state(dict(state, content_hash=content_hash),
+                                  persec_filenames.state_filename)
+            return
+
+        # Drop anything written after the state was last saved
+        for field, file_size in state['file_sizes'].items():
+            filename = getattr(persec_filenames, field)
+            if filename and Path(filename).stat().st_size > file_size:
+                os.truncate(filename, file_size)
+
+        body_file = PushbackReader(first_new_line, csv_file)
+
+    raw_file_mode = 'ab' if append else 'wb'
+    formatted_file_mode = 'a' if append else 'w'
+    columnar_writer = None
+
+    with ExitStack() as stack:
+        body_reader = body_file
+
+        # Copy the body to the raw CSV while it is read
+        if persec_filenames.raw_filename:
+            raw_file = stack.enter_context(open(persec_filenames.raw_filename, raw_file_mode))
+            if not append:
+                raw_file.write(preamble)
+            body_reader = TeeReader(body_file, raw_file)
+
+        # Parse the body once for the formatted CSV and columnar outputs
+        if persec_filenames.formatted_filename or persec_filenames.columnar_filename:
+            formatted_file = None
+
+            if persec_filenames.formatted_filename:
+                formatted_file = stack.enter_context(
+                    open(persec_filenames.formatted_filename, formatted_file_mode, newline=''))
+
+            if persec_filenames.columnar_filename:
+                formatted_units = dict(units_df.iloc[0])
+                keep_existing_rows = state['columnar_rows'] if append else None
+                columnar_writer = stack.enter_context(
+                    PerSecColumnarWriter(persec_filenames.columnar_filename, formatted_units,
+                                         keep_existing_rows=keep_existing_rows))
+
+            # Format each block once and append it to every formatted output
+            persec_blocks = read_persec_body(body_reader, columns, chunksize=chunksize,
+                                             encoding=encoding)
+            persec_blocks = tracer.iter_spans('persec.read_csv', persec_blocks)
+            for block_number, persec_df in enumerate(persec_blocks):
+                with tracer.span('persec.format', rows=len(persec_df)):
+                    persec_df = format_persec_dataframe(persec_df)
+
+                if formatted_file is not None:
+                    write_header = block_number == 0 and not append
+                    with tracer.span('persec.write_formatted', rows=len(persec_df)):
+                        persec_df.to_csv(formatted_file, header=write_header, index=False)
+
+                if columnar_writer is not None:
+                    with tracer.span('persec.write_columnar', rows=len(persec_df)):
+                        columnar_writer.write(persec_df)
+
+                block_last_job_time = persec_df.job_time.max()
+                if not pd.isna(block_last_job_time):
+                    last_job_time = block_last_job_time.to_pydatetime()
+        elif persec_filenames.state_filename:
+            # Copy line by line to find the last stored job time
+            with tracer.span('persec.write_raw'):
+                for line in body_file:
+                    raw_file.write(line)
+                    job_time = line.split(b',', 1)[0].decode('ascii').strip()
+                    if job_time:
+                        last_job_time = datetime.strptime(job_time, PERSEC_JOB_TIME_FORMAT)
+        else:
+            with tracer.span('persec.write_raw'):
+                copyfileobj(body_file, raw_file)
+
+    # Record what is now stored for the job
+    if persec_filenames.state_filename:
+        file_sizes = {field: Path(getattr(persec_filenames, field)).stat().st_size
+                      for field in ('raw_filename', 'formatted_filename')
+                      if getattr(persec_filenames, field)}
+        state = {
+            'columns': columns,
+            'last_job_time': last_job_time.isoformat(sep=' ') if last_job_time else None,
+            'file_sizes': file_sizes,
+            'columnar_rows': columnar_writer.num_rows if columnar_writer is not None else None,
+            'content_hash': content_hash,
+        }
+        save_persec_state(state, persec_filenames.state_filename)
+
+""" The number of bytes hashed at a time in handle_200() """
+PERSEC_HASH_CHUNK_SIZE = 1024 * 1024
+
+""" The number of bytes of a streamed body handle_200_stream() spools in
+memory before spilling to a temporary file """
+PERSEC_SPOOL_MAX_SIZE = 64 * 1024 * 1024
+
+def get_persec_encoding(response):
+    """ Return the encoding of the PerSecData CSV in response
+
+    This is the charset declared in the Content-Type header, or UTF-8
+    (a superset of the ASCII CSVs the API returns) when there is none.
+    Unlike response.encoding it never falls back to ISO-8859-1 for text
+    types or to running charset detection over the body.
+
+    Parameters
+    ----------
+    response: requests.Response
+        The response from the HTTP request
+
+    Returns
+    -------
+    encoding: str
+        The encoding to decode the CSV bytes with
+    """
+    content_type = response.headers.get('content-type', '')
+    for parameter in content_type.split(';')[1:]:
+        name, _, value = parameter.partition('=')
+        if name.strip().lower() == 'charset' and value.strip():
+            return value.strip().strip('\'"')
+
+    return 'utf-8'
+
+def handle_200(response, persec_filenames, chunksize=None, job_id=None, content_hash_store=None,
+               tracer=None):
     """ Handle 200: return a Pandas dataframe from JSON object
 
     When the JobHeaders API returns success (200 status_code)
@@ -296,8 +1375,24 @@ def handle_200(response, persec_filenames):
         2) The formatted CSV: snake case header and no units row
         3) The units CSV: snake case header and units row
 
+    The formatted data can also be written to a Parquet or Arrow IPC
+    file (see PerSecColumnarWriter).
+
     An empty string or None key in persec_filenames will cause
-    that file type to be skipped.
+    that file type to be skipped. All outputs are written from a single
+    parse of the response with save_persec_outputs().
+
+    The body is used as bytes (response.content), never as
+    response.text: when the Content-Type has no charset, requests would
+    otherwise run charset detection over the whole body before decoding
+    it. The CSV is decoded as the declared charset, or UTF-8.
+
+    When a content_hash_store is given, or persec_filenames has a
+    hash_filename or a state_filename, the body is hashed chunk by
+    chunk with SHA-256 and compared with the hash stored for the job
+    (see is_persec_content_unchanged()). The format and write stages are
+    skipped if the body is unchanged; otherwise the new hash is
+    recorded once the outputs are written.
 
     Parameters
     ----------
@@ -308,29 +1403,183 @@ def handle_200(response, persec_filenames):
         The target filenames for the raw CSV, formatted CSV, and
         units CSV. An empty or None entry skips writting that
         file type.
+
+    chunksize: int | None
+        The number of rows to format at a time. None formats all rows
+        at once.
+
+    job_id: str | None
+        The job the response belongs to. Required with
+        content_hash_store.
+
+    content_hash_store: download_queue.DownloadQueue | None
+        Keeps the content hash with the job record (see
+        load_persec_content_hash())
+
+    tracer: tracing.Tracer | None
+        Records the hash and save stages (see save_persec_outputs()).
+        None records nothing.
     """
     # Basic pre-conditions for function
     assert isinstance(response, requests.Response)
     assert isinstance(persec_filenames, PerSecFilenames)
     assert response.status_code == 200
+    assert content_hash_store is None or job_id is not None
+
+    if tracer is None:
+        tracer = NULL_TRACER
+
+    hash_kwargs = {'job_id': job_id, 'content_hash_store': content_hash_store}
+
+    # Skip a payload that is byte-identical to the stored one
+    content_hash = None
+    if (content_hash_store is not None or persec_filenames.hash_filename
+            or persec_filenames.state_filename):
+        with tracer.span('persec.hash'):
+            hasher = hashlib.sha256()
+            for chunk in response.iter_content(chunk_size=PERSEC_HASH_CHUNK_SIZE):
+                hasher.update(chunk)
+            content_hash = hasher.hexdigest()
+
+        if is_persec_content_unchanged(persec_filenames, content_hash, **hash_kwargs):
+            print('PerSecData unchanged, skipping save')
+            return
+
+        # Forget the old hash so an interrupted write is not taken as stored
+        save_persec_content_hash(persec_filenames, None, **hash_kwargs)
+
+    # Extract CSV bytes stored in response
+    csv_data = response.content
+
+    # Save the requested CSVs from one pass over csv_data
+    save_persec_outputs(csv_file=BytesIO(csv_data), persec_filenames=persec_filenames,
+                        chunksize=chunksize, content_hash=content_hash,
+                        encoding=get_persec_encoding(response), tracer=tracer)
+
+    # Remember the payload so an identical one is skipped next time
+    if content_hash is not None:
+        save_persec_content_hash(persec_filenames, content_hash, **hash_kwargs)
+
+def handle_200_stream(response, persec_filenames, chunk_size=1024 * 1024, chunksize=None,
+                      job_id=None, content_hash_store=None, max_spool_size=PERSEC_SPOOL_MAX_SIZE,
+                      tracer=None):
+    """ Handle 200 for a streamed response: write the CSVs as it arrives
+
+    This is the streaming counterpart of handle_200(). The response body
+    is read incrementally through an IterContentReader and fed to
+    save_persec_outputs(), so the raw CSV is written in chunks as it
+    arrives and the response text is never held in memory.
+
+    When a content_hash_store is given, or persec_filenames has a
+    hash_filename or a state_filename, the SHA-256 hash of the body is
+    computed chunk by chunk as it arrives. If a hash is stored for the
+    job, whether the payload is unchanged is only known once the whole
+    body is read, so the body is first spooled: up to max_spool_size
+    bytes are kept in memory and larger bodies spill to a temporary
+    file. An unchanged payload is then skipped like in handle_200(),
+    and a changed one is saved from the spool. A job without a stored
+    hash is saved as it arrives. Either way the new hash is recorded
+    once the outputs are written.
+
+    Parameters
+    ----------
+    response: requests.Response
+        The streamed response from the HTTP request
+
+    persec_filenames: PerSecFilenames
+        The target filenames for the raw CSV, formatted CSV, and
+        units CSV. An empty or None entry skips writting that
+        file type.
+
+    chunk_size: int
+        The number of bytes to read from the response at a time. This
+        number should be positive.
 
-    # Extract CSV data stored in response
-    csv_data = response.text
+    chunksize: int | None
+        The number of rows to format at a time. None formats all rows
+        at once.
 
-    # Save raw CSV if a raw filename is provided
-    if persec_filenames.raw_filename:
-        save_raw_persec_data(csv_data=csv_data,
-                             filename=persec_filenames.raw_filename)
+    job_id: str | None
+        The job the response belongs to. Required with
+        content_hash_store.
 
-    # Save formatted CSV if a formatted filename is provided
-    if persec_filenames.formatted_filename:
-        save_formatted_persec_data(csv_data=csv_data,
-                                   filename=persec_filenames.formatted_filename)
+    content_hash_store: download_queue.DownloadQueue | None
+        Keeps the content hash with the job record (see
+        load_persec_content_hash())
 
-    # Save units CSV if a units filename is provided
-    if persec_filenames.units_filename:
-        save_persec_units_data(csv_data=csv_data,
-                               filename=persec_filenames.units_filename)
+    max_spool_size: int
+        The number of bytes of a spooled body held in memory before it
+        spills to a temporary file. This number should be non-negative.
+
+    tracer: tracing.Tracer | None
+        Records the spool and save stages (see save_persec_outputs()).
+        The body arrives while it is read, so the transfer time is part
+        of the persec.spool, persec.read_csv or persec.write_raw spans.
+        None records nothing.
+    """
+    # Basic pre-conditions for function
+    assert isinstance(response, requests.Response)
+    assert isinstance(persec_filenames, PerSecFilenames)
+    assert response.status_code == 200
+    assert isinstance(chunk_size, int) and chunk_size > 0
+    assert content_hash_store is None or job_id is not None
+    assert max_spool_size >= 0
+
+    if tracer is None:
+        tracer = NULL_TRACER
+
+    # Nothing to do when no file is requested
+    if not any(persec_filenames):
+        return
+
+    encoding = get_persec_encoding(response)
+    hash_kwargs = {'job_id': job_id, 'content_hash_store': content_hash_store}
+
+    # Hash the body as it arrives when the hash is recorded
+    hasher = None
+    if (content_hash_store is not None or persec_filenames.hash_filename
+            or persec_filenames.state_filename):
+        hasher = hashlib.sha256()
+
+    # Read the streamed body as bytes
+    csv_file = BufferedReader(IterContentReader(response, chunk_size=chunk_size, hasher=hasher),
+                              buffer_size=chunk_size)
+
+    with ExitStack() as stack:
+        content_hash = None
+        if hasher is not None:
+            if load_persec_content_hash(persec_filenames, **hash_kwargs) is not None:
+                # Spool the body to learn its hash before deciding to save it
+                spool_file = stack.enter_context(SpooledTemporaryFile(max_size=max_spool_size))
+                with tracer.span('persec.spool'):
+                    copyfileobj(csv_file, spool_file, chunk_size)
+                content_hash = hasher.hexdigest()
+
+                if is_persec_content_unchanged(persec_filenames, content_hash, **hash_kwargs):
+                    print('PerSecData unchanged, skipping save')
+                    return
+
+                spool_file.seek(0)
+                csv_file = spool_file
+
+            # Forget the old hash so an interrupted write is not taken as stored
+            save_persec_content_hash(persec_filenames, None, **hash_kwargs)
+
+        # Save the requested CSVs from one pass over the body
+        save_persec_outputs(csv_file=csv_file, persec_filenames=persec_filenames,
+                            chunksize=chunksize, content_hash=content_hash,
+                            encoding=encoding, tracer=tracer)
+
+        if hasher is not None:
+            if content_hash is None:
+                # Read what the save did not need, e.g., rows that are
+                # already stored, so the hash covers the whole body
+                while csv_file.read(chunk_size):
+                    pass
+                content_hash = hasher.hexdigest()
+
+            # Remember the payload so an identical one is skipped next time
+            save_persec_content_hash(persec_filenames, content_hash, **hash_kwargs)
 
 def handle_400(response):
     """ Handle 400: output warning and suuggested next steps
@@ -461,7 +1710,9 @@ def handle_generic_response(response):
     print(response.text[:2000])
 
 def download_job_persec(job_id, api_key, persec_filenames,
-                        default_delay=70, max_attempts=3):
+                        default_delay=70, max_attempts=3, rate_limiter=None,
+                        client=None, stream=False, chunksize=None, content_hash_store=None,
+                        metrics_hook=None, tracer=None):
     """ Download PerSecData for job_id and save CSVs given by persec_filenames
 
     Repeatedly try to download the PerSecData data for the job indexed
@@ -490,6 +1741,43 @@ def download_job_persec(job_id, api_key, persec_filenames,
         The maximum number of times to attempt the download the
         PerSecData for job_id. This number should be positive.
 
+    rate_limiter: rate_limiter.RateLimiter | None
+        A rate limiter shared with other API calls. When given, every
+        attempt waits on the limiter, and a 429 response lowers its
+        rate and pauses everyone sharing it instead of only sleeping
+        in this call.
+
+    client: api_client.WDLClient | None
+        A pooled HTTP client to make the API call with. When given, its
+        session supplies the Authorization header and api_key is not
+        used.
+
+    stream: bool
+        Stream the response body to disk with handle_200_stream()
+        instead of reading it into memory with handle_200().
+
+    chunksize: int | None
+        The number of rows to format at a time. None formats all rows
+        at once. Combine with stream=True to bound memory use for jobs
+        larger than RAM.
+
+    content_hash_store: download_queue.DownloadQueue | None
+        Keeps the SHA-256 hash of the job's last stored payload with the
+        job record, so a byte-identical payload is not formatted or
+        written again (see handle_200())
+
+    metrics_hook: Callable[[metrics.RequestMetrics], None] | None
+        A function called with a metrics.RequestMetrics record after
+        every attempt, e.g., a metrics.PrometheusTextfileExporter or
+        list.append. It is called from worker threads when downloading
+        concurrently, so it must be thread-safe.
+
+    tracer: tracing.Tracer | None
+        Records a persec.job span with child spans for the rate limiter
+        wait, the wait for the response headers, the body transfer
+        (when not streaming), the save stages and any 429 sleep. None
+        records nothing.
+
     Returns
     -------
     download_successful: bool
@@ -497,9 +1785,13 @@ def download_job_persec(job_id, api_key, persec_filenames,
     """
     assert isinstance(max_attempts, int) and max_attempts > 0
     assert isinstance(default_delay, int) and default_delay >= 0
+    assert isinstance(rate_limiter, RateLimiter) or rate_limiter is None
+    assert isinstance(client, WDLClient) or client is None
 
     url = get_api_url(job_id)                  # Get the PerSecData url for job_id
-    headers = get_api_auth_headers(api_key)    # Get the request headers for authentication
+
+    # Get the request headers for authentication unless the client holds them
+    headers = get_api_auth_headers(api_key) if client is None else None
 
     status_code = None                         # Initialize the response status code
     delay_before_next_api_call = default_delay # Initialize delay to default
@@ -507,40 +1799,103 @@ def download_job_persec(job_id, api_key, persec_filenames,
 
     num_attempts = 0                           # Initialize the number of attempts to zero
 
-    # Retry while not exceeding max_attempts
-    while num_attempts < max_attempts:
-
-        print(job_id)
-        # Attempt API call and PerSecData download and save
-        response = requests.get(url, headers=headers) # Make API call
-        status_code = response.status_code            # Grab the status code
-        num_attempts = num_attempts + 1               # Increment the number of attempts
-
-        # Handle various return codes
-        if status_code == 200:
-            # On 200 create CSV files from response according to persec_filenames
-            handle_200(response, persec_filenames)
-            download_successful = True
-        elif status_code == 400:
-            handle_400(response)
-        elif status_code == 401:
-            handle_401(response)
-        elif status_code == 403:
-            handle_403(response)
-        elif status_code == 404:
-            handle_404(response)
-        elif status_code == 429:
-            delay_before_next_api_call = handle_429(response, default_delay)
-        else:
-            handle_generic_response(response)
-            delay_before_next_api_call = default_delay
-
-        # Break out of retry loop on success or major failure otherwise
-        # wait before making the next API call
-        if status_code in frozenset((200, 400, 401, 403, 404)):
-            break
-        elif num_attempts < max_attempts:
-            sleep(delay_before_next_api_call)
+    if tracer is None:
+        tracer = NULL_TRACER
+
+    # Time the whole download of the job, retries included
+    with tracer.span('persec.job', job_id=job_id) as job_attributes:
+        # Retry while not exceeding max_attempts
+        while num_attempts < max_attempts:
+
+            # Wait for the rate limiter to allow the next API call
+            wait_start_time = perf_counter()
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+
+            print(job_id)
+            # Attempt API call and PerSecData download and save
+            request_start_time = perf_counter()
+            if client is None:
+                response = requests.get(url, headers=headers, stream=stream) # Make API call
+            else:
+                response = client.get(url, stream=stream)      # Make API call on pooled session
+            status_code = response.status_code            # Grab the status code
+            num_attempts = num_attempts + 1               # Increment the number of attempts
+            handle_start_time = perf_counter()
+
+            # Split the request time into waiting for the headers and reading the body
+            headers_time = min(request_start_time + response.elapsed.total_seconds(),
+                               handle_start_time)
+            if rate_limiter is not None:
+                tracer.add_span('persec.rate_limit_wait', wait_start_time, request_start_time)
+            tracer.add_span('persec.http_wait', request_start_time, headers_time,
+                            attempt=num_attempts, status_code=status_code)
+            if not stream:
+                tracer.add_span('persec.body_transfer', headers_time, handle_start_time,
+                                attempt=num_attempts)
+
+            # Handle various return codes
+            if status_code == 200:
+                # On 200 create CSV files from response according to persec_filenames
+                with tracer.span('persec.save', attempt=num_attempts):
+                    if stream:
+                        handle_200_stream(response, persec_filenames, chunksize=chunksize,
+                                          job_id=job_id, content_hash_store=content_hash_store,
+                                          tracer=tracer)
+                    else:
+                        handle_200(response, persec_filenames, chunksize=chunksize,
+                                   job_id=job_id, content_hash_store=content_hash_store,
+                                   tracer=tracer)
+                download_successful = True
+                if rate_limiter is not None:
+                    rate_limiter.record_success()
+            elif status_code == 400:
+                handle_400(response)
+            elif status_code == 401:
+                handle_401(response)
+            elif status_code == 403:
+                handle_403(response)
+            elif status_code == 404:
+                handle_404(response)
+            elif status_code == 429:
+                delay_before_next_api_call = handle_429(response, default_delay)
+            else:
+                handle_generic_response(response)
+                delay_before_next_api_call = default_delay
+
+            # Report how the attempt went
+            if metrics_hook is not None:
+                end_time = perf_counter()
+                will_retry = rate_limiter is not None or num_attempts < max_attempts
+                throttle_sleep = delay_before_next_api_call if status_code == 429 and will_retry else 0
+                metrics_hook(RequestMetrics(endpoint='persecdata',
+                                            job_id=job_id,
+                                            attempt=num_attempts,
+                                            status_code=status_code,
+                                            ttfb=response.elapsed.total_seconds(),
+                                            latency=end_time - request_start_time,
+                                            handle_time=end_time - handle_start_time,
+                                            bytes_received=get_response_bytes(response),
+                                            rate_limit_wait=request_start_time - wait_start_time,
+                                            throttle_sleep=throttle_sleep))
+
+            # Release the connection; a streamed body may not have been read
+            response.close()
+
+            # Break out of retry loop on success or major failure otherwise
+            # wait before making the next API call
+            if status_code in frozenset((200, 400, 401, 403, 404)):
+                break
+            elif status_code == 429 and rate_limiter is not None:
+                # Slow down and pause everyone sharing the limiter; the wait
+                # happens in acquire() at the top of the next attempt
+                rate_limiter.record_throttled(delay_before_next_api_call)
+            elif num_attempts < max_attempts:
+                with tracer.span('persec.throttle_sleep', seconds=delay_before_next_api_call):
+                    sleep(delay_before_next_api_call)
+
+        job_attributes['attempts'] = num_attempts
+        job_attributes['status_code'] = status_code
 
     # Was the API call and download successful
     return download_successful
@@ -581,6 +1936,42 @@ def default_formatted_csv_filename(job_id):
 
     return Path(f'formatted_{job_id}.csv')
 
+def default_formatted_parquet_filename(job_id):
+    """ Returns the filename for the formatted Parquet file associated with job_id
+
+    Parameters
+    ----------
+    job_id: str
+        The job_id to generate the filename for
+
+    Returns
+    -------
+    filename: pathlib.Path
+        The filename associated with job_id which will be appended
+        to some base path by the caller.
+    """
+    assert isinstance(job_id, str)
+
+    return Path(f'formatted_{job_id}.parquet')
+
+def default_formatted_arrow_filename(job_id):
+    """ Returns the filename for the formatted Arrow IPC file associated with job_id
+
+    Parameters
+    ----------
+    job_id: str
+        The job_id to generate the filename for
+
+    Returns
+    -------
+    filename: pathlib.Path
+        The filename associated with job_id which will be appended
+        to some base path by the caller.
+    """
+    assert isinstance(job_id, str)
+
+    return Path(f'formatted_{job_id}.arrow')
+
 def default_units_csv_filename(job_id):
     """ Returns the filename for the units CSV associated with job_id
 
@@ -599,6 +1990,42 @@ def default_units_csv_filename(job_id):
 
     return Path(f'units_{job_id}.csv')
 
+def default_state_filename(job_id):
+    """ Returns the filename for the incremental state file associated with job_id
+
+    Parameters
+    ----------
+    job_id: str
+        The job_id to generate the filename for
+
+    Returns
+    -------
+    filename: pathlib.Path
+        The filename associated with job_id which will be appended
+        to some base path by the caller.
+    """
+    assert isinstance(job_id, str)
+
+    return Path(f'state_{job_id}.json')
+
+def default_hash_filename(job_id):
+    """ Returns the filename for the payload hash file associated with job_id
+
+    Parameters
+    ----------
+    job_id: str
+        The job_id to generate the filename for
+
+    Returns
+    -------
+    filename: pathlib.Path
+        The filename associated with job_id which will be appended
+        to some base path by the caller.
+    """
+    assert isinstance(job_id, str)
+
+    return Path(f'hash_{job_id}.sha256')
+
 def nosave_filename(job_id): #pylint:disable=unused-argument
     """ Returns None to indicate not to save a CSV file
 
@@ -613,8 +2040,14 @@ def download_persec_data(job_header_df, api_key, base_path,
                          raw_filename_function=default_raw_csv_filename,
                          formatted_filename_function=default_formatted_csv_filename,
                          units_filename_function=default_units_csv_filename,
+                         columnar_filename_function=nosave_filename,
+                         state_filename_function=nosave_filename,
+                         hash_filename_function=nosave_filename,
                          local_job_headers_updater=None,
-                         default_delay=70, max_attempts=3):
+                         default_delay=70, max_attempts=3, max_workers=1,
+                         rate_limiter=None, client=None, stream=False,
+                         chunksize=None, job_filters=None, content_hash_store=None,
+                         metrics_hook=None, tracer=None):
     """ Download jobs in job_header_df from PerSecData API
 
     Parameters
@@ -647,6 +2080,34 @@ def download_persec_data(job_header_df, api_key, base_path,
         set to persec_data_api.nosave_filename to not save the
         file.
 
+    columnar_filename_function: Callable[[str], pathlib.Path]
+        A function that takes a job_id and produces a filename for the
+        formatted data in a columnar file that is appended to base_path,
+        e.g., persec_data_api.default_formatted_parquet_filename or
+        persec_data_api.default_formatted_arrow_filename. Requires
+        pyarrow. By default no columnar file is saved.
+
+    state_filename_function: Callable[[str], pathlib.Path]
+        A function that takes a job_id and produces a filename for the
+        job's JSON state file that is appended to base_path. Setting it
+        to persec_data_api.default_state_filename enables incremental
+        mode: for a job that was stored before, only rows newer than the
+        last stored job time are appended to the raw, formatted and
+        columnar outputs (see save_persec_outputs()). The state also
+        records a hash of the payload so a byte-identical payload is
+        not formatted or written again. By default no state is kept and
+        the outputs are rewritten.
+
+    hash_filename_function: Callable[[str], pathlib.Path]
+        A function that takes a job_id and produces a filename for the
+        SHA-256 hash of the job's last stored payload that is appended
+        to base_path, e.g., persec_data_api.default_hash_filename. A
+        re-downloaded payload that is byte-identical to the stored one
+        (e.g., after a JobHeaders-only edit bumped modified_utc) is then
+        not formatted or written again (see handle_200()). Not used
+        when a content_hash_store is given. By default no hash file is
+        saved.
+
     local_job_headers_updater: Callable[[str], None]
         A function that takes a job_id and updates a local JobHeaders
         database table.
@@ -658,6 +2119,60 @@ def download_persec_data(job_header_df, api_key, base_path,
     max_attempts: int
         The maximum number of times to attempt the download the
         PerSecData for job_id. This number should be positive.
+
+    max_workers: int
+        The maximum number of PerSecData requests in flight at once.
+        With the default of 1 jobs are downloaded one at a time with
+        default_delay seconds between jobs. With more than 1 jobs are
+        downloaded concurrently without the fixed delay; a 429 response
+        to any worker pauses all workers for the retry-after time.
+        Without a rate_limiter the workers are not paced: requests go
+        out as fast as max_workers allows and only 429 pauses slow them
+        down, so pass a RateLimiter with a rate to stay under the API
+        budget. local_job_headers_updater is always called from the
+        calling thread, exactly once per successfully downloaded job.
+
+    rate_limiter: rate_limiter.RateLimiter | None
+        A rate limiter that paces the PerSecData requests. When given,
+        the fixed default_delay between jobs is dropped and the limiter
+        decides when the next request is made. Pass the same limiter to
+        job_headers_api.get_jobs_to_download to share the API budget.
+
+    client: api_client.WDLClient | None
+        A pooled HTTP client shared by all PerSecData requests so the
+        sync reuses keep-alive connections. When given, api_key is not
+        used. With max_workers > 1 its pool_maxsize should be at least
+        max_workers.
+
+    stream: bool
+        Stream each PerSecData response to disk instead of reading it
+        into memory.
+
+    chunksize: int | None
+        The number of rows to format at a time. None formats all rows
+        of a job at once. Combine with stream=True to bound memory use
+        for jobs larger than RAM.
+
+    job_filters: dict | None
+        Only download the jobs of job_header_df that match these
+        filters (see job_filters.filter_job_headers()). The filtered
+        columns must be in job_header_df. None downloads every job.
+
+    content_hash_store: download_queue.DownloadQueue | None
+        Keeps the SHA-256 hash of each job's last stored payload with
+        the job record instead of in a hash file, so byte-identical
+        payloads are skipped (see download_job_persec()).
+        download_queue.run_download_queue() passes its queue.
+
+    metrics_hook: Callable[[metrics.RequestMetrics], None] | None
+        A function called with a metrics.RequestMetrics record after
+        every PerSecData request attempt (see download_job_persec()).
+        It must be thread-safe when max_workers > 1.
+
+    tracer: tracing.Tracer | None
+        Records the stages of every PerSecData download (see
+        download_job_persec()) and each local_job_headers_updater call.
+        None records nothing.
     """
     def is_function(param):
         return isinstance(param, (FunctionType, partial))
@@ -668,45 +2183,213 @@ def download_persec_data(job_header_df, api_key, base_path,
     # Check basic pre-conditions
     assert isinstance(job_header_df, pd.DataFrame)
     assert 'job_id' in job_header_df.columns
-    assert isinstance(api_key, str)
+    assert isinstance(api_key, str) or client is not None
+    assert isinstance(client, WDLClient) or client is None
     assert is_function(raw_filename_function)
     assert is_function(formatted_filename_function)
     assert is_function(units_filename_function)
+    assert is_function(columnar_filename_function)
+    assert is_function(state_filename_function)
+    assert is_function(hash_filename_function)
     assert is_function(local_job_headers_updater) or local_job_headers_updater is None
     assert default_delay >= 0
     assert max_attempts > 0
+    assert isinstance(max_workers, int) and max_workers > 0
+    assert isinstance(rate_limiter, RateLimiter) or rate_limiter is None
     
+    # Drop unwanted jobs before any PerSecData request is queued
+    if job_filters:
+        job_header_df = filter_job_headers(job_header_df, job_filters)
+
     # Cast base_path to pathlib.Path object
     base_path = Path(base_path)
 
+    if tracer is None:
+        tracer = NULL_TRACER
+
+    def get_persec_filenames(job_id):
+        # Store the target CSV filenames
+        raw_filename = prepend_base_path(raw_filename_function(job_id))
+        formatted_filename = prepend_base_path(formatted_filename_function(job_id))
+        units_filename = prepend_base_path(units_filename_function(job_id))
+        columnar_filename = prepend_base_path(columnar_filename_function(job_id))
+        state_filename = prepend_base_path(state_filename_function(job_id))
+        hash_filename = prepend_base_path(hash_filename_function(job_id))
+
+        return PerSecFilenames(raw_filename=raw_filename,
+                               formatted_filename=formatted_filename,
+                               units_filename=units_filename,
+                               columnar_filename=columnar_filename,
+                               state_filename=state_filename,
+                               hash_filename=hash_filename)
+
+    if max_workers > 1:
+        download_persec_data_concurrently(job_ids=job_header_df.job_id.values,
+                                          api_key=api_key,
+                                          get_persec_filenames=get_persec_filenames,
+                                          local_job_headers_updater=local_job_headers_updater,
+                                          default_delay=default_delay,
+                                          max_attempts=max_attempts,
+                                          max_workers=max_workers,
+                                          rate_limiter=rate_limiter,
+                                          client=client,
+                                          stream=stream,
+                                          chunksize=chunksize,
+                                          content_hash_store=content_hash_store,
+                                          metrics_hook=metrics_hook,
+                                          tracer=tracer)
+        return
+
     # There is no delay when making the first call
     delay_before_making_next_api_call = 0
     
     # Loop over all the jobs marked for download
     for job_id in job_header_df.job_id.values:
         
-        # Store the target CSV filenames
-        raw_filename = prepend_base_path(raw_filename_function(job_id))
-        formatted_filename = prepend_base_path(formatted_filename_function(job_id))
-        units_filename = prepend_base_path(units_filename_function(job_id))
-
-        persec_filenames = PerSecFilenames(raw_filename=raw_filename,
-                                           formatted_filename=formatted_filename,
-                                           units_filename=units_filename)
+        persec_filenames = get_persec_filenames(job_id)
         
         # Wait the appropriate amount of time before making the API call
-        sleep(delay_before_making_next_api_call)
+        if delay_before_making_next_api_call:
+            with tracer.span('persec.delay', seconds=delay_before_making_next_api_call):
+                sleep(delay_before_making_next_api_call)
 
         # Make the API call
         download_success = download_job_persec(job_id=job_id,
                                                api_key=api_key,
                                                persec_filenames=persec_filenames,
                                                default_delay=default_delay,
-                                               max_attempts=max_attempts)
+                                               max_attempts=max_attempts,
+                                               rate_limiter=rate_limiter,
+                                               client=client,
+                                               stream=stream,
+                                               chunksize=chunksize,
+                                               content_hash_store=content_hash_store,
+                                               metrics_hook=metrics_hook,
+                                               tracer=tracer)
 
         # Update the local JobHeaders DB entry when the API call and download was successful
         if download_success and local_job_headers_updater is not None:
-            local_job_headers_updater(job_id=job_id)
+            with tracer.span('persec.update_local_job_headers', job_id=job_id):
+                local_job_headers_updater(job_id=job_id)
+
+        # Set the delay for making the next API call; a rate limiter
+        # does its own pacing
+        if rate_limiter is None:
+            delay_before_making_next_api_call = default_delay
+
+def download_persec_data_concurrently(job_ids, api_key, get_persec_filenames,
+                                      local_job_headers_updater=None,
+                                      default_delay=70, max_attempts=3, max_workers=4,
+                                      rate_limiter=None, client=None, stream=False,
+                                      chunksize=None, content_hash_store=None,
+                                      metrics_hook=None, tracer=None):
+    """ Download PerSecData for job_ids using a bounded pool of worker threads
+
+    At most max_workers PerSecData requests are in flight at once. All
+    workers share a rate limiter so that a 429 response seen by one
+    worker pauses the others until the retry-after time has passed.
+
+    The local JobHeaders update runs in the calling thread as each
+    download completes, so local_job_headers_updater does not need to
+    be thread-safe and is called exactly once per successful job. A
+    download that raises is reported and treated as a failure, so the
+    jobs that succeeded are still recorded.
 
-        # Set the delay for making the next API call
-        delay_before_making_next_api_call = default_delay
+    Parameters
+    ----------
+    job_ids: Iterable[str]
+        The job_ids to download from the PerSecData API
+
+    api_key: str
+        The WDL API key to use for request authentication
+
+    get_persec_filenames: Callable[[str], PerSecFilenames]
+        A function that takes a job_id and returns the target filenames
+        for that job
+
+    local_job_headers_updater: Callable[[str], None]
+        A function that takes a job_id and updates a local JobHeaders
+        database table.
+
+    default_delay: int
+        Default number of seconds to wait between attempts. This
+        number should be non-negative.
+
+    max_attempts: int
+        The maximum number of times to attempt the download the
+        PerSecData for a job. This number should be positive.
+
+    max_workers: int
+        The maximum number of concurrent PerSecData requests. This
+        number should be positive. Without a paced rate_limiter all of
+        them are sent back to back.
+
+    rate_limiter: rate_limiter.RateLimiter | None
+        The rate limiter shared by the workers. When None, an unpaced
+        limiter is used that only enforces 429 retry-after pauses; pass
+        RateLimiter(rate=...) to pace the requests.
+
+    client: api_client.WDLClient | None
+        A pooled HTTP client shared by the workers. When given, api_key
+        is not used.
+
+    stream: bool
+        Stream each PerSecData response to disk instead of reading it
+        into memory.
+
+    chunksize: int | None
+        The number of rows to format at a time. None formats all rows
+        of a job at once.
+
+    content_hash_store: download_queue.DownloadQueue | None
+        Keeps the content hash of each job with the job record (see
+        download_job_persec()). It is called from the worker threads.
+
+    metrics_hook: Callable[[metrics.RequestMetrics], None] | None
+        A thread-safe function called with a metrics.RequestMetrics
+        record after every PerSecData request attempt
+
+    tracer: tracing.Tracer | None
+        Records the stages of every PerSecData download from the worker
+        threads. None records nothing.
+    """
+    assert isinstance(max_workers, int) and max_workers > 0
+    assert isinstance(rate_limiter, RateLimiter) or rate_limiter is None
+
+    if rate_limiter is None:
+        rate_limiter = RateLimiter()
+
+    if tracer is None:
+        tracer = NULL_TRACER
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Queue a download for every job; the executor bounds how many run at once
+        futures = {executor.submit(download_job_persec,
+                                   job_id=job_id,
+                                   api_key=api_key,
+                                   persec_filenames=get_persec_filenames(job_id),
+                                   default_delay=default_delay,
+                                   max_attempts=max_attempts,
+                                   rate_limiter=rate_limiter,
+                                   client=client,
+                                   stream=stream,
+                                   chunksize=chunksize,
+                                   content_hash_store=content_hash_store,
+                                   metrics_hook=metrics_hook,
+                                   tracer=tracer): job_id
+                   for job_id in job_ids}
+
+        # Update the local JobHeaders DB entry as each successful download finishes
+        for future in as_completed(futures):
+            job_id = futures[future]
+
+            # A worker that raised is a failed download; keep recording the others
+            try:
+                download_success = future.result()
+            except Exception as error: #pylint: disable=broad-except
+                print(f'(download_persec_data_concurrently) job_id {job_id} failed: {error!r}')
+                download_success = False
+
+            if download_success and local_job_headers_updater is not None:
+                with tracer.span('persec.update_local_job_headers', job_id=job_id):
+                    local_job_headers_updater(job_id=job_id)
@@ -1,16 +1,99 @@
+import argparse
+
+import download_queue
 import job_headers_api
-import persec_data_api
 
-def process():
-    # Creates a table called JobHeaders in SQLite and pulls data from https://api.welldatalabs.com/jobheaders into DataFrame
-    jobs_to_download_df = job_headers_api.get_jobs_to_download('b+S15uKWEK0lFU+NomEmvekn8yk/ALTTBAYOJalVKrI=', 'sqlite/wdl-api.db', 'JobHeaders')
-    
-    # Loop through DataFrame and update values into SQLite database
-    for job_id in jobs_to_download_df.job_id.values:
-        job_headers_api.update_job_headers_db_row(jobs_to_download_df, job_id, 'sqlite/wdl-api.db', 'JobHeaders')
+from api_auth import get_api_key_from_file
+from profiling import SyncProfiler
+from tracing import NULL_TRACER
+
+""" The sample WDL API key used when no --api-key-file is given """
+API_KEY = 'b+S15uKWEK0lFU+NomEmvekn8yk/ALTTBAYOJalVKrI='
+
+""" The SQLite database that holds the JobHeaders and queue state """
+DB_PATH = 'sqlite/wdl-api.db'
+
+""" The table of downloaded JobHeaders in DB_PATH """
+JOB_HEADERS_TABLE_NAME = 'JobHeaders'
+
+""" The PerSecData download queue table in DB_PATH """
+DOWNLOAD_QUEUE_TABLE_NAME = 'DownloadQueue'
+
+""" The directory the PerSecData files are written to """
+PERSEC_PATH = './persecfiles'
+
+""" Claims older than this many seconds are treated as left behind by a
+killed downloader: several multiples of the WDLClient request timeout
+(10 s connect + 300 s read), so retries and 429 pauses of a live worker
+in another process are not released """
+STALE_CLAIM_AGE = 3600
+
+def sync(api_key=API_KEY, db_path=DB_PATH, persec_path=PERSEC_PATH, wal=True,
+         tracer=NULL_TRACER, stale_claim_age=STALE_CLAIM_AGE):
+    # Share one SQLite engine for all JobHeaders bookkeeping in this sync
+    with job_headers_api.JobHeadersStateStore(db_path, wal=wal) as state_store:
+        with tracer.span('sync.setup'):
+            # Creates the JobHeaders table if needed
+            job_headers_api.create_job_headers_table(db_path, JOB_HEADERS_TABLE_NAME, state_store=state_store)
 
-    # Download PerSecData from https://api.welldatalabs.com/persecdata
-    persec_data_api.download_persec_data(jobs_to_download_df, 'b+S15uKWEK0lFU+NomEmvekn8yk/ALTTBAYOJalVKrI=', './persecfiles')
+            # Jobs are recorded in JobHeaders only once their PerSecData files are written
+            queue = download_queue.DownloadQueue(db_path, DOWNLOAD_QUEUE_TABLE_NAME, JOB_HEADERS_TABLE_NAME,
+                                                 state_store=state_store)
+
+            # Resume the jobs a previous run was killed in the middle of
+            queue.release_stale_claims(older_than=stale_claim_age)
+
+        with tracer.span('sync.job_headers'):
+            # Pulls data from https://api.welldatalabs.com/jobheaders into DataFrame and queues the new or changed jobs
+            jobs_to_download_df = job_headers_api.get_jobs_to_download(api_key, db_path, JOB_HEADERS_TABLE_NAME,
+                                                                       state_store=state_store, tracer=tracer)
+            num_queued = queue.enqueue(jobs_to_download_df)
+
+        with tracer.span('sync.persec_data'):
+            # Download PerSecData from https://api.welldatalabs.com/persecdata
+            state_counts = download_queue.run_download_queue(queue, api_key, persec_path, tracer=tracer)
+
+    print(f'Synced {num_queued} new or changed jobs: '
+          f'{state_counts[download_queue.DONE]} done, '
+          f'{state_counts[download_queue.FAILED]} failed, '
+          f'{state_counts[download_queue.PENDING]} pending, '
+          f'{state_counts[download_queue.IN_FLIGHT]} in flight')
+
+def process(profile_dir=None, profile_memory=True, **sync_kwargs):
+    # Profile the sync stages and jobs when a report directory is given
+    if profile_dir is None:
+        sync(**sync_kwargs)
+        return
+
+    with SyncProfiler(profile_dir, trace_memory=profile_memory) as profiler:
+        sync(tracer=profiler, **sync_kwargs)
 
 if __name__ == "__main__":
-    process()
+    parser = argparse.ArgumentParser(description='Sync WDL JobHeaders and PerSecData')
+    parser.add_argument('--api-key-file', metavar='FILE', default=None,
+                        help='read the WDL API key from the first line of FILE '
+                             '(default: the sample API key)')
+    parser.add_argument('--db-path', metavar='PATH', default=DB_PATH,
+                        help=f'the SQLite state database (default: {DB_PATH})')
+    parser.add_argument('--persec-path', metavar='DIR', default=PERSEC_PATH,
+                        help=f'write the PerSecData files to DIR (default: {PERSEC_PATH})')
+    parser.add_argument('--no-wal', dest='wal', action='store_false',
+                        help='keep the SQLite rollback journal instead of WAL mode, e.g., '
+                             'on network file systems')
+    parser.add_argument('--profile', metavar='DIR', default=None,
+                        help='profile the sync and write the reports to DIR')
+    parser.add_argument('--no-profile-memory', dest='profile_memory', action='store_false',
+                        help='skip tracemalloc, which slows allocation-heavy stages down')
+    parser.add_argument('--stale-claim-age', metavar='SECONDS', type=float, default=STALE_CLAIM_AGE,
+                        help='resume in-flight jobs claimed more than SECONDS ago '
+                             f'(default: {STALE_CLAIM_AGE}); use 0 only when no other sync is running')
+    args = parser.parse_args()
+
+    if args.api_key_file is None:
+        api_key = API_KEY
+    else:
+        api_key = get_api_key_from_file(args.api_key_file)
+
+    process(profile_dir=args.profile, profile_memory=args.profile_memory, api_key=api_key,
+            db_path=args.db_path, persec_path=args.persec_path, wal=args.wal,
+            stale_claim_age=args.stale_claim_age)
@@ -0,0 +1,379 @@
+#!/usr/bin/env python
+
+""" An opt-in profiling mode for WDL API sync runs
+
+SyncProfiler is a tracing.Tracer that also profiles the spans it
+records. Pass it as the tracer of a sync (see process.process()):
+
+    with SyncProfiler('profiles/2020-01-01') as profiler:
+        process.sync(tracer=profiler)
+
+and the reports are written to the output directory when the block
+exits:
+
+    summary.txt             top-N stages, sampled stacks, functions,
+                            allocations and jobs
+    collapsed.txt           sampled stacks in the collapsed format of
+                            flamegraph.pl, speedscope and similar tools,
+                            rooted at the open spans
+    collapsed_by_job.txt    the same stacks rooted at the job_id
+    <stage>.prof            the cProfile statistics of each sync.* stage,
+                            for pstats or snakeviz
+    trace.json              the spans as Chrome trace-event JSON
+"""
+
+import cProfile
+import io
+import pstats
+import sys
+import tracemalloc
+
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Event, Lock, Thread, get_ident
+
+from tracing import Tracer
+
+""" Spans whose name starts with this prefix are profiled with cProfile
+    and tracemalloc snapshots """
+PROFILED_STAGE_PREFIX = 'sync.'
+
+""" The span that wraps the download of one job """
+JOB_SPAN_NAME = 'persec.job'
+
+class SyncProfiler(Tracer):
+    """ A tracer that profiles CPU time and allocations per stage and job
+
+    Three profilers run together:
+
+        1) A sampling profiler: a background thread records the Python
+           stack of every thread that is inside a span every
+           sample_interval seconds, so worker threads and individual
+           jobs are covered. The samples are wall-clock samples; a
+           thread waiting on the network or a lock is sampled too.
+        2) cProfile for each span whose name starts with
+           PROFILED_STAGE_PREFIX. cProfile only sees the thread that
+           opened the span, i.e., not the PerSecData worker threads
+           when max_workers > 1.
+        3) tracemalloc snapshots at the start and end of each
+           PROFILED_STAGE_PREFIX span, and the traced memory growth and
+           peak of each job. Jobs only read the traced memory counters,
+           as a snapshot per job would copy every live allocation twice
+           per download. tracemalloc counts allocations of every
+           thread, so the per-job figures are exact only when jobs are
+           downloaded one at a time.
+
+    tracemalloc slows allocation-heavy code such as DataFrame.to_csv()
+    down several times over, which inflates the CPU figures of the same
+    run; pass trace_memory=False to profile CPU time alone. Each extra
+    memory frame adds to that cost.
+
+    Parameters
+    ----------
+    output_dir: pathlib.Path | str
+        The directory to write the reports to. It is created if needed.
+
+    top_n: int
+        The number of entries in each top-N list of the summary. This
+        number should be positive.
+
+    sample_interval: float
+        Seconds between stack samples. This number should be positive.
+
+    cprofile: bool
+        Profile the PROFILED_STAGE_PREFIX spans with cProfile
+
+    trace_memory: bool
+        Trace allocations with tracemalloc
+
+    memory_frames: int
+        The number of frames tracemalloc stores per allocation. This
+        number should be positive.
+    """
+    def __init__(self, output_dir, top_n=20, sample_interval=0.005, cprofile=True,
+                 trace_memory=True, memory_frames=1):
+        assert isinstance(top_n, int) and top_n > 0
+        assert sample_interval > 0
+
+        super().__init__()
+
+        self.output_dir = Path(output_dir)
+        self.top_n = top_n
+        self.sample_interval = sample_interval
+        self.cprofile = cprofile
+        self.trace_memory = trace_memory
+        self.memory_frames = memory_frames
+
+        self.stack_samples = Counter()  # (span names, job_id, frames) -> samples
+        self.stage_profiles = {}        # stage name -> pstats.Stats
+        self.stage_allocations = {}     # stage name -> list(tracemalloc.StatisticDiff)
+        self.job_memory = {}            # job_id -> (traced memory growth, peak) in bytes
+
+        self._thread_spans = {}         # thread ident -> [(name, attributes), ...]
+        self._thread_spans_lock = Lock()
+        self._stop_sampling = Event()
+        self._sampler = None
+        self._started_tracemalloc = False
+
+    def start(self):
+        """ Start the sampling thread and tracemalloc """
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(self.memory_frames)
+            self._started_tracemalloc = True
+
+        self._stop_sampling.clear()
+        self._sampler = Thread(target=self.sample_stacks, name='SyncProfiler', daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        """ Stop the sampling thread and any tracemalloc this profiler started """
+        if self._sampler is not None:
+            self._stop_sampling.set()
+            self._sampler.join()
+            self._sampler = None
+
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        self.write()
+        print(f'Profiling reports written to {self.output_dir}')
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """ Time and profile the enclosed block as a span called name
+
+        See tracing.Tracer.span(). The open spans of each thread are
+        also kept where the sampling thread can see them.
+        """
+        with self._thread_spans_lock:
+            thread_spans = self._thread_spans.setdefault(get_ident(), [])
+            thread_spans.append((name, attributes))
+
+        stage_profile = None
+        start_snapshot = None
+        job_start_memory = None
+
+        if name.startswith(PROFILED_STAGE_PREFIX):
+            if self.trace_memory and tracemalloc.is_tracing():
+                start_snapshot = tracemalloc.take_snapshot()
+            if self.cprofile:
+                stage_profile = self.enable_cprofile(name)
+        elif name == JOB_SPAN_NAME and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            job_start_memory = tracemalloc.get_traced_memory()[0]
+
+        try:
+            with super().span(name, **attributes) as span_attributes:
+                yield span_attributes
+        finally:
+            with self._thread_spans_lock:
+                thread_spans.pop()
+
+            if stage_profile is not None:
+                stage_profile.disable()
+
+            if job_start_memory is not None and tracemalloc.is_tracing():
+                current_memory, peak_memory = tracemalloc.get_traced_memory()
+                self.job_memory[attributes.get('job_id')] = (current_memory - job_start_memory,
+                                                             peak_memory - job_start_memory)
+            elif start_snapshot is not None and tracemalloc.is_tracing():
+                self.stage_allocations[name] = get_top_allocations(
+                    start_snapshot, tracemalloc.take_snapshot(), self.top_n)
+
+            # Convert the profile after the end snapshot so it is not counted
+            if stage_profile is not None:
+                self.add_stage_profile(name, stage_profile)
+
+    def enable_cprofile(self, name):
+        """ Return an enabled cProfile.Profile, None if one cannot run
+
+        Python 3.12 and later allow a single active profiler, so this
+        fails when another tool is already profiling the process.
+        """
+        stage_profile = cProfile.Profile()
+        try:
+            stage_profile.enable()
+        except ValueError as error:
+            print(f'(SyncProfiler) cannot cProfile {name}: {error}')
+            return None
+
+        return stage_profile
+
+    def add_stage_profile(self, name, stage_profile):
+        """ Merge the cProfile statistics of one run of stage name """
+        if name in self.stage_profiles:
+            self.stage_profiles[name].add(stage_profile)
+        else:
+            self.stage_profiles[name] = pstats.Stats(stage_profile)
+
+    def sample_stacks(self):
+        """ Record the stack of every thread inside a span until stopped """
+        sampler_ident = get_ident()
+
+        while not self._stop_sampling.wait(self.sample_interval):
+            frames = sys._current_frames() #pylint: disable=protected-access
+            with self._thread_spans_lock:
+                thread_spans = {thread_ident: list(spans)
+                                for thread_ident, spans in self._thread_spans.items()}
+
+            for thread_ident, frame in frames.items():
+                spans = thread_spans.get(thread_ident, ())
+                if thread_ident == sampler_ident or not spans:
+                    continue
+
+                span_names = tuple(name for name, _ in spans)
+                job_id = next((attributes['job_id'] for _, attributes in reversed(spans)
+                               if 'job_id' in attributes), None)
+
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({Path(code.co_filename).name}:'
+                                 f'{code.co_firstlineno})')
+                    frame = frame.f_back
+
+                self.stack_samples[(span_names, job_id, tuple(reversed(stack)))] += 1
+
+    def get_collapsed_stacks(self, by_job=False):
+        """ Return the sampled stacks in the collapsed stack format
+
+        Each line is the frames from the root separated by semicolons
+        followed by the number of samples. The open spans are the
+        root frames, preceded by the job_id when by_job is True.
+
+        Parameters
+        ----------
+        by_job: bool
+            Root the stacks at the job_id
+
+        Returns
+        -------
+        collapsed: str
+            One stack per line
+        """
+        collapsed_samples = Counter()
+        for (span_names, job_id, stack), samples in list(self.stack_samples.items()):
+            frames = [f'[{name}]' for name in span_names] + list(stack)
+            if by_job:
+                frames.insert(0, f'[job {job_id}]' if job_id is not None else '[no job]')
+            collapsed_samples[';'.join(frames)] += samples
+
+        return ''.join(f'{stack} {samples}\n' for stack, samples in sorted(collapsed_samples.items()))
+
+    def get_summary(self):
+        """ Return the top-N summary of the profiled run as text """
+        top_n = self.top_n
+        samples = list(self.stack_samples.items())
+        total_samples = sum(count for _, count in samples) or 1
+        lines = []
+
+        def add_section(title):
+            lines.extend(['', title, '=' * len(title)])
+
+        add_section('Stage times (all spans)')
+        lines.append(self.get_stage_summary().head(top_n * 2)
+                     .to_string(float_format='{:.3f}'.format))
+
+        add_section(f'Sampled time by open spans ({total_samples} samples '
+                    f'every {self.sample_interval * 1000:g} ms)')
+        span_samples = Counter()
+        for (span_names, _, _), count in samples:
+            span_samples[' > '.join(span_names)] += count
+        for span_path, count in span_samples.most_common(top_n):
+            lines.append(f'{count:8d} {100 * count / total_samples:6.1f}%  {span_path}')
+
+        add_section('Sampled functions (self samples)')
+        function_samples = Counter()
+        for (_, _, stack), count in samples:
+            if stack:
+                function_samples[stack[-1]] += count
+        for function, count in function_samples.most_common(top_n):
+            lines.append(f'{count:8d} {100 * count / total_samples:6.1f}%  {function}')
+
+        add_section('Jobs by wall time')
+        job_spans = sorted((span for span in list(self.spans) if span.name == JOB_SPAN_NAME),
+                           key=lambda span: span.start_ns - span.end_ns)
+        job_samples = Counter()
+        for (_, job_id, _), count in samples:
+            job_samples[job_id] += count
+        lines.append(f'{"seconds":>10} {"samples":>8} {"memory growth":>14} {"memory peak":>14}  job_id')
+        for span in job_spans[:top_n]:
+            job_id = span.attributes.get('job_id')
+            growth, peak = self.job_memory.get(job_id, (None, None))
+            lines.append(f'{(span.end_ns - span.start_ns) / 1e9:10.3f} {job_samples[job_id]:8d} '
+                         f'{format_bytes(growth):>14} {format_bytes(peak):>14}  {job_id}')
+
+        for name, stats in self.stage_profiles.items():
+            add_section(f'cProfile {name} (top {top_n} by cumulative time)')
+            stats_text = io.StringIO()
+            stats.stream = stats_text
+            stats.sort_stats('cumulative').print_stats(top_n)
+            lines.append(stats_text.getvalue().strip('\n'))
+
+        for name, allocations in self.stage_allocations.items():
+            add_section(f'tracemalloc {name} (top {top_n} allocation sites)')
+            for allocation in allocations:
+                lines.append(str(allocation))
+
+        return '\n'.join(lines).lstrip('\n') + '\n'
+
+    def write(self):
+        """ Write the reports to output_dir """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        (self.output_dir / 'summary.txt').write_text(self.get_summary())
+        (self.output_dir / 'collapsed.txt').write_text(self.get_collapsed_stacks())
+        (self.output_dir / 'collapsed_by_job.txt').write_text(self.get_collapsed_stacks(by_job=True))
+        for name, stats in self.stage_profiles.items():
+            stats.dump_stats(self.output_dir / f'{name}.prof')
+        self.write_chrome_trace(self.output_dir / 'trace.json')
+
+def get_top_allocations(start_snapshot, end_snapshot, num_sites):
+    """ Return the num_sites lines that allocated most between two snapshots
+
+    Allocations by tracemalloc, the profilers and this module are
+    ignored.
+
+    Parameters
+    ----------
+    start_snapshot: tracemalloc.Snapshot
+        The snapshot taken first
+
+    end_snapshot: tracemalloc.Snapshot
+        The snapshot taken last
+
+    num_sites: int
+        The number of allocation sites to return
+
+    Returns
+    -------
+    allocations: list(tracemalloc.StatisticDiff)
+        The allocation sites, largest growth first
+    """
+    ignored_files = [tracemalloc.Filter(False, filename)
+                     for filename in (tracemalloc.__file__, cProfile.__file__,
+                                      pstats.__file__, __file__)]
+    start_snapshot = start_snapshot.filter_traces(ignored_files)
+    end_snapshot = end_snapshot.filter_traces(ignored_files)
+
+    return end_snapshot.compare_to(start_snapshot, 'lineno')[:num_sites]
+
+def format_bytes(num_bytes):
+    """ Return num_bytes as a human-readable string, '-' for None """
+    if num_bytes is None:
+        return '-'
+
+    for unit in ('B', 'KB', 'MB'):
+        if abs(num_bytes) < 1024:
+            return f'{num_bytes:.0f} {unit}' if unit == 'B' else f'{num_bytes:.1f} {unit}'
+        num_bytes = num_bytes / 1024
+
+    return f'{num_bytes:.1f} GB'
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+""" Adaptive rate limiting shared by the WDL API modules """
+
+from threading import Lock
+from time import sleep, monotonic
+
+""" The default ceiling in requests per second that sustained success
+raises the rate to. It is far above the 70 s gap the SDK used to wait
+between PerSecData jobs, so the limiter keeps probing toward the real
+API limit and relies on 429 responses to back off """
+DEFAULT_MAX_RATE = 1.0
+
+class RateLimiter:
+    """ An adaptive token-bucket rate limiter for WDL API requests
+
+    Callers invoke acquire() before every API request and report the
+    outcome with record_success() or record_throttled(). The limiter
+    hands out requests at the current rate (requests per second) with
+    bursts of up to burst requests.
+
+    The rate adapts to what the API tells us:
+
+        1) A 429 response multiplies the rate by decrease_factor (never
+           going below min_rate) and pauses every caller sharing the
+           limiter for the retry-after delay.
+        2) After increase_after consecutive successes the rate is
+           multiplied by increase_factor (never going above max_rate).
+
+    The same limiter can be passed to both job_headers_api and
+    persec_data_api, and it is thread-safe so that concurrent
+    PerSecData workers can share it.
+
+    A rate of None means requests are not paced at all; the limiter
+    then only enforces the pauses requested by 429 responses.
+
+    Parameters
+    ----------
+    rate: float | None
+        The initial number of requests per second. This number should
+        be between min_rate and max_rate.
+
+    burst: int
+        The maximum number of requests that can be made back to back.
+        This number should be positive.
+
+    min_rate: float
+        The lowest rate the limiter will fall to after 429 responses
+
+    max_rate: float
+        The highest rate the limiter will climb to after sustained
+        success (DEFAULT_MAX_RATE by default). Pass rate as max_rate
+        to never go above the initial rate.
+
+    decrease_factor: float
+        Multiplier applied to the rate on a 429 response. This number
+        should be in (0, 1].
+
+    increase_factor: float
+        Multiplier applied to the rate after sustained success. This
+        number should be at least 1.
+
+    increase_after: int
+        The number of consecutive successes before the rate is raised.
+        This number should be positive.
+    """
+    def __init__(self, rate=None, burst=1, min_rate=1/70, max_rate=DEFAULT_MAX_RATE,
+                 decrease_factor=0.5, increase_factor=1.1, increase_after=10):
+        assert isinstance(burst, int) and burst > 0
+        assert min_rate > 0
+        assert max_rate >= min_rate
+        assert rate is None or min_rate <= rate <= max_rate
+        assert 0 < decrease_factor <= 1
+        assert increase_factor >= 1
+        assert isinstance(increase_after, int) and increase_after > 0
+
+        self._lock = Lock()
+        self._rate = rate
+        self._burst = burst
+        self._min_rate = min_rate
+        self._max_rate = max_rate
+        self._decrease_factor = decrease_factor
+        self._increase_factor = increase_factor
+        self._increase_after = increase_after
+
+        self._tokens = float(burst)          # Start with a full bucket
+        self._last_refill_time = monotonic()
+        self._resume_time = 0.0              # No pause requested yet
+        self._consecutive_successes = 0
+
+    @property
+    def rate(self):
+        """ The current number of requests per second (None if unpaced) """
+        return self._rate
+
+    def _refill(self, now):
+        """ Add the tokens accrued since the last refill (lock held) """
+        elapsed = now - self._last_refill_time
+        self._tokens = min(self._burst, self._tokens + elapsed * self._rate)
+        self._last_refill_time = now
+
+    def acquire(self):
+        """ Block until a request may be made """
+        while True:
+            with self._lock:
+                now = monotonic()
+                delay = self._resume_time - now
+
+                if delay <= 0:
+                    if self._rate is None:
+                        return
+
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens = self._tokens - 1
+                        return
+
+                    delay = (1 - self._tokens) / self._rate
+
+            sleep(delay)
+
+    def record_success(self):
+        """ Report a successful request, raising the rate when sustained """
+        with self._lock:
+            self._consecutive_successes = self._consecutive_successes + 1
+
+            if self._rate is None or self._consecutive_successes < self._increase_after:
+                return
+
+            self._refill(monotonic())
+            self._rate = min(self._max_rate, self._rate * self._increase_factor)
+            self._consecutive_successes = 0
+
+    def record_throttled(self, delay):
+        """ Report a 429 response, lowering the rate and pausing all callers
+
+        Parameters
+        ----------
+        delay: int | float
+            The number of seconds the API asked us to wait (the
+            retry-after header or the caller's default delay). This
+            number should be non-negative.
+        """
+        assert delay >= 0
+
+        with self._lock:
+            now = monotonic()
+            self._consecutive_successes = 0
+            self._resume_time = max(self._resume_time, now + delay)
+
+            if self._rate is not None:
+                self._refill(now)
+                self._rate = max(self._min_rate, self._rate * self._decrease_factor)
+                # Do not let saved-up tokens fire a burst right after the pause
+                self._tokens = min(self._tokens, 1.0)
@@ -0,0 +1,372 @@
+#!/usr/bin/env python
+
+""" Deterministic synthetic PerSecData CSVs for benchmarks and tests
+
+The CSVs have the PerSecData layout documented in
+persec_data_api.save_raw_persec_data: a header row, a units row and one
+row per second. A job is made of stages; each stage has a pump
+schedule (rate ramp, pad, proppant ramp, flush) followed by a shut-in,
+and stages are separated by gaps with no rows. Which measurement
+columns a job has varies with the seed, like real PerSecData, and
+TIME TO ISIP is empty except after the pumps stop.
+
+Generate a file from Python:
+
+    generate_persec_csv('job.csv', num_rows=10_000_000, seed=7)
+
+or from the command line:
+
+    > python synthetic_persec.py job.csv --rows 10000000 --seed 7
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+""" The units of every PerSecData column the generator can emit, in
+    the column order of the real API """
+PERSEC_COLUMN_UNITS = {
+    'JOB TIME': '(datetime)',
+    'JOB TIME0': '(min)',
+    'STAGE TIME0': '(min)',
+    'TIME TO ISIP': '(min)',
+    'WELL NAME': '(none)',
+    'API NUMBER': '(none)',
+    'STAGE NUMBER': '(none)',
+    'TREATING PRESSURE': '(psi)',
+    'BOTTOMHOLE PRESSURE': '(psi)',
+    'ANNULUS PRESSURE': '(psi)',
+    'SURFACE PRESSURE': '(psi)',
+    'SLURRY RATE': '(bpm)',
+    'CLEAN VOLUME': '(bbl)',
+    'SLURRY VOLUME': '(bbl)',
+    'PROPPANT TOTAL': '(lbs)',
+    'PROPPANT CONC': '(lbs/gal)',
+    'BOTTOMHOLE PROPPANT CONC': '(lbs/gal)',
+}
+
+""" The columns every synthetic CSV has """
+REQUIRED_PERSEC_COLUMNS = ['JOB TIME', 'JOB TIME0', 'STAGE TIME0', 'TIME TO ISIP',
+                           'WELL NAME', 'API NUMBER', 'STAGE NUMBER',
+                           'TREATING PRESSURE', 'SLURRY RATE']
+
+""" The probability that each optional column is in a synthetic CSV """
+OPTIONAL_PERSEC_COLUMN_PROBABILITY = 0.7
+
+def choose_persec_columns(rng):
+    """ Return a plausible PerSecData column set
+
+    Every column in REQUIRED_PERSEC_COLUMNS is kept and each other
+    column of PERSEC_COLUMN_UNITS is kept with probability
+    OPTIONAL_PERSEC_COLUMN_PROBABILITY, in the real column order.
+
+    Parameters
+    ----------
+    rng: np.random.Generator
+        The random number generator
+
+    Returns
+    -------
+    columns: list(str)
+        The column labels
+    """
+    return [column for column in PERSEC_COLUMN_UNITS
+            if column in REQUIRED_PERSEC_COLUMNS
+            or rng.random() < OPTIONAL_PERSEC_COLUMN_PROBABILITY]
+
+def format_persec_job_time(job_time):
+    """ Return datetimes as PerSecData JOB TIME strings
+
+    The inverse of persec_data_api.parse_persec_job_time(): the
+    "%m/%d/%y %H:%M:%S" strings are assembled as a fixed-width byte
+    matrix, which is more than ten times faster than strftime.
+
+    Parameters
+    ----------
+    job_time: np.ndarray
+        datetime64 values
+
+    Returns
+    -------
+    job_time_strings: np.ndarray
+        The JOB TIME strings as an object array
+    """
+    seconds = np.asarray(job_time).astype('datetime64[s]')
+    days = seconds.astype('datetime64[D]')
+    months = days.astype('datetime64[M]')
+    years = months.astype('datetime64[Y]')
+
+    second_of_day = (seconds - days).astype(np.int64)
+    hour, second_of_hour = np.divmod(second_of_day, 3600)
+    minute, second = np.divmod(second_of_hour, 60)
+    fields = [((months - years.astype('datetime64[M]')).astype(np.int64) + 1, 0),
+              ((days - months.astype('datetime64[D]')).astype(np.int64) + 1, 3),
+              ((years.astype(np.int64) + 1970) % 100, 6),
+              (hour, 9),
+              (minute, 12),
+              (second, 15)]
+
+    characters = np.empty((len(seconds), 17), dtype=np.uint8)
+    for values, position in fields:
+        characters[:, position] = ord('0') + values // 10
+        characters[:, position + 1] = ord('0') + values % 10
+    characters[:, [2, 5]] = ord('/')
+    characters[:, 8] = ord(' ')
+    characters[:, [11, 14]] = ord(':')
+
+    return characters.view('S17').ravel().astype(str).astype(object)
+
+def make_persec_stage(rng, stage_number):
+    """ Return the per-second measurements of one stage
+
+    The stage pumps for 60 to 150 minutes: the slurry rate ramps up to
+    its target over the first minutes, proppant is added after a clean
+    pad and ramped up until the flush, and the pumps stop at the end.
+    A 5 to 15 minute shut-in follows with the pressure decaying from
+    the ISIP.
+
+    Parameters
+    ----------
+    rng: np.random.Generator
+        The random number generator
+
+    stage_number: int
+        The 1-based stage number
+
+    Returns
+    -------
+    stage: dict
+        The measurement arrays keyed by column label, plus the
+        per-row seconds since stage start in 'stage_second'
+    """
+    pump_seconds = int(rng.integers(60, 151)) * 60
+    shut_in_seconds = int(rng.integers(5, 16)) * 60
+    num_rows = pump_seconds + shut_in_seconds
+    stage_second = np.arange(num_rows)
+    pumping = stage_second < pump_seconds
+
+    # Slurry rate: ramp to the target rate, hold with noise, stop at shut-in
+    target_rate = rng.uniform(70, 100)
+    ramp_seconds = rng.uniform(180, 600)
+    slurry_rate = target_rate * np.minimum(1.0, stage_second / ramp_seconds)
+    slurry_rate = slurry_rate + rng.normal(0, 0.4, num_rows)
+    slurry_rate = np.where(pumping, np.maximum(slurry_rate, 0), 0.0)
+
+    # Proppant concentration: clean pad, linear ramp, clean flush
+    pad_end = 0.15 * pump_seconds
+    flush_start = 0.95 * pump_seconds
+    max_concentration = rng.uniform(1.5, 3.0)
+    ramp_fraction = np.clip((stage_second - pad_end) / (flush_start - pad_end), 0, 1)
+    proppant_conc = np.where((stage_second >= pad_end) & (stage_second < flush_start),
+                             0.25 + (max_concentration - 0.25) * ramp_fraction, 0.0)
+
+    # Bottomhole concentration lags the surface by the wellbore volume
+    lag_seconds = int(rng.integers(180, 300))
+    bottomhole_proppant_conc = np.concatenate([np.zeros(lag_seconds),
+                                               proppant_conc[:-lag_seconds]])
+
+    # Pressures: friction grows with rate; decay from the ISIP after shut-in
+    base_pressure = rng.uniform(5000, 8000)
+    isip = base_pressure * rng.uniform(0.7, 0.85)
+    friction = 0.35 * slurry_rate ** 1.8
+    shut_in_minutes = np.maximum(stage_second - pump_seconds, 0) / 60
+    treating_pressure = np.where(pumping,
+                                 base_pressure + friction - 150 * proppant_conc,
+                                 isip * np.exp(-0.01 * shut_in_minutes))
+    treating_pressure = treating_pressure + rng.normal(0, 15, num_rows)
+    hydrostatic = rng.uniform(3500, 4500)
+
+    clean_rate = slurry_rate / (1 + 0.045 * proppant_conc)
+
+    stage = {
+        'stage_second': stage_second,
+        'TIME TO ISIP': np.where(pumping, np.nan, shut_in_minutes),
+        'STAGE NUMBER': np.full(num_rows, stage_number),
+        'TREATING PRESSURE': treating_pressure,
+        'BOTTOMHOLE PRESSURE': treating_pressure + hydrostatic - friction,
+        'ANNULUS PRESSURE': rng.uniform(0, 30) + rng.normal(0, 2, num_rows),
+        'SURFACE PRESSURE': treating_pressure - rng.uniform(50, 150),
+        'SLURRY RATE': slurry_rate,
+        'CLEAN VOLUME': np.cumsum(clean_rate) / 60,
+        'SLURRY VOLUME': np.cumsum(slurry_rate) / 60,
+        'PROPPANT TOTAL': np.cumsum(clean_rate * 42 * proppant_conc) / 60,
+        'PROPPANT CONC': proppant_conc,
+        'BOTTOMHOLE PROPPANT CONC': bottomhole_proppant_conc,
+    }
+
+    return stage
+
+def iter_persec_csv_chunks(num_rows, seed=0, columns=None, chunk_rows=1_000_000,
+                           well_name='Synthetic Well', api_number='05-123-00000-00-00',
+                           start_time='2018-06-17 04:15:08'):
+    """ Yield a synthetic PerSecData CSV as bytes chunks
+
+    The first chunk is the header and units rows; each following chunk
+    holds up to chunk_rows data rows, so CSVs far larger than memory
+    can be written or served. The same arguments always yield the same
+    bytes.
+
+    Parameters
+    ----------
+    num_rows: int
+        The number of data rows. This number should be non-negative.
+
+    seed: int
+        The random seed for the column set and the measurements
+
+    columns: list(str) | None
+        The column labels, a subset of PERSEC_COLUMN_UNITS that includes
+        JOB TIME. None chooses a column set from the seed with
+        choose_persec_columns().
+
+    chunk_rows: int
+        The maximum number of rows per chunk. This number should be
+        positive.
+
+    well_name: str
+        The WELL NAME value
+
+    api_number: str
+        The API NUMBER value
+
+    start_time: str
+        The JOB TIME of the first row
+
+    Yields
+    ------
+    chunk: bytes
+        The next piece of the CSV
+    """
+    assert num_rows >= 0
+    assert isinstance(chunk_rows, int) and chunk_rows > 0
+
+    rng = np.random.default_rng(seed)
+    if columns is None:
+        columns = choose_persec_columns(rng)
+    assert 'JOB TIME' in columns
+    assert frozenset(columns) <= frozenset(PERSEC_COLUMN_UNITS)
+
+    yield (','.join(columns) + '\n' +
+           ','.join(PERSEC_COLUMN_UNITS[column] for column in columns) + '\n').encode('utf-8')
+
+    job_start = np.datetime64(pd.Timestamp(start_time).to_datetime64(), 's')
+    stage_start_second = 0
+    stage_number = 0
+    stages = []
+    num_buffered_rows = 0
+    num_written_rows = 0
+
+    while num_written_rows < num_rows:
+        # Generate whole stages until a chunk is full or the job is complete
+        while num_buffered_rows < chunk_rows and num_written_rows + num_buffered_rows < num_rows:
+            stage_number = stage_number + 1
+            stage = make_persec_stage(rng, stage_number)
+            stage['job_second'] = stage_start_second + stage['stage_second']
+            stages.append(stage)
+            num_buffered_rows = num_buffered_rows + len(stage['stage_second'])
+
+            # Gap of 20 minutes to 2 hours with no rows before the next stage
+            stage_start_second = (stage['job_second'][-1] + 1 +
+                                  int(rng.integers(20, 121)) * 60)
+
+        buffered = {key: np.concatenate([stage[key] for stage in stages]) for key in stages[0]}
+        num_chunk_rows = min(chunk_rows, num_rows - num_written_rows)
+
+        chunk_df = pd.DataFrame(index=pd.RangeIndex(num_chunk_rows))
+        for column in columns:
+            if column == 'JOB TIME':
+                values = format_persec_job_time(job_start + buffered['job_second'][:num_chunk_rows])
+            elif column == 'JOB TIME0':
+                values = (buffered['job_second'][:num_chunk_rows] + 1) / 60
+            elif column == 'STAGE TIME0':
+                values = buffered['stage_second'][:num_chunk_rows] / 60
+            elif column == 'WELL NAME':
+                values = well_name
+            elif column == 'API NUMBER':
+                values = api_number
+            else:
+                values = buffered[column][:num_chunk_rows]
+            chunk_df[column] = values
+
+        yield chunk_df.to_csv(header=False, index=False, float_format='%.6f',
+                              lineterminator='\n').encode('utf-8')
+
+        # Keep the rows of the last stage that did not fit in this chunk
+        num_written_rows = num_written_rows + num_chunk_rows
+        num_buffered_rows = num_buffered_rows - num_chunk_rows
+        stages = [{key: values[num_chunk_rows:] for key, values in buffered.items()}]
+
+def make_persec_csv(num_rows, seed=0, columns=None, **kwargs):
+    """ Return a synthetic PerSecData CSV as bytes
+
+    Parameters
+    ----------
+    num_rows: int
+        The number of data rows
+
+    seed: int
+        The random seed
+
+    columns: list(str) | None
+        The column labels. None chooses them from the seed.
+
+    kwargs:
+        Extra keyword arguments passed to iter_persec_csv_chunks
+
+    Returns
+    -------
+    csv_data: bytes
+        The complete CSV
+    """
+    return b''.join(iter_persec_csv_chunks(num_rows, seed=seed, columns=columns, **kwargs))
+
+def generate_persec_csv(filename, num_rows, seed=0, columns=None, **kwargs):
+    """ Write a synthetic PerSecData CSV to filename in chunks
+
+    Parameters
+    ----------
+    filename: str | pathlib.Path
+        The target CSV file
+
+    num_rows: int
+        The number of data rows, e.g., from 10,000 to 50,000,000
+
+    seed: int
+        The random seed
+
+    columns: list(str) | None
+        The column labels. None chooses them from the seed.
+
+    kwargs:
+        Extra keyword arguments passed to iter_persec_csv_chunks
+
+    Returns
+    -------
+    num_bytes: int
+        The size of the written file
+    """
+    num_bytes = 0
+    with open(filename, 'wb') as csv_file:
+        for chunk in iter_persec_csv_chunks(num_rows, seed=seed, columns=columns, **kwargs):
+            csv_file.write(chunk)
+            num_bytes = num_bytes + len(chunk)
+
+    return num_bytes
+
+def main():
+    """ Write a synthetic PerSecData CSV from the command line """
+    parser = argparse.ArgumentParser(description='Write a synthetic PerSecData CSV')
+    parser.add_argument('filename', help='target CSV file')
+    parser.add_argument('--rows', type=int, default=10_000, help='number of data rows')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--all-columns', action='store_true',
+                        help='emit every column instead of a seeded column set')
+    args = parser.parse_args()
+
+    columns = list(PERSEC_COLUMN_UNITS) if args.all_columns else None
+    num_bytes = generate_persec_csv(args.filename, args.rows, seed=args.seed, columns=columns)
+    print(f'Wrote {args.rows:,} rows ({num_bytes / (1024 * 1024):.1f} MB) to {args.filename}')
+
+if __name__ == "__main__":
+    main()
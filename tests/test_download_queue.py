@@ -0,0 +1,230 @@
+""" Tests for download_queue
+
+Run from the repository root:
+
+    > python -m unittest discover tests
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# pylint: disable=wrong-import-position
+import pandas as pd
+
+import download_queue
+import job_headers_api
+import persec_data_api
+
+from api_client import WDL_API_BASE_URL_VARIABLE
+from mock_wdl_api import MockWDLAPIServer
+
+class DownloadQueueTest(unittest.TestCase):
+    """ DownloadQueue """
+
+    job_ids = ['job-a', 'job-b', 'job-c']
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.temp_dir.name) / 'wdl-api.db')
+        job_headers_api.create_job_headers_table(self.db_path, 'JobHeaders')
+
+        self.queue = download_queue.DownloadQueue(self.db_path, 'DownloadQueue', 'JobHeaders',
+                                                  max_attempts=2)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def enqueue(self, modified_utc, job_ids=None):
+        if job_ids is None:
+            job_ids = self.job_ids
+        return self.queue.enqueue(pd.DataFrame({'job_id': job_ids,
+                                                'modified_utc': pd.Timestamp(modified_utc)}))
+
+    def get_rows(self):
+        """ Return {job_id: (state, attempts)} for every queued job """
+        with sqlite3.connect(self.db_path) as connection:
+            rows = connection.execute('select job_id, state, attempts from DownloadQueue')
+            return {job_id: (state, attempts) for job_id, state, attempts in rows}
+
+    def fail_job(self, job_id):
+        """ Claim and fail job_id until it is failed """
+        for _ in range(self.queue.max_attempts):
+            self.assertEqual(self.queue.claim(), [job_id])
+            self.queue.mark_failed([job_id])
+
+    def test_claim(self):
+        self.assertEqual(self.enqueue('2020-01-01'), 3)
+
+        self.assertEqual(self.queue.claim(2), ['job-a', 'job-b'])
+        self.assertEqual(self.queue.claim(2), ['job-c'])
+        self.assertEqual(self.queue.claim(2), [])
+
+        self.assertEqual(self.get_rows(), {job_id: (download_queue.IN_FLIGHT, 1)
+                                           for job_id in self.job_ids})
+
+    def test_mark_done_records_job_headers(self):
+        self.enqueue('2020-01-01')
+        self.queue.claim(2)
+
+        self.queue.mark_done('job-a')
+
+        self.assertEqual(self.queue.get_state_counts(),
+                         {download_queue.PENDING: 1, download_queue.IN_FLIGHT: 1,
+                          download_queue.DONE: 1, download_queue.FAILED: 0})
+        stored_df = job_headers_api.get_existing_job_headers(self.db_path, 'JobHeaders')
+        self.assertEqual(list(stored_df.job_id), ['job-a'])
+        self.assertEqual(list(stored_df.modified_utc), [pd.Timestamp('2020-01-01')])
+
+        # A done job is not queued again until its modified_utc changes
+        self.enqueue('2020-01-01', ['job-a'])
+        self.assertEqual(self.get_rows()['job-a'], (download_queue.DONE, 1))
+        self.enqueue('2020-02-01', ['job-a'])
+        self.assertEqual(self.get_rows()['job-a'], (download_queue.PENDING, 0))
+
+    def test_mark_failed(self):
+        self.enqueue('2020-01-01', ['job-a'])
+
+        self.queue.claim()
+        self.queue.mark_failed(['job-a'])
+        self.assertEqual(self.get_rows(), {'job-a': (download_queue.PENDING, 1)})
+
+        self.queue.claim()
+        self.queue.mark_failed(['job-a'])
+        self.assertEqual(self.get_rows(), {'job-a': (download_queue.FAILED, 2)})
+        self.assertEqual(self.queue.claim(), [])
+
+    def test_failed_job_stays_failed_until_modified(self):
+        self.enqueue('2020-01-01', ['job-a'])
+        self.fail_job('job-a')
+
+        # Syncing the same JobHeaders again does not retry the job
+        self.enqueue('2020-01-01', ['job-a'])
+        self.assertEqual(self.get_rows(), {'job-a': (download_queue.FAILED, 2)})
+        self.assertEqual(self.queue.claim(), [])
+
+        # A new version of the job is retried with fresh attempts
+        self.enqueue('2020-02-01', ['job-a'])
+        self.assertEqual(self.get_rows(), {'job-a': (download_queue.PENDING, 0)})
+        self.assertEqual(self.queue.claim(), ['job-a'])
+
+    def test_enqueue_leaves_in_flight_jobs(self):
+        self.enqueue('2020-01-01', ['job-a'])
+        self.queue.claim()
+
+        self.enqueue('2020-02-01', ['job-a'])
+        self.queue.mark_done('job-a')
+
+        # The JobHeaders row records the version that was downloaded
+        stored_df = job_headers_api.get_existing_job_headers(self.db_path, 'JobHeaders')
+        self.assertEqual(list(stored_df.modified_utc), [pd.Timestamp('2020-01-01')])
+
+    def test_release_stale_claims(self):
+        self.enqueue('2020-01-01')
+        self.queue.claim(2)
+
+        # The claims were just made, so none is old enough to release
+        self.assertEqual(self.queue.release_stale_claims(older_than=3600), 0)
+        self.assertEqual(self.queue.get_state_counts()[download_queue.IN_FLIGHT], 2)
+
+        self.assertEqual(self.queue.release_stale_claims(), 2)
+        self.assertEqual(self.get_rows(), {'job-a': (download_queue.PENDING, 1),
+                                           'job-b': (download_queue.PENDING, 1),
+                                           'job-c': (download_queue.PENDING, 0)})
+
+        # Released jobs keep their attempts and are claimed first
+        self.assertEqual(self.queue.claim(), ['job-a'])
+
+class RunDownloadQueueContentHashTest(unittest.TestCase):
+    """ run_download_queue() skipping unchanged PerSecData payloads """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name)
+
+        self.server = MockWDLAPIServer(num_jobs=3, rows_per_job=400, cache_bodies=False).start()
+        self.environ = mock.patch.dict(os.environ,
+                                       {WDL_API_BASE_URL_VARIABLE: self.server.base_url})
+        self.environ.start()
+
+        self.queue = download_queue.DownloadQueue(str(self.path / 'wdl-api.db'), 'DownloadQueue')
+
+    def tearDown(self):
+        self.environ.stop()
+        self.server.stop()
+        self.temp_dir.cleanup()
+
+    def enqueue(self, modified_utc):
+        self.queue.enqueue(pd.DataFrame({'job_id': self.server.job_ids,
+                                         'modified_utc': pd.Timestamp(modified_utc)}))
+
+    def run_queue(self, **download_kwargs):
+        with mock.patch.object(persec_data_api, 'save_persec_outputs',
+                               wraps=persec_data_api.save_persec_outputs) as save_mock:
+            state_counts = download_queue.run_download_queue(self.queue, 'api-key', self.path,
+                                                             default_delay=0, **download_kwargs)
+
+        self.assertEqual(state_counts[download_queue.DONE], len(self.server.job_ids))
+        return {call.kwargs['persec_filenames'].raw_filename.name.split('_', 1)[1][:-4]
+                for call in save_mock.call_args_list}
+
+    def assert_raw_files_match_server(self):
+        for job_id in self.server.job_ids:
+            self.assertEqual((self.path / f'original_{job_id}.csv').read_bytes(),
+                             self.server.get_persec_body(job_id))
+
+    def check_skips_unchanged_payloads(self, **download_kwargs):
+        self.enqueue('2020-01-01')
+        self.assertEqual(self.run_queue(**download_kwargs), set(self.server.job_ids))
+        for job_id in self.server.job_ids:
+            self.assertIsNotNone(self.queue.get_content_hash(job_id))
+
+        # A JobHeaders-only edit bumps modified_utc; one job also gets new rows
+        changed_job_id = self.server.job_ids[1]
+        self.server.rows_per_job[changed_job_id] = 500
+        self.enqueue('2020-02-01')
+
+        self.assertEqual(self.run_queue(**download_kwargs), {changed_job_id})
+        self.assert_raw_files_match_server()
+
+        # The hash lives in the queue row, not in side files
+        self.assertEqual(list(self.path.glob('hash_*')), [])
+
+    def test_skips_unchanged_payloads(self):
+        self.check_skips_unchanged_payloads()
+
+    def test_skips_unchanged_streamed_payloads(self):
+        spool_files = []
+
+        def spooled_temporary_file(max_size): #pylint: disable=unused-argument
+            # A small spool makes the changed body spill to a temporary file
+            spool_file = tempfile.SpooledTemporaryFile(max_size=1024)
+            spool_files.append(spool_file)
+            return spool_file
+
+        with mock.patch.object(persec_data_api, 'SpooledTemporaryFile', spooled_temporary_file):
+            self.check_skips_unchanged_payloads(stream=True)
+
+        # Only the jobs with a stored hash are spooled
+        self.assertEqual(len(spool_files), len(self.server.job_ids))
+
+    def test_missing_output_is_rewritten(self):
+        self.enqueue('2020-01-01')
+        self.run_queue()
+
+        missing_job_id = self.server.job_ids[0]
+        (self.path / f'formatted_{missing_job_id}.csv').unlink()
+        self.enqueue('2020-02-01')
+
+        self.assertEqual(self.run_queue(stream=True), {missing_job_id})
+        self.assertTrue((self.path / f'formatted_{missing_job_id}.csv').exists())
+
+if __name__ == '__main__':
+    unittest.main()
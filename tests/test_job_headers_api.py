@@ -0,0 +1,185 @@
+""" Tests for job_headers_api
+
+Run from the repository root:
+
+    > python -m unittest discover tests
+"""
+
+import json
+import sys
+import tempfile
+import unittest
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# pylint: disable=wrong-import-position
+import pandas as pd
+
+from sqlalchemy import exc
+
+import job_headers_api
+
+def make_job_headers_df(modified_utcs):
+    """ Return JobHeaders rows for a dict of job_id: modified_utc """
+    return pd.DataFrame({'job_id': list(modified_utcs),
+                         'modified_utc': pd.to_datetime(list(modified_utcs.values()))})
+
+class UpdateJobHeadersDbRowsTest(unittest.TestCase):
+    """ update_job_headers_db_rows() """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.temp_dir.name) / 'wdl-api.db')
+        job_headers_api.create_job_headers_table(self.db_path, 'JobHeaders')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def get_stored_df(self):
+        return (job_headers_api.get_existing_job_headers(self.db_path, 'JobHeaders')
+                .sort_values('job_id')
+                .reset_index(drop=True))
+
+    def test_inserts_and_updates_rows(self):
+        job_headers_df = make_job_headers_df({'a': '2020-01-01', 'b': '2020-01-02',
+                                              'c': '2020-01-03'})
+        self.assertEqual(job_headers_api.update_job_headers_db_rows(
+            job_headers_df, self.db_path, 'JobHeaders'), 3)
+
+        # Update one row, add one and leave the others alone
+        job_headers_df = make_job_headers_df({'b': '2020-02-02', 'd': '2020-02-04'})
+        self.assertEqual(job_headers_api.update_job_headers_db_rows(
+            job_headers_df, self.db_path, 'JobHeaders'), 2)
+
+        stored_df = self.get_stored_df()
+        self.assertEqual(list(stored_df.job_id), ['a', 'b', 'c', 'd'])
+        self.assertEqual(list(stored_df.modified_utc),
+                         list(pd.to_datetime(['2020-01-01', '2020-02-02', '2020-01-03',
+                                              '2020-02-04'])))
+
+    def test_only_job_ids_are_written(self):
+        job_headers_df = make_job_headers_df({'a': '2020-01-01', 'b': '2020-01-02'})
+
+        num_rows = job_headers_api.update_job_headers_db_rows(
+            job_headers_df, self.db_path, 'JobHeaders', job_ids=['b', 'missing'])
+
+        self.assertEqual(num_rows, 1)
+        self.assertEqual(list(self.get_stored_df().job_id), ['b'])
+
+    def test_last_duplicate_and_missing_modified_utc(self):
+        job_headers_df = pd.DataFrame({'job_id': ['a', 'a', 'b'],
+                                       'modified_utc': pd.to_datetime(['2020-01-01',
+                                                                       '2020-01-05', None])})
+
+        self.assertEqual(job_headers_api.update_job_headers_db_rows(
+            job_headers_df, self.db_path, 'JobHeaders'), 2)
+
+        stored_df = self.get_stored_df()
+        self.assertEqual(stored_df.modified_utc[0], pd.Timestamp('2020-01-05'))
+        self.assertTrue(pd.isna(stored_df.modified_utc[1]))
+
+    def test_empty_update_writes_nothing(self):
+        self.assertEqual(job_headers_api.update_job_headers_db_rows(
+            make_job_headers_df({}), self.db_path, 'JobHeaders'), 0)
+
+    def test_failed_upsert_raises(self):
+        job_headers_df = make_job_headers_df({'a': '2020-01-01'})
+
+        with self.assertRaises(exc.SQLAlchemyError):
+            job_headers_api.update_job_headers_db_rows(job_headers_df, self.db_path,
+                                                       'MissingTable')
+
+class IdentifyJobIdsToDownloadInDbTest(unittest.TestCase):
+    """ identify_job_ids_to_download_in_db() """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.temp_dir.name) / 'wdl-api.db')
+        job_headers_api.create_job_headers_table(self.db_path, 'JobHeaders')
+
+        stored_df = pd.DataFrame({'job_id': ['same', 'changed', 'stored-null', 'both-null',
+                                             'new-null', 'gone'],
+                                  'modified_utc': pd.to_datetime(['2020-01-01', '2020-01-02',
+                                                                  None, None, '2020-01-05',
+                                                                  '2020-01-06'])})
+        job_headers_api.update_job_headers_db_rows(stored_df, self.db_path, 'JobHeaders')
+
+        self.current_df = pd.DataFrame({'job_id': ['same', 'changed', 'stored-null',
+                                                   'both-null', 'new-null', 'missing'],
+                                        'modified_utc': pd.to_datetime(['2020-01-01',
+                                                                        '2020-02-02',
+                                                                        '2020-01-03', None,
+                                                                        None, '2020-01-07'])})
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_missing_changed_and_null_jobs(self):
+        job_ids = job_headers_api.identify_job_ids_to_download_in_db(self.current_df,
+                                                                     self.db_path, 'JobHeaders')
+
+        self.assertEqual(job_ids, frozenset(['changed', 'stored-null', 'both-null', 'new-null',
+                                             'missing']))
+
+    def test_matches_pandas_diff_for_known_values(self):
+        current_df = self.current_df.dropna()
+        existing_df = job_headers_api.get_existing_job_headers(self.db_path, 'JobHeaders')
+
+        self.assertEqual(
+            job_headers_api.identify_job_ids_to_download_in_db(current_df, self.db_path,
+                                                               'JobHeaders'),
+            frozenset(job_headers_api.identify_job_ids_to_download(current_df,
+                                                                   existing_df.dropna())))
+
+    def test_state_store_and_empty_input(self):
+        with job_headers_api.JobHeadersStateStore(self.db_path, wal=True) as state_store:
+            self.assertEqual(job_headers_api.identify_job_ids_to_download_in_db(
+                self.current_df.iloc[:1], None, 'JobHeaders', state_store=state_store),
+                             frozenset())
+            self.assertEqual(job_headers_api.identify_job_ids_to_download_in_db(
+                self.current_df.iloc[:0], None, 'JobHeaders', state_store=state_store),
+                             frozenset())
+
+class IterJsonArrayTest(unittest.TestCase):
+    """ iter_json_array() """
+
+    elements = [{'a': 'h\u00e9llo \u2713', 'b': [1, 2.5e-3]}, 1.5, -12e+3, 'x', [], {}, True,
+                None, 7]
+
+    def setUp(self):
+        # indent puts whitespace and newlines between the elements
+        self.document = json.dumps(self.elements, indent=2, ensure_ascii=False).encode()
+
+    def test_split_at_every_byte(self):
+        for position in range(len(self.document)):
+            chunks = [self.document[:position], self.document[position:]]
+            with self.subTest(position=position):
+                self.assertEqual(list(job_headers_api.iter_json_array(chunks)), self.elements)
+
+    def test_single_byte_chunks(self):
+        chunks = [self.document[i:i + 1] for i in range(len(self.document))]
+
+        self.assertEqual(list(job_headers_api.iter_json_array(chunks)), self.elements)
+
+    def test_multibyte_character_split_across_chunks(self):
+        document = json.dumps(['\u2713'], ensure_ascii=False).encode()
+        position = document.index('\u2713'.encode()) + 1
+
+        self.assertEqual(list(job_headers_api.iter_json_array(
+            [document[:position], document[position:]])), ['\u2713'])
+
+    def test_empty_array(self):
+        for document in [b'[]', b'[ ]', b' [\n] \n']:
+            with self.subTest(document=document):
+                self.assertEqual(list(job_headers_api.iter_json_array([document])), [])
+
+    def test_truncated_input_raises(self):
+        for document in [b'', b'[', b'[1, 2', b'[1, 2,', b'[{"a": 1', b'["abc']:
+            with self.subTest(document=document):
+                with self.assertRaises(ValueError):
+                    list(job_headers_api.iter_json_array([document]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,312 @@
+""" Tests for persec_data_api
+
+Run from the repository root:
+
+    > python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# pylint: disable=wrong-import-position
+import pandas as pd
+
+import persec_data_api
+import synthetic_persec
+
+from api_client import WDL_API_BASE_URL_VARIABLE
+from mock_wdl_api import MockWDLAPIServer
+
+class DownloadPersecDataConcurrentlyTest(unittest.TestCase):
+    """ download_persec_data_concurrently() """
+
+    def test_worker_exception_does_not_drop_successes(self):
+        job_ids = [f'job-{number}' for number in range(10)]
+
+        def download_job_persec(job_id, **kwargs): #pylint: disable=unused-argument
+            if job_id == 'job-3':
+                raise RuntimeError('worker failed')
+            return True
+
+        updated_job_ids = []
+        with mock.patch.object(persec_data_api, 'download_job_persec', download_job_persec):
+            persec_data_api.download_persec_data_concurrently(
+                job_ids=job_ids,
+                api_key='api-key',
+                get_persec_filenames=lambda job_id: persec_data_api.PerSecFilenames(None, None, None),
+                local_job_headers_updater=lambda job_id: updated_job_ids.append(job_id),
+                max_workers=4)
+
+        self.assertEqual(sorted(updated_job_ids),
+                         sorted(job_id for job_id in job_ids if job_id != 'job-3'))
+
+class ParsePersecJobTimeTest(unittest.TestCase):
+    """ parse_persec_job_time() """
+
+    def test_fallback_matches_fast_path(self):
+        job_time = pd.Series(['06/17/18 04:15:08', '06/17/18 04:15:09'], name='JOB TIME')
+        parsed = persec_data_api.parse_persec_job_time(job_time)
+
+        # A missing value does not fit the fixed layout and uses pd.to_datetime()
+        fallback = persec_data_api.parse_persec_job_time(pd.concat([job_time, pd.Series([None])],
+                                                                   ignore_index=True))
+
+        self.assertEqual(parsed.dtype, 'datetime64[ns]')
+        self.assertEqual(fallback.dtype, parsed.dtype)
+        self.assertTrue(fallback.iloc[:2].equals(parsed))
+        self.assertTrue(pd.isna(fallback.iloc[2]))
+
+class SavePersecDataTest(unittest.TestCase):
+    """ save_raw_persec_data(), save_formatted_persec_data() and save_persec_units_data() """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name)
+        self.csv_data = synthetic_persec.make_persec_csv(500, seed=3)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_raw_is_a_byte_copy(self):
+        for csv_data in (self.csv_data, self.csv_data.decode('utf-8')):
+            persec_data_api.save_raw_persec_data(csv_data, self.path / 'raw.csv')
+            self.assertEqual((self.path / 'raw.csv').read_bytes(), self.csv_data)
+
+    def test_units_from_path(self):
+        csv_filename = self.path / 'job.csv'
+        csv_filename.write_bytes(self.csv_data)
+
+        persec_data_api.save_persec_units_data(csv_filename, self.path / 'units.csv')
+
+        units_df = pd.read_csv(self.path / 'units.csv')
+        self.assertEqual(len(units_df), 1)
+        self.assertEqual(units_df.columns[0], 'job_time')
+        self.assertEqual(units_df.job_time[0], 'datetime')
+
+    def test_chunked_formatted_from_path_and_file_matches_whole(self):
+        csv_filename = self.path / 'job.csv'
+        csv_filename.write_bytes(self.csv_data)
+
+        persec_data_api.save_formatted_persec_data(self.csv_data.decode('utf-8'),
+                                                   self.path / 'whole.csv')
+        persec_data_api.save_formatted_persec_data(csv_filename, self.path / 'from_path.csv',
+                                                   chunksize=64)
+        with csv_filename.open('rb') as csv_file:
+            persec_data_api.save_formatted_persec_data(csv_file, self.path / 'from_file.csv',
+                                                       chunksize=64)
+
+        whole = (self.path / 'whole.csv').read_bytes()
+        self.assertEqual((self.path / 'from_path.csv').read_bytes(), whole)
+        self.assertEqual((self.path / 'from_file.csv').read_bytes(), whole)
+        self.assertEqual(len(pd.read_csv(self.path / 'whole.csv')), 500)
+
+@unittest.skipIf(persec_data_api.pa is None, 'pyarrow is not installed')
+class PerSecColumnarWriterTest(unittest.TestCase):
+    """ PerSecColumnarWriter """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name)
+
+        columns = ['JOB TIME', 'JOB TIME0', 'WELL NAME', 'API NUMBER', 'STAGE NUMBER',
+                   'TREATING PRESSURE', 'SLURRY RATE']
+        csv_data = synthetic_persec.make_persec_csv(300, seed=5, columns=columns)
+
+        units_df = pd.read_csv(BytesIO(csv_data), nrows=1)
+        self.formatted_units = dict(persec_data_api.format_persec_units_dataframe(units_df).iloc[0])
+        self.formatted_df = persec_data_api.format_persec_dataframe(
+            pd.read_csv(BytesIO(csv_data), skiprows=[1]))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read_table(self, filename):
+        if filename.suffix == '.arrow':
+            with persec_data_api.pa.memory_map(str(filename), 'r') as source:
+                return persec_data_api.pa.ipc.open_file(source).read_all()
+        return persec_data_api.pq.read_table(str(filename))
+
+    def test_dtypes_and_units(self):
+        pa = persec_data_api.pa
+        for suffix in ('.parquet', '.arrow'):
+            filename = self.path / f'formatted{suffix}'
+            with persec_data_api.PerSecColumnarWriter(filename, self.formatted_units) as writer:
+                writer.write(self.formatted_df.iloc[:100])
+                writer.write(self.formatted_df.iloc[100:])
+
+            table = self.read_table(filename)
+            self.assertEqual(table.num_rows, len(self.formatted_df))
+            self.assertEqual(table.schema.field('job_time').type, pa.timestamp('ms'))
+            self.assertTrue(pa.types.is_dictionary(table.schema.field('well_name').type))
+            self.assertEqual(table.schema.field('stage_number').type, pa.int64())
+            self.assertEqual(table.schema.field('treating_pressure').type, pa.float64())
+            self.assertEqual(table.schema.field('treating_pressure').metadata[b'units'], b'psi')
+
+    def test_append_keeps_existing_rows(self):
+        for suffix in ('.parquet', '.arrow'):
+            filename = self.path / f'formatted{suffix}'
+            with persec_data_api.PerSecColumnarWriter(filename, self.formatted_units) as writer:
+                writer.write(self.formatted_df.iloc[:200])
+
+            # Keep the first 150 rows and append the rest of the job after them
+            with persec_data_api.PerSecColumnarWriter(filename, self.formatted_units,
+                                                      keep_existing_rows=150) as writer:
+                writer.write(self.formatted_df.iloc[150:])
+
+            self.assertEqual(writer.num_rows, len(self.formatted_df))
+            self.assertFalse(filename.with_name(filename.name + '.tmp').exists())
+
+            table_df = self.read_table(filename).to_pandas()
+            self.assertEqual(len(table_df), len(self.formatted_df))
+            self.assertTrue((table_df.job_time.to_numpy()
+                             == self.formatted_df.job_time.to_numpy()).all())
+
+    def test_failed_append_keeps_original(self):
+        filename = self.path / 'formatted.parquet'
+        with persec_data_api.PerSecColumnarWriter(filename, self.formatted_units) as writer:
+            writer.write(self.formatted_df.iloc[:200])
+
+        with self.assertRaises(RuntimeError):
+            with persec_data_api.PerSecColumnarWriter(filename, self.formatted_units,
+                                                      keep_existing_rows=200) as writer:
+                writer.write(self.formatted_df.iloc[200:])
+                raise RuntimeError('interrupted')
+
+        self.assertEqual(self.read_table(filename).num_rows, 200)
+        self.assertFalse(filename.with_name(filename.name + '.tmp').exists())
+
+class IncrementalPersecOutputsTest(unittest.TestCase):
+    """ save_persec_outputs() with a state file """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name)
+
+        self.csv_data = synthetic_persec.make_persec_csv(500, seed=11)
+        lines = self.csv_data.splitlines(keepends=True)
+        self.first_csv_data = b''.join(lines[:2 + 300])
+
+        columnar_filename = self.path / 'formatted.parquet' if persec_data_api.pa else None
+        self.persec_filenames = persec_data_api.PerSecFilenames(
+            raw_filename=self.path / 'raw.csv',
+            formatted_filename=self.path / 'formatted.csv',
+            units_filename=self.path / 'units.csv',
+            columnar_filename=columnar_filename,
+            state_filename=self.path / 'state.json')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def save(self, csv_data, persec_filenames=None):
+        persec_data_api.save_persec_outputs(BytesIO(csv_data),
+                                            persec_filenames or self.persec_filenames,
+                                            chunksize=128)
+
+    def assert_outputs_match_full_payload(self):
+        self.assertEqual(self.persec_filenames.raw_filename.read_bytes(), self.csv_data)
+
+        expected_filenames = self.persec_filenames._replace(
+            raw_filename=None, units_filename=None, state_filename=None,
+            formatted_filename=self.path / 'expected.csv',
+            columnar_filename=None)
+        self.save(self.csv_data, expected_filenames)
+        self.assertEqual(self.persec_filenames.formatted_filename.read_bytes(),
+                         expected_filenames.formatted_filename.read_bytes())
+
+        if self.persec_filenames.columnar_filename:
+            table = persec_data_api.pq.read_table(str(self.persec_filenames.columnar_filename))
+            self.assertEqual(table.num_rows, 500)
+
+        state = persec_data_api.load_persec_state(self.persec_filenames.state_filename)
+        last_job_time = pd.read_csv(BytesIO(self.csv_data), skiprows=[1])['JOB TIME'].iloc[-1]
+        self.assertEqual(pd.Timestamp(state['last_job_time']),
+                         pd.to_datetime(last_job_time, format=persec_data_api.PERSEC_JOB_TIME_FORMAT))
+
+    def test_appends_only_new_rows(self):
+        self.save(self.first_csv_data)
+        state = persec_data_api.load_persec_state(self.persec_filenames.state_filename)
+        self.assertEqual(state['file_sizes']['raw_filename'], len(self.first_csv_data))
+
+        with mock.patch.object(persec_data_api, 'format_persec_dataframe',
+                               wraps=persec_data_api.format_persec_dataframe) as format_mock:
+            self.save(self.csv_data)
+
+        # Only the 200 new rows are parsed and formatted
+        self.assertEqual(sum(len(call.args[0]) for call in format_mock.call_args_list), 200)
+        self.assert_outputs_match_full_payload()
+
+    def test_rows_written_after_the_state_are_dropped(self):
+        self.save(self.first_csv_data)
+
+        # An interrupted run wrote part of a row after the state was saved
+        with self.persec_filenames.raw_filename.open('ab') as raw_file:
+            raw_file.write(b'06/17/18 0')
+        with self.persec_filenames.formatted_filename.open('a') as formatted_file:
+            formatted_file.write('2018-06-17 0')
+
+        self.save(self.csv_data)
+        self.assert_outputs_match_full_payload()
+
+    def test_identical_payload_appends_nothing(self):
+        self.save(self.csv_data)
+        raw_mtime = self.persec_filenames.raw_filename.stat().st_mtime_ns
+
+        self.save(self.csv_data)
+
+        self.assertEqual(self.persec_filenames.raw_filename.stat().st_mtime_ns, raw_mtime)
+        self.assert_outputs_match_full_payload()
+
+    def test_changed_columns_rewrite_the_outputs(self):
+        self.save(synthetic_persec.make_persec_csv(300, seed=11, columns=['JOB TIME', 'JOB TIME0']))
+        self.save(self.csv_data)
+        self.assert_outputs_match_full_payload()
+
+class DownloadPersecDataHashFileTest(unittest.TestCase):
+    """ download_persec_data() with hash files """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name)
+
+        self.server = MockWDLAPIServer(num_jobs=2, rows_per_job=200).start()
+        self.environ = mock.patch.dict(os.environ,
+                                       {WDL_API_BASE_URL_VARIABLE: self.server.base_url})
+        self.environ.start()
+
+        self.job_header_df = pd.DataFrame({'job_id': self.server.job_ids})
+
+    def tearDown(self):
+        self.environ.stop()
+        self.server.stop()
+        self.temp_dir.cleanup()
+
+    def download(self, **kwargs):
+        with mock.patch.object(persec_data_api, 'save_persec_outputs',
+                               wraps=persec_data_api.save_persec_outputs) as save_mock:
+            persec_data_api.download_persec_data(self.job_header_df, 'api-key', self.path,
+                                                 default_delay=0, **kwargs)
+        return save_mock.call_count
+
+    def test_no_hash_files_by_default(self):
+        self.assertEqual(self.download(), 2)
+        self.assertEqual(self.download(), 2)
+        self.assertEqual(list(self.path.glob('hash_*')), [])
+
+    def test_opt_in_hash_files_skip_unchanged_payloads(self):
+        hash_function = persec_data_api.default_hash_filename
+        self.assertEqual(self.download(hash_filename_function=hash_function), 2)
+        self.assertEqual(len(list(self.path.glob('hash_*.sha256'))), 2)
+
+        self.assertEqual(self.download(hash_filename_function=hash_function), 0)
+        self.assertEqual(self.download(hash_filename_function=hash_function, stream=True), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+""" Tests for rate_limiter
+
+Run from the repository root:
+
+    > python -m unittest discover tests
+"""
+
+import sys
+import unittest
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# pylint: disable=wrong-import-position
+from rate_limiter import DEFAULT_MAX_RATE, RateLimiter
+
+class RateLimiterTest(unittest.TestCase):
+    """ RateLimiter """
+
+    def test_recovery_probes_above_initial_rate_up_to_default_ceiling(self):
+        limiter = RateLimiter(rate=0.1, increase_factor=2.0, increase_after=1)
+
+        limiter.record_throttled(0)
+        self.assertEqual(limiter.rate, 0.05)
+
+        for _ in range(20):
+            limiter.record_success()
+        self.assertEqual(limiter.rate, DEFAULT_MAX_RATE)
+
+    def test_recovery_stops_at_max_rate(self):
+        limiter = RateLimiter(rate=2.0, max_rate=5.0, increase_factor=2.0, increase_after=1)
+
+        for _ in range(10):
+            limiter.record_success()
+        self.assertEqual(limiter.rate, 5.0)
+
+    def test_rate_equal_to_max_rate_never_rises(self):
+        limiter = RateLimiter(rate=2.0, max_rate=2.0, increase_factor=2.0, increase_after=1)
+
+        limiter.record_throttled(0)
+        for _ in range(10):
+            limiter.record_success()
+        self.assertEqual(limiter.rate, 2.0)
+
+    def test_rate_below_min_rate_is_rejected(self):
+        with self.assertRaises(AssertionError):
+            RateLimiter(rate=0.01, min_rate=0.1)
+
+    def test_rate_above_max_rate_is_rejected(self):
+        with self.assertRaises(AssertionError):
+            RateLimiter(rate=10.0, max_rate=5.0)
+
+    def test_unpaced_limiter_stays_unpaced(self):
+        limiter = RateLimiter()
+
+        limiter.record_throttled(0)
+        limiter.record_success()
+        self.assertIsNone(limiter.rate)
+
+if __name__ == '__main__':
+    unittest.main()
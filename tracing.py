@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+
+""" Lightweight tracing spans for the WDL API download pipeline
+
+Pass a Tracer as the tracer of the download functions to record how
+long each stage of a PerSecData download takes:
+
+    tracer = Tracer()
+    persec_data_api.download_persec_data(..., tracer=tracer)
+    print(tracer.get_stage_summary())
+    tracer.write_chrome_trace('sync.trace.json')
+
+The Chrome trace-event file opens in chrome://tracing or
+https://ui.perfetto.dev; write_otlp_json() writes the same spans as an
+OpenTelemetry OTLP/JSON file. The functions default to NULL_TRACER,
+which records nothing.
+"""
+
+import json
+import os
+
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+from itertools import count
+from threading import Lock, current_thread, get_native_id, local
+from time import perf_counter_ns, time_ns
+from uuid import uuid4
+
+import pandas as pd
+
+""" One finished span
+
+    name: the stage name, e.g., 'persec.read_csv'
+    span_id: a number unique within the tracer
+    parent_id: the span_id of the enclosing span in the same thread,
+        None for a top-level span
+    thread_id: the native id of the thread that ran the stage
+    thread_name: the name of that thread
+    start_ns: perf_counter_ns() when the stage started
+    end_ns: perf_counter_ns() when the stage ended
+    attributes: a dict of extra information, e.g., the job_id """
+Span = namedtuple('Span',
+                  'name span_id parent_id thread_id thread_name start_ns end_ns attributes')
+
+class Tracer:
+    """ Records nested, timed spans from any number of threads
+
+    Spans are opened with span() and nest per thread: a span opened
+    while another is open in the same thread becomes its child. The
+    tracer is thread-safe and can be shared by concurrent PerSecData
+    workers.
+
+    The overhead is two perf_counter_ns() calls and a list append per
+    span, so the download functions only open spans per request and
+    per block of rows, never per row.
+    """
+    def __init__(self):
+        self.spans = []
+
+        self._lock = Lock()
+        self._local = local()
+        self._span_ids = count(1)
+
+        # Offset from perf_counter_ns() to nanoseconds since the epoch
+        self._epoch_offset_ns = time_ns() - perf_counter_ns()
+
+    def get_open_span_ids(self):
+        """ Return the stack of open span ids of the calling thread """
+        open_span_ids = getattr(self._local, 'open_span_ids', None)
+        if open_span_ids is None:
+            open_span_ids = self._local.open_span_ids = []
+
+        return open_span_ids
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """ Time the enclosed block as a span called name
+
+        Parameters
+        ----------
+        name: str
+            The stage name
+
+        attributes:
+            Extra information stored with the span
+
+        Yields
+        ------
+        attributes: dict
+            The span attributes, which the block may add to
+        """
+        open_span_ids = self.get_open_span_ids()
+        parent_id = open_span_ids[-1] if open_span_ids else None
+        span_id = next(self._span_ids)
+
+        open_span_ids.append(span_id)
+        start_ns = perf_counter_ns()
+        try:
+            yield attributes
+        finally:
+            end_ns = perf_counter_ns()
+            open_span_ids.pop()
+            self.record_span(Span(name=name,
+                                  span_id=span_id,
+                                  parent_id=parent_id,
+                                  thread_id=get_native_id(),
+                                  thread_name=current_thread().name,
+                                  start_ns=start_ns,
+                                  end_ns=end_ns,
+                                  attributes=attributes))
+
+    def add_span(self, name, start_time, end_time, **attributes):
+        """ Record a stage that has already been timed
+
+        The span becomes a child of the span open in the calling thread.
+
+        Parameters
+        ----------
+        name: str
+            The stage name
+
+        start_time: float
+            time.perf_counter() when the stage started
+
+        end_time: float
+            time.perf_counter() when the stage ended
+
+        attributes:
+            Extra information stored with the span
+        """
+        assert end_time >= start_time
+
+        open_span_ids = self.get_open_span_ids()
+        self.record_span(Span(name=name,
+                              span_id=next(self._span_ids),
+                              parent_id=open_span_ids[-1] if open_span_ids else None,
+                              thread_id=get_native_id(),
+                              thread_name=current_thread().name,
+                              start_ns=int(start_time * 1e9),
+                              end_ns=int(end_time * 1e9),
+                              attributes=attributes))
+
+    def iter_spans(self, name, iterable, **attributes):
+        """ Yield the items of iterable, timing each step as a span
+
+        Useful for lazy readers such as pd.read_csv(chunksize=...), where
+        the work happens when the next item is requested.
+
+        Parameters
+        ----------
+        name: str
+            The stage name of every step
+
+        iterable: Iterable
+            The items to yield
+
+        attributes:
+            Extra information stored with every span
+        """
+        iterator = iter(iterable)
+        for step in count():
+            with self.span(name, step=step, **attributes):
+                item = next(iterator, StopIteration)
+            if item is StopIteration:
+                return
+            yield item
+
+    def record_span(self, span):
+        """ Store a finished span """
+        with self._lock:
+            self.spans.append(span)
+
+    def get_stage_summary(self):
+        """ Return the time spent in each stage
+
+        Returns
+        -------
+        summary_df: pd.DataFrame
+            One row per span name with the count and the total, mean and
+            maximum seconds, sorted by total seconds, largest first
+        """
+        with self._lock:
+            spans = list(self.spans)
+
+        spans_df = pd.DataFrame({'name': [span.name for span in spans],
+                                 'seconds': [(span.end_ns - span.start_ns) / 1e9
+                                             for span in spans]})
+        summary_df = spans_df.groupby('name')['seconds'].agg(['count', 'sum', 'mean', 'max'])
+        summary_df = summary_df.rename(columns={'sum': 'total_seconds',
+                                                'mean': 'mean_seconds',
+                                                'max': 'max_seconds'})
+
+        return summary_df.sort_values('total_seconds', ascending=False)
+
+    def get_chrome_trace(self):
+        """ Return the spans as a Chrome trace-event JSON object
+
+        Every span is a complete ('X') event with microsecond timestamps;
+        thread names are added as metadata events.
+
+        Returns
+        -------
+        trace: dict
+            The object to serialize with json.dump()
+        """
+        with self._lock:
+            spans = list(self.spans)
+
+        pid = os.getpid()
+        events = []
+        thread_names = {}
+        for span in spans:
+            thread_names[span.thread_id] = span.thread_name
+            events.append({'name': span.name,
+                           'cat': span.name.split('.')[0],
+                           'ph': 'X',
+                           'ts': (span.start_ns + self._epoch_offset_ns) / 1e3,
+                           'dur': (span.end_ns - span.start_ns) / 1e3,
+                           'pid': pid,
+                           'tid': span.thread_id,
+                           'args': {key: str(value) for key, value in span.attributes.items()}})
+
+        for thread_id, thread_name in thread_names.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread_id,
+                           'args': {'name': thread_name}})
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, filename):
+        """ Write the spans to filename as Chrome trace-event JSON
+
+        Parameters
+        ----------
+        filename: str | pathlib.Path
+            The target .json file
+        """
+        with open(filename, 'w') as trace_file:
+            json.dump(self.get_chrome_trace(), trace_file)
+
+    def get_otlp_json(self, service_name='wdl-api-sdk'):
+        """ Return the spans as an OpenTelemetry OTLP/JSON object
+
+        All spans belong to one trace. Attributes are exported as
+        string, integer or double values.
+
+        Parameters
+        ----------
+        service_name: str
+            The service.name resource attribute
+
+        Returns
+        -------
+        otlp: dict
+            The ExportTraceServiceRequest object to serialize with
+            json.dump()
+        """
+        def get_attribute(key, value):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return {'key': key, 'value': {'stringValue': str(value)}}
+            if isinstance(value, int):
+                return {'key': key, 'value': {'intValue': str(value)}}
+            return {'key': key, 'value': {'doubleValue': value}}
+
+        with self._lock:
+            spans = list(self.spans)
+
+        trace_id = uuid4().hex
+        otlp_spans = []
+        for span in spans:
+            attributes = [get_attribute(key, value) for key, value in span.attributes.items()]
+            attributes.append(get_attribute('thread.id', span.thread_id))
+            attributes.append(get_attribute('thread.name', span.thread_name))
+
+            otlp_span = {'traceId': trace_id,
+                         'spanId': f'{span.span_id:016x}',
+                         'name': span.name,
+                         'kind': 1,
+                         'startTimeUnixNano': str(span.start_ns + self._epoch_offset_ns),
+                         'endTimeUnixNano': str(span.end_ns + self._epoch_offset_ns),
+                         'attributes': attributes}
+            if span.parent_id is not None:
+                otlp_span['parentSpanId'] = f'{span.parent_id:016x}'
+            otlp_spans.append(otlp_span)
+
+        resource = {'attributes': [get_attribute('service.name', service_name)]}
+        return {'resourceSpans': [{'resource': resource,
+                                   'scopeSpans': [{'scope': {'name': 'tracing'},
+                                                   'spans': otlp_spans}]}]}
+
+    def write_otlp_json(self, filename, service_name='wdl-api-sdk'):
+        """ Write the spans to filename as OpenTelemetry OTLP/JSON
+
+        Parameters
+        ----------
+        filename: str | pathlib.Path
+            The target .json file
+
+        service_name: str
+            The service.name resource attribute
+        """
+        with open(filename, 'w') as otlp_file:
+            json.dump(self.get_otlp_json(service_name=service_name), otlp_file)
+
+class NullTracer:
+    """ A tracer that records nothing
+
+    The default of the download functions, so tracing costs nothing
+    unless a Tracer is passed.
+    """
+    def span(self, name, **attributes): #pylint: disable=unused-argument
+        """ Return a context manager that does nothing """
+        return nullcontext(attributes)
+
+    def add_span(self, name, start_time, end_time, **attributes):
+        """ Do nothing """
+
+    def iter_spans(self, name, iterable, **attributes): #pylint: disable=unused-argument
+        """ Return iterable unchanged """
+        return iterable
+
+""" The shared tracer used when no tracer is given """
+NULL_TRACER = NullTracer()